@@ -1,102 +1,228 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+import time
+
+_import_started = time.perf_counter()
+
+import functools
+from flask import Flask, g, request, jsonify, render_template, send_from_directory
 import os
 import re
-import openai
+import sys
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-import PyPDF2
-import pandas as pd
-import docx
 from dotenv import load_dotenv
 
+import metrics
+from boilerplate import collapse_boilerplate
+from criteria import load_criteria
+from document_processing import (
+    GZIP_SUFFIX, IngestResult, extract_pdf_pages, extract_text, extracted_filename_for, ingest_document,
+    ingest_extracted_parts, ingestion_page_cache, pdf_page_count, precompress_file, redact_extracted_file, redact_text,
+    redacted_filename_for, redaction_fingerprint, save_upload_stream
+)
+from document_store import DocumentStore
+from evaluation_cache import EvaluationCache, make_cache_key
+from evidence import EVIDENCE_VERSION, prescreen, render_local_answers_html, render_local_criterion_html
+from http_caching import cacheable_response, json_response, send_precompressed, stream_zip
+from llm_backends import LLMBackendError, create_backend
+from llm_scheduler import LLMScheduler
+from prompts import build_criterion_prompt, build_document_prompt, build_structured_prompt
+from retrieval import RETRIEVAL_VERSION, criterion_queries, estimate_tokens, select_relevant_text
+from scoring import build_score_table, render_scores_html, render_yes_no_html
+from structured_evaluation import (
+    RESPONSE_FORMAT, apply_local_answers, evaluation_rows, parse_structured_evaluation, render_evaluation_html
+)
+from workspaces import WorkspaceNotFound, WorkspaceStore
+
 import json  # Import json to check for encoding issues
 
-import shutil
+import logging
+import random
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 
 
 app = Flask(__name__, static_folder="static")
-app.config['UPLOAD_FOLDER'] = 'uploads/'
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-app.config['REDACTED_FOLDER'] = 'redacted/'
-os.makedirs(app.config['REDACTED_FOLDER'], exist_ok=True)
 
 load_dotenv()
 
+# Concurrent evaluation settings (see evaluate_documents_concurrently)
+app.config['EVAL_MAX_WORKERS'] = int(os.getenv("EVAL_MAX_WORKERS", "4"))
+app.config['EVAL_REQUEST_TIMEOUT'] = float(os.getenv("EVAL_REQUEST_TIMEOUT", "120"))
+app.config['EVAL_MAX_RETRIES'] = int(os.getenv("EVAL_MAX_RETRIES", "3"))
+app.config['EVAL_RETRY_BACKOFF'] = float(os.getenv("EVAL_RETRY_BACKOFF", "2"))
+
+# Upload ingestion: extraction and redaction run in a process pool; PDFs with more than
+# INGEST_PDF_SPLIT_PAGES pages are extracted in page ranges across several workers
+app.config['INGEST_WORKERS'] = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 2)))
+app.config['INGEST_PDF_SPLIT_PAGES'] = int(os.getenv("INGEST_PDF_SPLIT_PAGES", "50"))
+# The workers also cache extracted text per PDF page, configured by PAGE_CACHE_ENABLED,
+# PAGE_CACHE_PATH and PAGE_CACHE_MAX_MB (read in document_processing.py, see page_cache.py)
+
+# "openai" (needs OPENAI_API_KEY; honours OPENAI_BASE_URL) or "mock" for offline load testing,
+# see llm_backends.py and mock_llm_server.py
+app.config['LLM_BACKEND'] = os.getenv("LLM_BACKEND", "openai")
+
+# Model settings; both are part of the evaluation cache key
+app.config['OPENAI_MODEL'] = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+app.config['OPENAI_TEMPERATURE'] = float(os.getenv("OPENAI_TEMPERATURE", "0.3"))
+
+# Account rate limits enforced before calls are sent (see llm_scheduler.py); 0 disables a limit.
+# A call's token cost is estimated as its prompt plus LLM_EXPECTED_COMPLETION_TOKENS.
+app.config['LLM_REQUESTS_PER_MINUTE'] = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+app.config['LLM_TOKENS_PER_MINUTE'] = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+app.config['LLM_EXPECTED_COMPLETION_TOKENS'] = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "1500"))
+# The limits are shared by every gunicorn worker through this file; empty keeps them per process
+app.config['LLM_SCHEDULER_STATE_PATH'] = os.getenv("LLM_SCHEDULER_STATE_PATH", "cache/llm_rate_limits.sqlite3")
+
+# Evaluation cache (see evaluation_cache.py)
+app.config['EVAL_CACHE_ENABLED'] = os.getenv("EVAL_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config['EVAL_CACHE_PATH'] = os.getenv("EVAL_CACHE_PATH", "cache/evaluations.sqlite3")
+app.config['EVAL_CACHE_MAX_AGE_DAYS'] = float(os.getenv("EVAL_CACHE_MAX_AGE_DAYS", "30"))
+app.config['EVAL_CACHE_MAX_MB'] = float(os.getenv("EVAL_CACHE_MAX_MB", "500"))
+
+# "document" sends every criterion in one prompt per document; "per_criterion" scores each
+# criterion separately so editing one row of the spreadsheet only re-scores that criterion
+app.config['EVALUATION_MODE'] = os.getenv("EVALUATION_MODE", "document")
+
+# Documents estimated above this many tokens are cut down to the pages most relevant
+# to the criteria (see retrieval.py) before being placed in the prompt
+app.config['PROMPT_DOCUMENT_TOKEN_BUDGET'] = int(os.getenv("PROMPT_DOCUMENT_TOKEN_BUDGET", "30000"))
+app.config['RETRIEVAL_CHUNK_TOKENS'] = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "800"))
+
+# "html" asks the model for an HTML report followed by a JSON array; "structured" uses
+# JSON-schema responses and renders the report locally (see structured_evaluation.py).
+# Applies to EVALUATION_MODE=document.
+app.config['EVALUATION_OUTPUT_FORMAT'] = os.getenv("EVALUATION_OUTPUT_FORMAT", "html")
+app.config['STRUCTURED_MAX_ATTEMPTS'] = int(os.getenv("STRUCTURED_MAX_ATTEMPTS", "2"))
+
+# Passages of at least BOILERPLATE_MIN_WORDS words copied from the tender documents, or shared by
+# at least BOILERPLATE_MIN_DOCUMENTS responses in a run, are collapsed to a short marker before
+# prompting (see boilerplate.py). BOILERPLATE_TENDER_DOCUMENTS lists tender files or folders
+# (e.g. the Tender Brief and Conditions of Tendering), separated by os.pathsep.
+app.config['BOILERPLATE_ENABLED'] = os.getenv("BOILERPLATE_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config['BOILERPLATE_TENDER_DOCUMENTS'] = os.getenv("BOILERPLATE_TENDER_DOCUMENTS", "")
+app.config['BOILERPLATE_MIN_DOCUMENTS'] = int(os.getenv("BOILERPLATE_MIN_DOCUMENTS", "3"))
+app.config['BOILERPLATE_MIN_WORDS'] = int(os.getenv("BOILERPLATE_MIN_WORDS", "40"))
+
+# Optional local pre-screen of yes/no criteria (see evidence.py): "yes" records a "Yes" without a
+# model call when the document plainly states compliance, "yes_no" also answers "No" when the
+# document never mentions the criterion. Off by default: every criterion goes to the model.
+app.config['YES_NO_PRESCREEN'] = os.getenv("YES_NO_PRESCREEN", "off").lower()
+
+# Background evaluation jobs (see run_evaluation_job)
+app.config['JOB_WORKERS'] = int(os.getenv("JOB_WORKERS", "2"))
+app.config['JOB_RETENTION_SECONDS'] = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+# Per-session workspaces (see workspaces.py): uploads, redacted text and job state live in
+# WORKSPACE_ROOT/<workspace_id>/ and are deleted after WORKSPACE_TTL_SECONDS without use
+app.config['WORKSPACE_ROOT'] = os.getenv("WORKSPACE_ROOT", "workspaces/")
+app.config['WORKSPACE_TTL_SECONDS'] = int(os.getenv("WORKSPACE_TTL_SECONDS", str(24 * 3600)))
+app.config['WORKSPACE_SWEEP_INTERVAL'] = int(os.getenv("WORKSPACE_SWEEP_INTERVAL", "300"))
+
+# Content-addressed store of extracted and redacted text (see document_store.py), so
+# re-uploading identical files skips extraction and redaction
+app.config['DOCUMENT_STORE_ENABLED'] = os.getenv("DOCUMENT_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config['DOCUMENT_STORE_PATH'] = os.getenv("DOCUMENT_STORE_PATH", "cache/documents")
+app.config['DOCUMENT_STORE_MAX_MB'] = float(os.getenv("DOCUMENT_STORE_MAX_MB", "1000"))
+
+# Logging: LOG_LEVEL=DEBUG also logs full model replies, parsed JSON and criteria rows.
+# TRACE_REQUESTS logs every timed stage with its request's trace ID (see metrics.py).
+app.config['LOG_LEVEL'] = os.getenv("LOG_LEVEL", "INFO").upper()
+app.config['TRACE_REQUESTS'] = os.getenv("TRACE_REQUESTS", "false").lower() in ("1", "true", "yes")
+
+# US dollars per million tokens, for tender_llm_cost_usd_total on /metrics (defaults: gpt-4o-mini)
+app.config['LLM_PRICE_PROMPT_PER_MTOK'] = float(os.getenv("LLM_PRICE_PROMPT_PER_MTOK", "0.15"))
+app.config['LLM_PRICE_CACHED_PROMPT_PER_MTOK'] = float(os.getenv("LLM_PRICE_CACHED_PROMPT_PER_MTOK", "0.075"))
+app.config['LLM_PRICE_COMPLETION_PER_MTOK'] = float(os.getenv("LLM_PRICE_COMPLETION_PER_MTOK", "0.60"))
+
+
+logging.basicConfig(level=app.config['LOG_LEVEL'], format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("metrics.trace").setLevel(logging.INFO if app.config['TRACE_REQUESTS'] else logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+
+
+# Importing this module opens no databases, clients, threads or pools, so gunicorn can load it
+# once in the master (preload_app in gunicorn.conf.py) and fork workers from it. The services
+# below are built on first use in the process that uses them: a forked worker never shares its
+# parent's SQLite connections or HTTP client.
+_services = {}
+_services_lock = threading.Lock()
+
+
+def _reset_services_lock():
+    # The master's sweeper thread may hold the lock while a worker is forked
+    global _services_lock
+    _services_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_services_lock)
+
+
+def process_service(name, build):
+    """This process's instance of a service, created by `build()` on first use."""
+    key = (os.getpid(), name)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = build()
+        return service
+
+
+def get_document_store():
+    """The content-addressed document store (see document_store.py), or None when disabled."""
+    if not app.config['DOCUMENT_STORE_ENABLED']:
+        return None
+    return process_service("document_store", lambda: DocumentStore(
+        app.config['DOCUMENT_STORE_PATH'],
+        max_bytes=int(app.config['DOCUMENT_STORE_MAX_MB'] * 1024 * 1024),
+    ))
 
-def reset_flag_file():
-    """Removes the .cleared flag file at the start of a new session."""
-    folder_path = app.config['REDACTED_FOLDER']
-    flag_file = os.path.join(folder_path, ".cleared")
-
-    print(f"🔍 Checking if flag file exists: {flag_file}")
-
-    if os.path.exists(flag_file):
-        try:
-            os.remove(flag_file)
-            print("🗑️ .cleared flag file removed at the start of a new session.")
-        except Exception as e:
-            print(f"⚠️ Error removing flag file: {e}")
-    else:
-        print("✅ No previous .cleared flag file found, skipping deletion.")
-
-def clear_redacted_folder_once():
-    """Clears REDACTED_FOLDER only once per session by using a flag file."""
-    folder_path = app.config['REDACTED_FOLDER']
-    flag_file = os.path.join(folder_path, ".cleared")
-
-    print(f"🔍 Checking REDACTED_FOLDER: {folder_path}")
-
-    # Ensure the folder exists before proceeding
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path, exist_ok=True)
-        print("📂 Created missing REDACTED_FOLDER.")
 
-    # Step 1: Remove old flag file (reset for new session)
-    reset_flag_file()
+def get_workspaces():
+    """The workspace store (see workspaces.py); its root folder is created on first use, not on import."""
+    return process_service("workspaces", lambda: WorkspaceStore(
+        app.config['WORKSPACE_ROOT'], ttl_seconds=app.config['WORKSPACE_TTL_SECONDS']
+    ))
 
-    # Step 2: Check if the flag file exists; if so, do not clear the folder again
-    print(f"🔍 Checking if cleanup was already done: {flag_file}")
 
-    if os.path.exists(flag_file):
-        print("✅ REDACTED_FOLDER was already cleared this session. Skipping cleanup.")
+def release_workspace_documents(workspace_id):
+    """Drops the workspace's references in the document store so its documents can be evicted."""
+    document_store = get_document_store()
+    if document_store is None:
         return
-
-    # Step 3: Clear folder contents
-    print("🗑️ Clearing REDACTED_FOLDER contents...")
-
     try:
-        for file in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, file)
-            try:
-                if os.path.isfile(file_path) or os.path.islink(file_path):
-                    os.unlink(file_path)  # Delete file or symlink
-                    print(f"🗑️ Deleted file: {file_path}")
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path)  # Delete subdirectory
-                    print(f"🗑️ Deleted directory: {file_path}")
-            except Exception as e:
-                print(f"⚠️ Error deleting {file_path}: {e}")
-
-        # Step 4: Create a flag file to indicate cleanup has been done
-        with open(flag_file, "w") as f:
-            f.write("Cleared at startup.")
-        print("✅ REDACTED_FOLDER has been cleared at startup.")
+        document_store.release(workspace_id)
+    except sqlite3.Error as e:
+        logger.warning("⚠️ Could not release documents of workspace %s: %s", workspace_id, e)
 
-    except Exception as e:
-        print(f"❌ Unexpected error while clearing REDACTED_FOLDER: {e}")
 
-# Run the function at startup
-clear_redacted_folder_once()
+def log_workspace_sweep(removed):
+    for workspace_id in removed:
+        release_workspace_documents(workspace_id)
+    if removed:
+        logger.info("🗑️ Removed %d expired workspaces.", len(removed))
 
 
+_housekeeping_started = False
 
 
-# Set OpenAI API Key
-openai.api_key = os.getenv("OPENAI_API_KEY")
+def start_housekeeping():
+    """
+    Sweeps expired workspaces now and then every WORKSPACE_SWEEP_INTERVAL seconds. Needed once
+    per server, not per worker: gunicorn.conf.py runs it in the master process.
+    """
+    global _housekeeping_started
+    if _housekeeping_started:
+        return
+    _housekeeping_started = True
+    log_workspace_sweep(get_workspaces().sweep())
+    get_workspaces().start_sweeper(app.config['WORKSPACE_SWEEP_INTERVAL'], on_sweep=log_workspace_sweep)
 
-if not openai.api_key:
-    raise ValueError("Missing OpenAI API key. Ensure OPENAI_API_KEY is set in the .env file.")
 
 # Serve static files
 @app.route('/static/js/<path:filename>')
@@ -107,100 +233,6 @@ def serve_js(filename):
 def serve_css(filename):
     return send_from_directory("static/css", filename)
 
-# Preprocessing function to redact sensitive data using regex
-import re
-import os
-
-def redact_sensitive_data(text):
-    """Redacts sensitive data including occurrences of file names."""
-    patterns = [
-        r'\b\d{3}[-.]?\d{2}[-.]?\d{4}\b',  # SSNs
-        r'\b(?:\d{1,3}\.){3}\d{1,3}\b',     # IP Addresses
-        r'\b\d{16}\b',                      # Credit card numbers
-        r'\b[\w.%+-]+@[\w.-]+\.[a-zA-Z]{2,}\b',  # Email addresses
-        r'\$\s?\d+(?:,\d{3})*(?:\.\d{2})?',  # ✅ Price amounts ($xx.xx, $1,000, $50,000.00)
-        r'CONTRACT\s+\d+'
-    ]
-
-    # ✅ Redact predefined patterns
-    for pattern in patterns:
-        text = re.sub(pattern, "[REDACTED]", text)
-
-    # ✅ Remove file extension and clean company name
-    # if filename:
-    #     company_name = os.path.splitext(filename)[0]  # ✅ Remove extension
-    #     company_name_variants = [
-    #         re.escape(company_name),  # Exact match
-    #         re.escape(company_name).replace(r"\ ", r"\s?"),  # Handle spaces
-    #         re.escape(company_name).replace(r"\_", r"\s?")  # Handle underscores
-    #     ]
-
-    #     for variant in company_name_variants:
-    #         text = re.sub(variant, "[REDACTED COMPANY]", text, flags=re.IGNORECASE)
-
-    return text
-
-
-# Function to redact PII from the text
-def redact_pii(text):
-    import re
-    # Redact email addresses
-    text = re.sub(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b", "[REDACTED EMAIL]", text)
-    # Redact phone numbers
-    text = re.sub(r"\b(?:\+?\d{1,3}[-.\s]?)?(?:\(?\d{1,4}\)?[-.\s]?)?\d{3,4}[-.\s]?\d{3,4}\b", "[REDACTED PHONE]", text)
-    # Redact credit card numbers
-    text = re.sub(r"\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b", "[REDACTED CREDIT CARD]", text)
-
-    # Redact addresses
-    street_types = r"(St|Street|Dv|Dve|Drive|Lane|Ln|Road|Rd|Court|Ct|Crescent|Cr|Cres|Highway|HWY|Hwy|Ave|Avenue|Boulevard|Way)"
-    state_types = r"(ACT|Australian Capital Territory|NSW|New South Wales|NT|Northern Territory|QLD|Queensland|SA|South Australia|TAS|Tasmania|VIC|Victoria|WA|Western Australia)"
-    
-    address_pattern = fr"\b(?:\d+/)?\d+[a-zA-Z]?\s+\w+(?:\s\w+)*\s{street_types}(?:,?\s\w+(?:\s\w+)*)?(?:,?\s\d{{4}})?(?:,?\s{state_types})?(?:,?\s\d{{4}})?\b"
-    text = re.sub(address_pattern, "[REDACTED ADDRESS]", text, flags=re.IGNORECASE)
-
-    # Redact names (known names)
-    # ww_names = ["Wannon Water", "WW", "Wannon Region Water Corporation"]
-    # for name in ww_names:
-    #     text = text.replace(name, "[REDACTED RECIPIENT NAME]")
-
-   
-    #text = re.sub(name_pattern, "[REDACTED NAME]", text)
-
-    return text
-
-def redact_persons_name(text, filename):
-    # explicitly keep references to Wannon Water in the text to allow the LLM to detect previous work done with Wannon Water
-    name_pattern = r"\b([A-Z][a-z]+(?:\s[A-Z][a-z]+)*|[A-Z](?:\.|[a-z]+)?(?:\s[A-Z](?:\.|[a-z]+)?)*\s[A-Z][a-z]+)\b"
-    company_name = os.path.splitext(filename)[0]
-    def replace_name(match):
-        exclude_pattern = rf"(Wannon Water|{re.escape(company_name)})"
-        matched_text = match.group(0)
-        if re.fullmatch(exclude_pattern, matched_text):
-            return matched_text  # Don't redact Wannon Water or the company name
-        return "[REDACTED NAME]"
-    
-    return re.sub(name_pattern, replace_name, text)
-
-
-
-def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF while tracking page numbers."""
-    with open(pdf_path, 'rb') as pdf_file:
-        reader = PyPDF2.PdfReader(pdf_file)
-        text_with_pages = []
-        for i, page in enumerate(reader.pages):
-            page_text = page.extract_text()
-            if page_text:
-                text_with_pages.append(f"(Page {i+1}) {page_text}")  # Add page number
-
-    return "\n".join(text_with_pages)
-
-
-# Function to extract text from Word documents
-def extract_text_from_docx(docx_path):
-    doc = docx.Document(docx_path)
-    return "\n".join([para.text for para in doc.paragraphs])
-
 # def generate_evaluation_tables(evaluations, weightings, order_mapping):
  
 #     df = pd.DataFrame(evaluations)
@@ -262,117 +294,219 @@ def extract_text_from_docx(docx_path):
 #     return scored_df, yes_no_df
 
 
-def generate_evaluation_tables(evaluations, weightings, order_mapping):
-    df = pd.DataFrame(evaluations)
-
-    if df.empty:
-        print("⚠️ Debug: No evaluation data provided.")
-        return pd.DataFrame(), pd.DataFrame()
+# Bump whenever the prompts (prompts.py) change so cached evaluations are not reused
+PROMPT_TEMPLATE_VERSION = "2"
 
-    # Rename columns to remove "_redacted.txt"
-    df.columns = [col.replace("_redacted.txt", "").strip() for col in df.columns]
 
-    score_cols = [col for col in df.columns if "Score" in col]
-    yes_no_cols = [col for col in df.columns if "Yes/No" in col]
+def get_evaluation_cache():
+    """The evaluation cache (see evaluation_cache.py), or None when disabled."""
+    if not app.config['EVAL_CACHE_ENABLED']:
+        return None
+    return process_service("evaluation_cache", lambda: EvaluationCache(
+        app.config['EVAL_CACHE_PATH'],
+        max_age_seconds=app.config['EVAL_CACHE_MAX_AGE_DAYS'] * 24 * 3600,
+        max_bytes=int(app.config['EVAL_CACHE_MAX_MB'] * 1024 * 1024)
+    ))
 
-    if not score_cols and not yes_no_cols:
-        print("❌ Debug: Could not find necessary columns. Check AI output.")
-        return pd.DataFrame(), pd.DataFrame()
 
-    # Group by Criterion to ensure each appears only once
-    grouped_df = df.groupby("Criterion").first().reset_index()
+def get_llm_backend():
+    """
+    The configured LLM backend. Retries are handled by call_with_retry so the backoff policy is
+    in one place. Built on the first model call, so a missing OPENAI_API_KEY fails that call
+    (and is logged at startup) instead of stopping the server from booting.
+    """
+    return process_service("llm_backend", lambda: create_backend(app.config['LLM_BACKEND']))
 
-    # Map weightings and order values from the original spreadsheet
-    grouped_df["Weighting (%)"] = grouped_df["Criterion"].map(weightings)
-    grouped_df["Order"] = grouped_df["Criterion"].map(order_mapping)
 
-    # Sort by the order column
-    grouped_df = grouped_df.sort_values("Order")
+def get_llm_scheduler():
+    """This process's scheduler for model calls; the rate limits themselves are shared (see llm_scheduler.py)."""
+    return process_service("llm_scheduler", lambda: LLMScheduler(
+        app.config['LLM_REQUESTS_PER_MINUTE'],
+        app.config['LLM_TOKENS_PER_MINUTE'],
+        state_path=app.config['LLM_SCHEDULER_STATE_PATH'] or None,
+    ))
 
-    if score_cols:
-        scored_df = grouped_df.dropna(subset=score_cols).filter(["Criterion"] + score_cols + ["Weighting (%)"])
-        for score_col in score_cols:
-            weighted_col = f"Weighted {score_col}"
-            scored_df[weighted_col] = (scored_df[score_col] * scored_df["Weighting (%)"]) / 100
 
-        total_scores = pd.DataFrame(scored_df[score_cols + [f"Weighted {col}" for col in score_cols]].sum()).T
-        total_scores.insert(0, "Criterion", "Total")
-        total_scores["Weighting (%)"] = ""
-        scored_df = pd.concat([scored_df, total_scores], ignore_index=True)
-    else:
-        scored_df = pd.DataFrame()
+def model_cache_id():
+    """Model identifier for cache keys; includes the backend so mock results never mix with real ones."""
+    return f"{get_llm_backend().cache_namespace}/{app.config['OPENAI_MODEL']}"
 
-    yes_no_df = grouped_df.dropna(subset=yes_no_cols).filter(["Criterion"] + yes_no_cols) if yes_no_cols else pd.DataFrame()
 
-    return scored_df, yes_no_df
+def prompt_version(suffix=""):
+    """Cache key component for the prompt template, including the retrieval settings that shape it."""
+    return (
+        f"{PROMPT_TEMPLATE_VERSION}{suffix}"
+        f"-b{app.config['PROMPT_DOCUMENT_TOKEN_BUDGET']}-c{app.config['RETRIEVAL_CHUNK_TOKENS']}"
+        f"-r{RETRIEVAL_VERSION}"
+    )
 
 
+def prescreen_version():
+    """Cache key suffix for document-mode results, which include the locally decided answers."""
+    mode = app.config['YES_NO_PRESCREEN']
+    return "" if mode == "off" else f"-ys{mode}{EVIDENCE_VERSION}"
 
-# Evaluation function using OpenAI API
-client = openai.OpenAI()  # Initialize OpenAI client
 
+def prescreen_yes_no(document_text, criteria_data, document_name):
+    """{criterion name: evidence.LocalAnswer} for the yes/no criteria the document text settles on its own."""
+    mode = app.config['YES_NO_PRESCREEN']
+    yes_no = {k: v for k, v in criteria_data.items() if v['type'] == 'yes_no_criteria'}
+    if mode == "off" or not yes_no:
+        return {}
 
-def evaluate_document_new(document_text, criteria_data, document_name):
-    scored_criteria = {k: v['weighting'] for k, v in criteria_data.items() if v['type'] == 'scored_criteria'}
-    yes_no_criteria = [k for k, v in criteria_data.items() if v['type'] == 'yes_no_criteria']
-    sub_criteria_data = {k: v['sub_criteria'] for k, v in criteria_data.items()}
-    comments_data = {k: v['comments'] for k, v in criteria_data.items()}
+    answers = {}
+    with metrics.timed("prescreen", document=document_name):
+        for name, criterion in yes_no.items():
+            local = prescreen(document_text, name, criterion, decide_no=mode == "yes_no")
+            if local is not None:
+                answers[name] = local
 
+    for name, local in answers.items():
+        metrics.YES_NO_DECIDED_LOCALLY.inc(answer=local.answer)
+        logger.info(
+            "🔎 %s / %s: %s, decided locally (pages: %s).", document_name, name, local.answer, local.page_references or "none"
+        )
+    return answers
 
-    prompt = f"""
-Evaluate the provided document using the specified criteria.
 
-### Scored Criteria (Rate 1-10):
-{scored_criteria}
+def local_answer_rows(answers, document_name):
+    """JSON rows for locally decided yes/no criteria, shaped like the model's."""
+    return [
+        {"Criterion": name, f"{document_name} Yes/No": local.answer, "Weighting (%)": None,
+         f"{document_name} Decided Locally": True}
+        for name, local in answers.items()
+    ]
 
-### Yes/No Criteria (Answer 'Yes' if explicit evidence is present, otherwise 'No'):
-{yes_no_criteria}
 
-### Sub-Criteria:
-{sub_criteria_data}
+def mark_model_answers(parsed_result, document_name):
+    """Records on the model's yes/no rows that they were not decided locally."""
+    for row in parsed_result:
+        if f"{document_name} Yes/No" in row:
+            row.setdefault(f"{document_name} Decided Locally", False)
+    return parsed_result
 
-### Comments:
-{comments_data}
 
-### Document:
-{document_text}
+def merge_local_answers(html_part, parsed_result, answers, document_name):
+    """
+    Adds locally decided answers to a model report: their rows replace any the model returned
+    anyway, and their list goes before the report's Conclusion (or at the end).
+    """
+    rows = [row for row in mark_model_answers(parsed_result, document_name) if row.get("Criterion") not in answers]
+    if not answers:
+        return html_part, rows
 
----
+    section = render_local_answers_html(answers)
+    conclusion = re.search(r"<h[1-6][^>]*>\s*Conclusion", html_part, re.IGNORECASE)
+    if conclusion:
+        html_part = f"{html_part[:conclusion.start()]}{section}\n{html_part[conclusion.start():]}"
+    else:
+        html_part = f"{html_part}\n{section}"
+    return html_part, rows + local_answer_rows(answers, document_name)
 
-### Output Requirements:
-1. **Global Summary Scoring Table:**  
-   - Note: The global Summary Scoring Table that displays scores for all documents is generated separately and should appear at the top of the overall report.  
-   - Do not include any per-document summary scoring table here.
 
-2. **Document Evaluation Report:**  
-   - Start with an "Executive Summary".  
-   - For each criterion, output a section titled "Criteria" with:  
-       - The criterion name and its score (formatted as X/10).  
-       - Page References (if page references are sequential, group them into a range; for example, output "5-101" instead of listing each page individually).  
-       - Strengths and Weaknesses.  
-   - Under each criterion, include a "Sub-Criteria" section that lists each sub-criterion with its name, score (formatted as X/10), and related comments.  
-   - After the entire group of sub-criteria for a criterion, insert a lightweight horizontal line (e.g. `<hr style="border-top: 1px solid #ccc;">`) before proceeding to the next criterion.  
-   - Include a "Yes/No Criteria" section at the end that lists each yes/no criterion along with its answer and justification (including grouped page references as specified).  
-   - Conclude the report with a "Conclusion" section summarizing the overall evaluation findings.  
-   - Output the entire report as HTML with no markdown formatting or code block markers.
+def needs_model(criteria_data, answers):
+    """Whether any scored or yes/no criterion is left after the local pre-screen."""
+    return any(
+        v['type'] == 'scored_criteria' or (v['type'] == 'yes_no_criteria' and k not in answers)
+        for k, v in criteria_data.items()
+    )
 
-3. **JSON Data:**  
-   - Immediately after the HTML report, add a new line with exactly: "### JSON Output:".
-   - On the next line, output a valid JSON array containing the evaluation data.  
-     - The JSON array must start with "[" and end with "]".  
-     - Each object in the array should include the keys: "Criterion", "{document_name} Score", and "Weighting (%)". If applicable, include a key "Sub-Criteria" whose value is an array of objects with keys like "Name", "Comments", and "Score".  
-   - Do not include any extra text before or after the JSON array.
-""".strip()
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that evaluates documents."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.3
+def fit_document_to_budget(document_text, queries):
+    """Keeps only the pages most relevant to `queries` when the document is over the prompt budget."""
+    return select_relevant_text(
+        document_text, queries,
+        token_budget=app.config['PROMPT_DOCUMENT_TOKEN_BUDGET'],
+        max_chunk_tokens=app.config['RETRIEVAL_CHUNK_TOKENS']
     )
-    evaluation_text = response.choices[0].message.content
+
+
+def evaluate_document_new(document_text, criteria_data, document_name, answered=(), timeout=None):
+    """`answered` names yes/no criteria already decided locally, which the model is told to leave out."""
+    queries = [query for k, v in criteria_data.items() if k not in answered for query in criterion_queries(k, v)]
+    document_text = fit_document_to_budget(document_text, queries)
+
+    # The criteria and instructions form a prefix shared by every bidder (see prompts.py)
+    prompt = build_document_prompt(document_text, criteria_data, document_name, answered)
+
+    return request_completion(prompt, timeout=timeout)
+
+
+def evaluate_criterion(document_text, criterion_name, criterion, document_name, timeout=None):
+    """Evaluates the document against a single criterion (EVALUATION_MODE=per_criterion)."""
+    document_text = fit_document_to_budget(document_text, criterion_queries(criterion_name, criterion))
+    prompt = build_criterion_prompt(document_text, criterion_name, criterion, document_name)
+
+    return request_completion(prompt, timeout=timeout)
+
+
+def evaluate_document_structured(document_text, criteria_data, document_name, answered=(), timeout=None):
+    """Asks for the evaluation as a JSON object following structured_evaluation.EVALUATION_SCHEMA."""
+    queries = [query for k, v in criteria_data.items() if k not in answered for query in criterion_queries(k, v)]
+    document_text = fit_document_to_budget(document_text, queries)
+    prompt = build_structured_prompt(document_text, criteria_data, answered)
+
+    return request_completion(prompt, timeout=timeout, response_format=RESPONSE_FORMAT)
+
+
+def evaluate_document_structured_validated(document_text, criteria_data, document_name, local_answers=None):
+    """
+    Returns (html_part, parsed_result) from a structured reply, validated and repaired against
+    criteria_data, with the locally decided yes/no answers filled in. An unusable reply is
+    re-requested up to STRUCTURED_MAX_ATTEMPTS times in total.
+    """
+    local_answers = local_answers or {}
+    attempts = max(1, app.config['STRUCTURED_MAX_ATTEMPTS'])
+
+    for attempt in range(attempts):
+        evaluation_result = call_with_retry(
+            document_name, evaluate_document_structured, document_text, criteria_data, document_name, list(local_answers)
+        )
+        try:
+            evaluation = parse_structured_evaluation(evaluation_result, criteria_data)
+        except ValueError as e:
+            if attempt + 1 >= attempts:
+                raise
+            logger.warning("⚠️ %s: unusable structured reply (%s), requesting again.", document_name, e)
+            continue
+
+        apply_local_answers(evaluation, local_answers)
+        return render_evaluation_html(evaluation), evaluation_rows(evaluation, document_name)
+
+
+def request_completion(prompt, timeout=None, **options):
+    """
+    Sends one evaluation prompt to the model and returns the tidied reply text. The call waits
+    for a slot from the scheduler (get_llm_scheduler); smaller prompts are given slots first.
+    """
+    model = app.config['OPENAI_MODEL']
+    estimated_tokens = estimate_tokens(prompt) + app.config['LLM_EXPECTED_COMPLETION_TOKENS']
+    reservation = get_llm_scheduler().acquire(estimated_tokens, priority=estimated_tokens)
+    start = time.perf_counter()
+    try:
+        result = get_llm_backend().complete(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant that evaluates documents."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=app.config['OPENAI_TEMPERATURE'],
+            timeout=timeout,
+            **options
+        )
+        if result.prompt_tokens:
+            reservation.record(result.prompt_tokens, result.completion_tokens, result.cached_tokens)
+    except Exception as e:
+        metrics.LLM_REQUESTS.inc(model=model, outcome=type(e).__name__)
+        raise
+    finally:
+        get_llm_scheduler().release(reservation)
+        metrics.observe_stage("llm_request", time.perf_counter() - start, estimated_tokens=estimated_tokens)
+
+    record_llm_usage(model, result)
+    logger.info("📏 Prompt %d tokens (%d cached), completion %d tokens, estimated %d",
+                result.prompt_tokens, result.cached_tokens, result.completion_tokens, estimated_tokens)
+    evaluation_text = result.text
 
     evaluation_text = re.sub(r'\n{3,}', '\n\n', evaluation_text).strip()
     evaluation_text = re.sub(r'\n\s*\n', '\n', evaluation_text).strip()
@@ -381,131 +515,793 @@ Evaluate the provided document using the specified criteria.
     return evaluation_text
 
 
+def record_llm_usage(model, result):
+    """Counts a successful call's tokens and its cost at the LLM_PRICE_* rates."""
+    uncached_tokens = result.prompt_tokens - result.cached_tokens
+    cost = (
+        uncached_tokens * app.config['LLM_PRICE_PROMPT_PER_MTOK']
+        + result.cached_tokens * app.config['LLM_PRICE_CACHED_PROMPT_PER_MTOK']
+        + result.completion_tokens * app.config['LLM_PRICE_COMPLETION_PER_MTOK']
+    ) / 1_000_000
+
+    metrics.LLM_REQUESTS.inc(model=model, outcome="ok")
+    metrics.LLM_TOKENS.inc(uncached_tokens, model=model, kind="prompt")
+    metrics.LLM_TOKENS.inc(result.cached_tokens, model=model, kind="cached_prompt")
+    metrics.LLM_TOKENS.inc(result.completion_tokens, model=model, kind="completion")
+    metrics.LLM_COST.inc(cost, model=model)
+
+
+def loaded_openai():
+    """The openai module once OpenAIBackend has imported it; before that no openai error can exist."""
+    return sys.modules.get("openai")
+
+
+def is_retryable_error(error):
+    """Returns True for backend errors worth retrying (429, 5xx, timeouts, dropped connections)."""
+    if isinstance(error, LLMBackendError):
+        return error.retryable
+    openai = loaded_openai()
+    if openai is None:
+        return False
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+def is_rate_limit_error(error):
+    if isinstance(error, LLMBackendError):
+        return error.status_code == 429
+    openai = loaded_openai()
+    return openai is not None and isinstance(error, openai.RateLimitError)
+
+
+def retry_delay(error, attempt):
+    """Seconds to wait before the next attempt: Retry-After if the API sent one, else exponential backoff with jitter."""
+    if isinstance(error, LLMBackendError):
+        retry_after = error.retry_after
+    else:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    backoff = app.config['EVAL_RETRY_BACKOFF'] * (2 ** attempt)
+    return min(backoff, 60) + random.uniform(0, 1)
 
-@app.route('/')
-def home():
-    return render_template('index.html')
 
-@app.route('/upload', methods=['POST'])
-def upload_files():
-    if 'documents' not in request.files:
-        return jsonify({"error": "Please upload documents."}), 400
+def call_with_retry(description, evaluate, *args):
+    """Calls an evaluate_* function with a per-request timeout, retrying 429/5xx responses with backoff."""
+    max_retries = app.config['EVAL_MAX_RETRIES']
 
-    document_files = request.files.getlist('documents')
-    redacted_files = []  # Track redacted files
+    for attempt in range(max_retries + 1):
+        try:
+            return evaluate(*args, timeout=app.config['EVAL_REQUEST_TIMEOUT'])
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            delay = retry_delay(e, attempt)
+            logger.warning("⚠️ %s: %s on attempt %d, retrying in %.1fs", description, type(e).__name__, attempt + 1, delay)
+            if is_rate_limit_error(e):
+                # The quota is shared, so hold every queued call rather than just this one
+                get_llm_scheduler().pause(delay)
+            else:
+                time.sleep(delay)
 
-    for file in document_files:
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-
-        # Extract text from document
-        if filename.lower().endswith('.pdf'):
-            raw_text = extract_text_from_pdf(filepath)
-        elif filename.lower().endswith('.docx'):
-            raw_text = extract_text_from_docx(filepath)
-        else:
-            return jsonify({"error": f"Unsupported file type: {filename}"}), 400
 
-        # Apply redaction functions
-        redacted_text = redact_sensitive_data(raw_text)
-        redacted_text = redact_pii(redacted_text)
-        redacted_text = redact_persons_name(redacted_text, filename)
+def evaluate_with_retry(document_text, criteria_data, document_name, answered=()):
+    """Calls evaluate_document_new, retrying 429/5xx responses with backoff."""
+    return call_with_retry(document_name, evaluate_document_new, document_text, criteria_data, document_name, answered)
 
 
+def evaluate_document_cached(document_text, criteria_data, document_name):
+    """
+    Returns (html_part, parsed_result) for a document, from the evaluation cache when the same
+    text, criteria, prompt version, model and temperature were evaluated before.
+    Raises ValueError if a fresh AI response cannot be parsed.
+    """
+    structured = app.config['EVALUATION_OUTPUT_FORMAT'] == "structured"
 
-        # Save redacted text immediately
-        redacted_filename = f"{filename.rsplit('.', 1)[0]}_redacted.txt"
-        redacted_path = os.path.join(app.config['REDACTED_FOLDER'], redacted_filename)
+    evaluation_cache = get_evaluation_cache()
+    cache_key = None
+    if evaluation_cache is not None:
+        cache_key = make_cache_key(
+            document_text, criteria_data, document_name,
+            prompt_version(("-structured" if structured else "") + prescreen_version()),
+            model_cache_id(), app.config['OPENAI_TEMPERATURE']
+        )
+        cached = evaluation_cache.get(cache_key)
+        if cached is not None:
+            metrics.EVALUATION_CACHE.inc(result="hit")
+            logger.info("⚡ Cache hit for %s, skipping API call.", document_name)
+            return cached
+        metrics.EVALUATION_CACHE.inc(result="miss")
+
+    local_answers = prescreen_yes_no(document_text, criteria_data, document_name)
+
+    with metrics.timed("evaluate_document", document=document_name):
+        if not needs_model(criteria_data, local_answers):
+            logger.info("🔎 Every criterion for %s was decided locally, skipping API call.", document_name)
+            html_part, parsed_result = render_local_answers_html(local_answers), local_answer_rows(local_answers, document_name)
+        elif structured:
+            html_part, parsed_result = evaluate_document_structured_validated(
+                document_text, criteria_data, document_name, local_answers
+            )
+        else:
+            evaluation_result = evaluate_with_retry(document_text, criteria_data, document_name, list(local_answers))
+            html_part, parsed_result = merge_local_answers(
+                *parse_evaluation_result(evaluation_result), local_answers, document_name
+            )
 
-        with open(redacted_path, "w", encoding="utf-8") as redacted_file:
-            redacted_file.write(redacted_text)
+    if cache_key is not None:
+        evaluation_cache.put(cache_key, html_part, parsed_result)
 
-        redacted_files.append({
-            "document": filename,
-            "redacted_text_file": f"/download/{redacted_filename}"
-        })
+    return html_part, parsed_result
 
-    # Return response immediately after redaction
-    return jsonify({"redacted_files": redacted_files}), 200
 
-@app.route('/download/<filename>')
-def download_file(filename):
-    return send_from_directory(app.config['REDACTED_FOLDER'], filename, as_attachment=True)
+def criterion_definition(criterion):
+    """The parts of a criterion that affect its evaluation; its row position does not."""
+    return {k: v for k, v in criterion.items() if k != 'order'}
 
 
+def diff_criteria(previous_criteria, criteria_data):
+    """Returns (added, changed, removed) criterion names between two criteria_data dicts."""
+    previous_criteria = previous_criteria or {}
+    added = [k for k in criteria_data if k not in previous_criteria]
+    removed = [k for k in previous_criteria if k not in criteria_data]
+    changed = [
+        k for k in criteria_data
+        if k in previous_criteria and criterion_definition(criteria_data[k]) != criterion_definition(previous_criteria[k])
+    ]
+    return added, changed, removed
+
+
+def evaluate_criterion_cached(document_text, criterion_name, criterion, document_name):
+    """
+    Returns (html_section, parsed_result) for one criterion. The cache key only covers this
+    criterion's definition, so results for unchanged criteria survive edits to other rows.
+    Yes/no criteria the document text settles are answered locally, before the cache.
+    """
+    if criterion['type'] == 'yes_no_criteria':
+        local = prescreen_yes_no(document_text, {criterion_name: criterion}, document_name).get(criterion_name)
+        if local is not None:
+            return (
+                render_local_criterion_html(criterion_name, local),
+                local_answer_rows({criterion_name: local}, document_name)
+            )
+
+    evaluation_cache = get_evaluation_cache()
+    cache_key = None
+    if evaluation_cache is not None:
+        cache_key = make_cache_key(
+            document_text, {criterion_name: criterion_definition(criterion)}, document_name,
+            prompt_version("-criterion"), model_cache_id(), app.config['OPENAI_TEMPERATURE']
+        )
+        cached = evaluation_cache.get(cache_key)
+        if cached is not None:
+            metrics.EVALUATION_CACHE.inc(result="hit")
+            html_part, parsed_result = cached
+            return html_part, mark_model_answers(parsed_result, document_name)
+        metrics.EVALUATION_CACHE.inc(result="miss")
+
+    with metrics.timed("evaluate_criterion", document=document_name, criterion=criterion_name):
+        evaluation_result = call_with_retry(
+            f"{document_name} / {criterion_name}", evaluate_criterion,
+            document_text, criterion_name, criterion, document_name
+        )
+        html_part, parsed_result = parse_evaluation_result(evaluation_result)
+        mark_model_answers(parsed_result, document_name)
 
+    if cache_key is not None:
+        evaluation_cache.put(cache_key, html_part, parsed_result)
 
+    return html_part, parsed_result
 
 
-def detect_criteria_type_new(df):
-    criteria_data = {}
-    current_criterion = None
+@functools.lru_cache(maxsize=32)
+def load_tender_document(path, modified_ns, size):
+    """Redacted text of a tender document, redacted like the responses; mtime and size key the cache."""
+    filename = os.path.basename(path)
+    return redact_text(extract_text(path, filename), filename)
 
-    for index, row in df.iterrows():
-        order = index  # Capture original row order
-        print(f"Processing row {index}: {row.tolist()}")
-        if pd.notna(row.iloc[0]):  # Check if the first column is not empty
-            if pd.notna(row.iloc[1]):  # Main criterion with value in second column
-                current_criterion = row.iloc[0]
-                value = str(row.iloc[1]).strip().lower()
 
-                print(f"Found main criterion: {current_criterion} with value: {value}")
+def tender_documents():
+    """(filename, redacted text) of every PDF/Word file in BOILERPLATE_TENDER_DOCUMENTS."""
+    paths = []
+    for entry in filter(None, app.config['BOILERPLATE_TENDER_DOCUMENTS'].split(os.pathsep)):
+        if os.path.isdir(entry):
+            paths.extend(os.path.join(entry, name) for name in sorted(os.listdir(entry)))
+        else:
+            paths.append(entry)
 
+    documents = []
+    for path in paths:
+        filename = os.path.basename(path)
+        if not filename.lower().endswith(('.pdf', '.docx')) or filename.startswith('~$'):
+            continue
+        try:
+            stat = os.stat(path)
+            documents.append((filename, load_tender_document(path, stat.st_mtime_ns, stat.st_size)))
+        except Exception as e:
+            # Only costs the comparison with this document
+            logger.warning("⚠️ Could not read tender document %s: %s", path, e)
+    return documents
+
+
+def strip_boilerplate(documents):
+    """
+    Collapses boilerplate in (document_name, document_text) pairs before prompting (see
+    boilerplate.py). Returns the new pairs and, for each document that changed,
+    {"passages", "words", "tokens_saved"} by document name.
+    """
+    if not app.config['BOILERPLATE_ENABLED'] or not documents:
+        return documents, {}
+
+    with metrics.timed("boilerplate", documents=len(documents)):
+        results = collapse_boilerplate(
+            documents, tender_documents(),
+            min_documents=app.config['BOILERPLATE_MIN_DOCUMENTS'], min_words=app.config['BOILERPLATE_MIN_WORDS']
+        )
+
+    stripped, report = [], {}
+    for (document_name, document_text), result in zip(documents, results):
+        stripped.append((document_name, result.text))
+        if result.passages:
+            report[document_name] = {
+                "passages": result.passages, "words": result.words, "tokens_saved": result.tokens_saved
+            }
+            metrics.BOILERPLATE_TOKENS_SAVED.inc(result.tokens_saved)
+            logger.info("✂️ %s: collapsed %d boilerplate passages (%d words, about %d tokens).",
+                        document_name, result.passages, result.words, result.tokens_saved)
+    return stripped, report
+
+
+def smallest_first(documents):
+    """Indexes of (document_name, document_text) pairs, shortest text first, so early reports arrive quickly."""
+    return sorted(range(len(documents)), key=lambda index: len(documents[index][1]))
+
+
+def describe_error(error):
+    """A one-line description of a failed evaluation; exceptions other than ValueError are named."""
+    if isinstance(error, ValueError):
+        return str(error)
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+
+def evaluate_criteria_concurrently(documents, criteria_data, on_result=None, on_error=None):
+    """
+    EVALUATION_MODE=per_criterion counterpart of evaluate_documents_concurrently: every
+    (document, criterion) pair is a separate, separately cached call. A document's sections are
+    merged back in spreadsheet order (scored criteria first, then yes/no) once all of them finish.
+    """
+    # Unknown-type rows have no score to ask for; they only matter as context in document mode
+    scored = [k for k, v in criteria_data.items() if v['type'] == 'scored_criteria']
+    yes_no = [k for k, v in criteria_data.items() if v['type'] == 'yes_no_criteria']
+    criterion_names = sorted(scored, key=lambda k: criteria_data[k]['order']) + \
+        sorted(yes_no, key=lambda k: criteria_data[k]['order'])
+
+    results = [None] * len(documents)
+    sections = [{} for _ in documents]
+    errors = [[] for _ in documents]
+    remaining = [len(criterion_names)] * len(documents)
+
+    def finish(index):
+        document_name = documents[index][0]
+        if errors[index]:
+            on_error(index, document_name, ValueError("; ".join(errors[index])))
+            return
+
+        html_part = "\n".join(sections[index][name][0] for name in criterion_names)
+        parsed_result = [row for name in criterion_names for row in sections[index][name][1]]
+        results[index] = (html_part, parsed_result)
+        if on_result:
+            on_result(index, document_name, html_part, parsed_result)
+
+    max_workers = max(1, min(app.config['EVAL_MAX_WORKERS'], len(documents) * max(1, len(criterion_names))))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for index in smallest_first(documents):
+            document_name, document_text = documents[index]
+            if not criterion_names:
+                finish(index)
+            for name in criterion_names:
+                future = metrics.submit_in_context(
+                    executor, evaluate_criterion_cached, document_text, name, criteria_data[name], document_name
+                )
+                futures[future] = (index, name)
+
+        try:
+            for future in as_completed(futures):
+                index, name = futures[future]
                 try:
-                    # Try converting the value to a float
-                    weighting = float(value)
-                    criteria_type = 'scored_criteria'
-                except ValueError:
-                    # If conversion fails, check for yes/no criteria
-                    if value in ['y', 'n', 'yes', 'no', 'y/n']:
-                        criteria_type = 'yes_no_criteria'
-                        weighting = None
-                    else:
-                        criteria_type = 'unknown'
-                        weighting = None
-
-                criteria_data[current_criterion] = {
-                    'sub_criteria': [],
-                    'type': criteria_type,
-                    'weighting': weighting,
-                    'order': order,  # Store order for later sorting
-                    'comments': []
+                    sections[index][name] = future.result()
+                except Exception as e:
+                    # Retries exhausted, a timeout or an unusable reply: the document fails, not the batch
+                    if on_error is None:
+                        raise
+                    errors[index].append(f"{name}: {describe_error(e)}")
+
+                remaining[index] -= 1
+                if remaining[index] == 0:
+                    finish(index)
+        except Exception:
+            # Don't keep paying for the rest of the batch once it has failed
+            for future in futures:
+                future.cancel()
+            raise
+
+    return results
+
+
+def evaluate_documents_concurrently(documents, criteria_data, on_result=None, on_error=None):
+    """
+    Evaluates (document_name, document_text) pairs with at most EVAL_MAX_WORKERS calls in flight.
+    Returns (html_part, parsed_result) per document, in the same order as `documents` regardless
+    of completion order.
+
+    If given, on_result(index, document_name, html_part, parsed_result) is called as each document
+    finishes. Documents that fail (an unusable AI response, an API error once retries are used up,
+    a timeout) are reported through on_error(index, document_name, error) and left as None while
+    the rest of the batch carries on; without on_error the first error is raised.
+    """
+    if app.config['EVALUATION_MODE'] == "per_criterion":
+        return evaluate_criteria_concurrently(documents, criteria_data, on_result=on_result, on_error=on_error)
+
+    max_workers = max(1, min(app.config['EVAL_MAX_WORKERS'], len(documents)))
+    results = [None] * len(documents)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            metrics.submit_in_context(
+                executor, evaluate_document_cached, documents[index][1], criteria_data, documents[index][0]
+            ): index
+            for index in smallest_first(documents)
+        }
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                document_name = documents[index][0]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # Retries exhausted, a timeout or an unusable reply: the document fails, not the batch
+                    if on_error is None:
+                        raise
+                    on_error(index, document_name, e)
+                    continue
+                if on_result:
+                    on_result(index, document_name, *results[index])
+        except Exception:
+            # Don't keep paying for the rest of the batch once it has failed
+            for future in futures:
+                future.cancel()
+            raise
+
+    return results
+
+
+def parse_evaluation_result(evaluation_result):
+    """
+    Splits a model reply into the HTML report and the parsed JSON rows.
+    Raises ValueError (or json.JSONDecodeError) if the JSON part is missing or malformed.
+    """
+    html_match = re.search(r"^(.*?)### JSON Output:", evaluation_result, re.DOTALL)
+    html_part = html_match.group(1).strip() if html_match else evaluation_result.strip()
+
+    logger.debug("✅ Extracted HTML Part: %s", html_part[:500])  # ✅ Debugging first 500 characters
+
+    # ✅ **NEW: Extract JSON using regex to avoid parsing errors**
+    json_match = re.search(r'(\[.*\])', evaluation_result, re.DOTALL)
+
+    if not json_match:
+        logger.error("❌ JSON Extraction Failed.")
+        logger.debug("❌ Full AI Response:\n%s", evaluation_result)  # ❌ **Debugging failure case**
+        raise ValueError("AI response does not contain valid JSON.")
+
+    json_part = json_match.group(0).strip()  # ✅ **Extract matched JSON content & remove extra spaces**
+    logger.debug("🔍 Raw Extracted JSON:\n%s", json_part)
+
+    # ✅ Check for structural validity before parsing
+    if not json_part.startswith("[") or not json_part.endswith("]"):
+        raise ValueError("Invalid JSON format: Missing opening or closing brackets.")
+
+    parsed_result = json.loads(json_part)  # ✅ Convert JSON text into Python list
+    logger.debug("✅ Parsed JSON successfully!")
+
+    # ✅ Fix "comments" fields: Ensure all are lists (not strings)
+    for entry in parsed_result:
+        if isinstance(entry, dict) and "Sub-Criteria" in entry:
+            for sub in entry["Sub-Criteria"]:
+                if isinstance(sub.get("comments"), str):  # If "comments" is a string, convert it to a list
+                    sub["comments"] = [sub["comments"]]
+
+    # ✅ Ensure every entry follows expected structure
+    for entry in parsed_result:
+        if not isinstance(entry, dict) or "Criterion" not in entry:
+            raise ValueError(f"Invalid JSON structure detected: {entry}")
+
+    return html_part, parsed_result
+
+
+
+@app.route('/')
+def home():
+    return render_template('index.html')
+
+# Created on first upload in the process that handles it, so the workers fork before any pool exists
+def get_ingest_pool():
+    """Processes that extract and redact uploaded documents."""
+    return process_service("ingest_pool", lambda: ProcessPoolExecutor(max_workers=app.config['INGEST_WORKERS']))
+
+
+def get_ingest_coordinator():
+    """Threads that chain ingest steps which wait on each other (split PDFs, duplicate uploads)."""
+    return process_service("ingest_coordinator", lambda: ThreadPoolExecutor(max_workers=app.config['INGEST_WORKERS']))
+
+
+def ingest_large_pdf(pool, filepath, filename, page_count, redacted_folder, extracted_path):
+    """
+    Extracts a large PDF in page ranges on several workers, each writing its pages to a part file,
+    then redacts the parts page by page in order.
+    """
+    split_pages = app.config['INGEST_PDF_SPLIT_PAGES']
+    extract_start = time.perf_counter()
+    ranges = [pool.submit(extract_pdf_pages, filepath, start, start + split_pages, f"{extracted_path}.part{start}")
+              for start in range(0, page_count, split_pages)]
+    part_paths = [future.result() for future in ranges]
+    extract_seconds = time.perf_counter() - extract_start
+    result = pool.submit(ingest_extracted_parts, part_paths, filename, redacted_folder, extracted_path).result()
+    return result._replace(timings={"extract": extract_seconds, **result.timings})
+
+
+def completed_future(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def redact_after_extraction(pool, extraction, filename, redacted_folder):
+    """Redacts a duplicate upload with the text extracted from the first copy in the same batch."""
+    return pool.submit(redact_extracted_file, extraction.result().extracted_path, filename, redacted_folder).result()
+
+
+def submit_ingestion(pool, filepath, filename, redacted_folder, digest=None, pending=None):
+    """
+    Queues extraction and redaction of one file and returns a future resolving to an IngestResult
+    for `redacted_folder`. PDFs over INGEST_PDF_SPLIT_PAGES pages are coordinated from a thread
+    so the request can start streaming progress while their page ranges are extracted.
+
+    Content already in the document store (by `digest`) is not extracted again, and not redacted
+    again either if it was uploaded under the same name. `pending` maps digests to futures already
+    queued in this request, so byte-identical uploads in one batch are only extracted once.
+
+    The raw extracted text is kept next to the upload (extracted_filename_for) for the document
+    store and for duplicates; only file paths, never document text, pass between processes.
+    """
+    extracted_path = os.path.join(os.path.dirname(filepath), extracted_filename_for(filename))
+
+    document_store = get_document_store()
+    if document_store is not None and digest:
+        redacted_filename = redacted_filename_for(filename)
+        redacted_path = os.path.join(redacted_folder, redacted_filename)
+        if document_store.copy_redacted(digest, filename, redaction_fingerprint(), redacted_path):
+            logger.info("⚡ %s was already redacted, skipping extraction and redaction.", filename)
+            return completed_future(IngestResult(redacted_filename, None))
+
+        if document_store.copy_extracted(digest, extracted_path):
+            logger.info("⚡ %s was already extracted, skipping extraction.", filename)
+            return pool.submit(redact_extracted_file, extracted_path, filename, redacted_folder)
+
+    if pending is not None and digest in pending:
+        # The coordinator runs tasks in order, so the first copy is already running or done
+        return get_ingest_coordinator().submit(redact_after_extraction, pool, pending[digest], filename, redacted_folder)
+
+    if filename.lower().endswith('.pdf'):
+        page_count = pdf_page_count(filepath)
+        if page_count > app.config['INGEST_PDF_SPLIT_PAGES']:
+            future = get_ingest_coordinator().submit(
+                ingest_large_pdf, pool, filepath, filename, page_count, redacted_folder, extracted_path
+            )
+        else:
+            future = pool.submit(ingest_document, filepath, filename, redacted_folder, extracted_path)
+    else:
+        future = pool.submit(ingest_document, filepath, filename, redacted_folder, extracted_path)
+
+    if pending is not None and digest:
+        pending[digest] = future
+    return future
+
+
+def store_ingested_document(digest, filename, workspace_id, redacted_folder, result):
+    """Adds a newly processed document to the document store and references it from the workspace."""
+    document_store = get_document_store()
+    if document_store is None:
+        return
+    try:
+        if result.extracted_path is not None:
+            document_store.put(
+                digest, filename, redaction_fingerprint(),
+                result.extracted_path, os.path.join(redacted_folder, result.redacted_filename)
+            )
+        document_store.add_reference(digest, workspace_id)
+    except (OSError, sqlite3.Error) as e:
+        # The workspace already has its redacted copy; only deduplication of later uploads is lost
+        logger.warning("⚠️ Could not add %s to the document store: %s", filename, e)
+
+
+@app.route('/upload', methods=['POST'])
+def upload_files():
+    """
+    Saves the uploads, then streams newline-delimited JSON: one line per file as soon as it has
+    been redacted (or has failed), and a final "done" line listing every redacted file.
+    A bad file is reported on its own line and does not stop the rest of the batch.
+
+    Files go into the workspace named by the `workspace_id` form field, or a new workspace
+    if none is given; every line carries the workspace ID to send with /evaluate.
+    """
+    upload_start = time.perf_counter()
+    if 'documents' not in request.files:
+        return jsonify({"error": "Please upload documents."}), 400
+
+    workspace_id = request.form.get('workspace_id')
+    try:
+        if workspace_id:
+            get_workspaces().touch(workspace_id)
+        else:
+            workspace_id = get_workspaces().create()
+            logger.info("📂 Created workspace %s", workspace_id)
+        upload_folder = get_workspaces().uploads_folder(workspace_id)
+        redacted_folder = get_workspaces().redacted_folder(workspace_id)
+    except WorkspaceNotFound:
+        return jsonify({"error": "Unknown or expired workspace."}), 404
+
+    document_files = request.files.getlist('documents')
+    pool = get_ingest_pool()
+    futures = {}
+    pending = {}
+    results = []
+
+    for file in document_files:
+        filename = secure_filename(file.filename)
+
+        if not filename.lower().endswith(('.pdf', '.docx')):
+            results.append({"document": filename, "status": "error", "error": f"Unsupported file type: {filename}"})
+            continue
+
+        filepath = os.path.join(upload_folder, filename)
+        try:
+            digest = save_upload_stream(file, filepath)
+            futures[submit_ingestion(pool, filepath, filename, redacted_folder, digest, pending)] = (filename, digest)
+        except Exception as e:
+            logger.error("❌ Could not ingest %s: %s", filename, e)
+            results.append({"document": filename, "status": "error", "error": str(e)})
+
+    def generate():
+        redacted_files = []
+
+        for result in results:
+            yield json.dumps({"type": "file", "workspace_id": workspace_id, "total": len(document_files), **result}) + "\n"
+
+        for future in as_completed(futures):
+            filename, digest = futures[future]
+            try:
+                ingested = future.result()
+                for stage, seconds in (ingested.timings or {}).items():
+                    metrics.observe_stage(stage, seconds, document=filename)
+                store_ingested_document(digest, filename, workspace_id, redacted_folder, ingested)
+                redacted_filename = ingested.redacted_filename
+                # Compress the download copy in the pool; downloads do it themselves if it is not ready
+                pool.submit(precompress_file, os.path.join(redacted_folder, redacted_filename))
+                result = {
+                    "document": filename,
+                    "status": "redacted",
+                    "redacted_text_file": f"/download/{workspace_id}/{redacted_filename}"
                 }
-            else:
-                if current_criterion:
-                    sub_criterion_data = {
-                        'name': row.iloc[0],
-                        'comments': row.iloc[2].split('\n') if len(row) > 2 and pd.notna(row.iloc[2]) else []
-                    }
-                    print(f"Adding sub-criterion to {current_criterion}: {sub_criterion_data}")
-                    criteria_data[current_criterion]['sub_criteria'].append(sub_criterion_data)
-        elif current_criterion and len(row) > 2 and pd.notna(row.iloc[2]):
-            comments = row.iloc[2].split('\n')
-            print(f"Adding comment to {current_criterion}: {comments}")
-            criteria_data[current_criterion]['comments'].extend(comments)
+                redacted_files.append(result)
+            except Exception as e:
+                logger.error("❌ Could not ingest %s: %s", filename, e)
+                result = {"document": filename, "status": "error", "error": str(e)}
+                results.append(result)
+            yield json.dumps({"type": "file", "workspace_id": workspace_id, "total": len(document_files), **result}) + "\n"
+
+        # The whole batch, from reading the request body to the last document being redacted
+        metrics.observe_stage("upload", time.perf_counter() - upload_start, documents=len(document_files))
+        yield json.dumps({
+            "type": "done",
+            "workspace_id": workspace_id,
+            "redacted_files": redacted_files,
+            "bundle_url": f"/download/{workspace_id}/redacted.zip",
+            "errors": [r for r in results if r["status"] == "error"]
+        }) + "\n"
+
+    return app.response_class(generate(), mimetype="application/x-ndjson")
+
+@app.route('/download/<workspace_id>/<filename>')
+def download_file(workspace_id, filename):
+    """
+    A redacted document, gzipped when the client accepts it (from the copy written once by
+    precompress_file). ETag/Last-Modified, 304 responses and byte ranges come from send_file.
+    """
+    try:
+        redacted_folder = get_workspaces().redacted_folder(workspace_id)
+    except WorkspaceNotFound:
+        return jsonify({"error": "Unknown or expired workspace."}), 404
+
+    path = safe_join(redacted_folder, filename)
+    if path is None or filename.startswith(".") or filename.endswith(GZIP_SUFFIX) or not os.path.isfile(path):
+        return jsonify({"error": "Unknown file."}), 404
+    return send_precompressed(path, precompress_file(path), filename)
 
-    print("Final criteria data:")
-    print(criteria_data)
 
+@app.route('/download/<workspace_id>/redacted.zip')
+def download_bundle(workspace_id):
+    """Every redacted document of the workspace in one zip, streamed as it is built."""
+    try:
+        redacted_folder = get_workspaces().redacted_folder(workspace_id)
+        redacted_files = get_workspaces().redacted_files(workspace_id)
+    except WorkspaceNotFound:
+        return jsonify({"error": "Unknown or expired workspace."}), 404
+    if not redacted_files:
+        return jsonify({"error": "No redacted files to download."}), 404
 
-    scored_criteria = {k: v for k, v in criteria_data.items() if v['type'] == 'scored_criteria'}
-    yes_no_criteria = {k: v for k, v in criteria_data.items() if v['type'] == 'yes_no_criteria'}
+    files = [(name, os.path.join(redacted_folder, name)) for name in redacted_files]
+    return app.response_class(
+        stream_zip(files), mimetype="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="redacted.zip"', "Cache-Control": "private, no-store"}
+    )
 
-    print("Scored Criteria Detected:")
-    for k, v in scored_criteria.items():
-        print(f"{k}: Weighting = {v['weighting']}, Sub-criteria = {len(v['sub_criteria'])}")
 
-    print("\nYes/No Criteria Detected:")
-    for k, v in yes_no_criteria.items():
-        print(f"{k}: Weighting = {v['weighting']}, Sub-criteria = {len(v['sub_criteria'])}")
+def render_evaluation_tables(all_parsed_results, weightings, order_mapping):
+    """Builds the summary scoring table and the yes/no table as HTML (see scoring.py)."""
+    with metrics.timed("tables"):
+        table = build_score_table(all_parsed_results, weightings, order_mapping)
+
+        logger.debug("🔍 Debug: score matrix %s, yes/no matrix %s", table.scores.shape, table.yes_no.shape)
+
+        return render_scores_html(table), render_yes_no_html(table)
+
+
+# Background evaluation jobs, keyed by job ID.
+# Each job collects document reports as they finish so the front end can poll for partial results.
+# Jobs run by this process are kept in `jobs`; every change is also saved to the job's workspace
+# so a poll answered by another worker process sees the same state.
+jobs = {}
+jobs_lock = threading.Lock()
+
+
+def get_job_executor():
+    """Threads that run evaluation jobs, at most JOB_WORKERS at once."""
+    return process_service("job_executor", lambda: ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS']))
+
+
+def create_evaluation_job(workspace_id, document_names, weightings, order_mapping):
+    """Registers a new queued job and drops finished jobs older than JOB_RETENTION_SECONDS."""
+    now = time.time()
+    job = {
+        "id": uuid.uuid4().hex,
+        "workspace_id": workspace_id,
+        "status": "queued",
+        "created_at": now,
+        "finished_at": None,
+        "total": len(document_names),
+        "documents": [],       # Finished documents in completion order; reports are saved separately
+        "rows": [],            # JSON rows from every finished document
+        "errors": [],
+        "error": None,
+        "criteria_changes": None,
+        "boilerplate": {},     # Tokens saved per document by strip_boilerplate
+        "weightings": weightings,
+        "order_mapping": order_mapping,
+        "evaluation_table": "",
+        "yes_no_table": "",
+    }
+
+    with jobs_lock:
+        expired = [
+            job_id for job_id, old_job in jobs.items()
+            if old_job["finished_at"] and now - old_job["finished_at"] > app.config['JOB_RETENTION_SECONDS']
+        ]
+        for job_id in expired:
+            del jobs[job_id]
+        jobs[job["id"]] = job
+
+    return job
+
+
+def persist_job(job):
+    """Saves the job to its workspace. Call with jobs_lock held so saves happen in update order."""
+    try:
+        get_workspaces().save_job(job["workspace_id"], job)
+        get_workspaces().touch(job["workspace_id"])
+    except WorkspaceNotFound:
+        logger.warning("⚠️ Workspace %s expired while job %s was running.", job['workspace_id'], job['id'])
+
+
+def job_snapshot(workspace_id, job_id):
+    """
+    A copy of the job's state that is safe to read without jobs_lock: from memory if this
+    process is running it, otherwise as last saved in the workspace. None if unknown.
+    """
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is not None and job["workspace_id"] == workspace_id:
+            return {**job, "documents": list(job["documents"]), "rows": list(job["rows"]), "errors": list(job["errors"])}
+
+    return get_workspaces().load_job(workspace_id, job_id)
+
+
+def run_evaluation_job(job, documents, criteria_data):
+    """Evaluates `documents` in the background, publishing each report on `job` as soon as it is parsed."""
+    with jobs_lock:
+        job["status"] = "running"
+        persist_job(job)
+
+    def on_result(index, document_name, html_part, parsed_result):
+        logger.info("✅ Evaluation complete for %s with %d criteria.", document_name, len(criteria_data))
+        # Reports can be megabytes each; keeping them out of the job file keeps every save small
+        try:
+            get_workspaces().save_report(job["workspace_id"], job["id"], index, html_part)
+        except WorkspaceNotFound:
+            logger.warning("⚠️ Workspace %s expired while job %s was running.", job['workspace_id'], job['id'])
+        with jobs_lock:
+            job["documents"].append({
+                "index": index,
+                "document": document_name,
+                "bytes": len(html_part.encode("utf-8")),
+                "rows": parsed_result
+            })
+            job["rows"].extend(parsed_result)
+            persist_job(job)
+
+    def on_error(index, document_name, error):
+        # Keep the rest of the batch going
+        logger.error("❌ Evaluation failed for %s: %s", document_name, describe_error(error))
+        with jobs_lock:
+            job["errors"].append({"document": document_name, "error": describe_error(error)})
+            persist_job(job)
 
+    try:
+        documents, boilerplate = strip_boilerplate(documents)
+        with jobs_lock:
+            job["boilerplate"] = boilerplate
+            persist_job(job)
 
-    weightings = {criterion: data['weighting'] for criterion, data in criteria_data.items() if data['type'] == 'scored_criteria'}
-    order_mapping = {criterion: data.get('order', 0) for criterion, data in criteria_data.items()}
-    return criteria_data, weightings, order_mapping
+        evaluate_documents_concurrently(documents, criteria_data, on_result=on_result, on_error=on_error)
 
+        with jobs_lock:
+            all_parsed_results = list(job["rows"])
 
+        logger.debug("🔍 Debug: Total parsed results count: %d", len(all_parsed_results))
+
+        # Generate the final evaluation tables
+        df_scores_html, df_yes_no_html = render_evaluation_tables(
+            all_parsed_results, job["weightings"], job["order_mapping"]
+        )
+
+        with jobs_lock:
+            job["evaluation_table"] = df_scores_html
+            job["yes_no_table"] = df_yes_no_html
+            job["status"] = "completed"
+    except Exception as e:
+        logger.exception("❌ Evaluation job %s failed: %s", job['id'], e)
+        with jobs_lock:
+            job["error"] = str(e)
+            job["status"] = "failed"
+    finally:
+        with jobs_lock:
+            job["finished_at"] = time.time()
+            persist_job(job)
+        # Remove this workspace's documents after evaluation; other workspaces are untouched
+        try:
+            get_workspaces().clear_documents(job["workspace_id"])
+            release_workspace_documents(job["workspace_id"])
+            logger.info("✅ Workspace %s documents have been cleared after evaluation.", job['workspace_id'])
+        except (OSError, WorkspaceNotFound) as e:
+            logger.warning("⚠️ Error clearing workspace %s: %s", job['workspace_id'], e)
 
 
 @app.route('/evaluate', methods=['POST'])
@@ -513,181 +1309,252 @@ def evaluate_files():
     if 'evaluation_criteria' not in request.files:
         return jsonify({"error": "Please upload evaluation criteria."}), 400
 
-    criteria_file = request.files['evaluation_criteria']
-    criteria_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(criteria_file.filename))
-    criteria_file.save(criteria_path)
-
-    # Read evaluation criteria
-    if criteria_path.lower().endswith(".xlsx"):
-        df = pd.read_excel(criteria_path)
-    else:
-        df = pd.read_csv(criteria_path, header=None)
+    workspace_id = request.form.get('workspace_id')
+    try:
+        get_workspaces().touch(workspace_id)
+        redacted_folder = get_workspaces().redacted_folder(workspace_id)
+    except WorkspaceNotFound:
+        return jsonify({"error": "Unknown or expired workspace. Please upload the documents again."}), 404
 
-    #scored_criteria, yes_no_criteria, weightings = detect_criteria_type(df)
+    criteria_file = request.files['evaluation_criteria']
+    criteria_filename = secure_filename(criteria_file.filename)
 
-    #testing of detect_criteria_type_new 
-    criteria_data, weightings, order_mapping = detect_criteria_type_new(df)
+    # Read evaluation criteria straight from the upload; parsed sets are cached by file hash
+    try:
+        criteria_set = load_criteria(criteria_file.read(), criteria_filename)
+    except Exception as e:
+        logger.error("❌ Could not read evaluation criteria: %s", e)
+        return jsonify({"error": f"Could not read evaluation criteria: {str(e)}"}), 400
 
-    print(f"✅ Successfully evaluated {len(criteria_data)} criteria with sub-criteria and comments.")
+    criteria_data = criteria_set.as_dict()
+    weightings, order_mapping = criteria_set.weightings, criteria_set.order_mapping
 
+    logger.info("✅ Successfully evaluated %d criteria with sub-criteria and comments.", len(criteria_data))
 
-    all_parsed_results = []
-    evaluations = []
 
-    redacted_files = [f for f in os.listdir(app.config['REDACTED_FOLDER']) if f != ".cleared"]
+    redacted_files = get_workspaces().redacted_files(workspace_id)
 
     if not redacted_files:
-        print("❌ No redacted files found for evaluation!")
+        logger.error("❌ No redacted files found for evaluation!")
         return jsonify({"error": "No redacted files found for evaluation."}), 400
 
-    print(f"✅ Evaluating {len(redacted_files)} redacted files...")
+    logger.info("✅ Evaluating %d redacted files in workspace %s...", len(redacted_files), workspace_id)
 
+    documents = []
     for redacted_filename in redacted_files:
-        redacted_path = os.path.join(app.config['REDACTED_FOLDER'], redacted_filename)
+        redacted_path = os.path.join(redacted_folder, redacted_filename)
 
         with open(redacted_path, 'r', encoding="utf-8") as redacted_file:
-            redacted_text = redacted_file.read()
+            documents.append((redacted_filename, redacted_file.read()))
 
-        evaluation_result = evaluate_document_new(redacted_text, criteria_data, redacted_filename)
-        print(f"✅ Evaluation complete for {redacted_filename} with {len(criteria_data)} criteria.")
+    job = create_evaluation_job(workspace_id, redacted_files, weightings, order_mapping)
 
-        html_match = re.search(r"^(.*?)### JSON Output:", evaluation_result, re.DOTALL)
-        html_part = html_match.group(1).strip() if html_match else evaluation_result.strip()
-        
-        print("✅ Extracted HTML Part:", html_part[:500])  # ✅ Debugging first 500 characters
+    # Report what changed since this workspace's previous evaluation
+    previous_criteria_data = get_workspaces().load_criteria(workspace_id)
+    if previous_criteria_data is not None:
+        added, changed, removed = diff_criteria(previous_criteria_data, criteria_data)
+        job["criteria_changes"] = {"added": added, "changed": changed, "removed": removed}
+        logger.info("🔍 Criteria changes since last run: %s", job['criteria_changes'])
+    get_workspaces().save_criteria(workspace_id, criteria_data)
 
-        # ✅ **NEW: Extract JSON using regex to avoid parsing errors**
-        #json_match = re.search(r'\[\s*{.*?}\s*\]', evaluation_result, re.DOTALL)
-        json_match = re.search(r'(\[.*\])', evaluation_result, re.DOTALL)
+    with jobs_lock:
+        persist_job(job)
+    metrics.submit_in_context(get_job_executor(), run_evaluation_job, job, documents, criteria_data)
 
+    status_url = f"/evaluate/{job['id']}?workspace_id={workspace_id}"
+    return jsonify({"job_id": job["id"], "workspace_id": workspace_id, "status_url": status_url}), 202
 
-        if json_match:
-            json_part = json_match.group(0).strip()  # ✅ **Extract matched JSON content & remove extra spaces**
-            print("✅ Extracted JSON Part:", json_part)  # ✅ **Debugging step**
-        else:
-            print("❌ JSON Extraction Failed. Full AI Response:")
-            print(evaluation_result)  # ❌ **Debugging failure case**
-            return jsonify({"error": "AI response does not contain valid JSON."}), 500
 
-        try:
-            # ✅ Debugging: Print raw JSON before parsing
-            print("🔍 Raw Extracted JSON:")
-            print(json_part)
-
-            # ✅ Check for structural validity before parsing
-            if not json_part.startswith("[") or not json_part.endswith("]"):
-                raise ValueError("Invalid JSON format: Missing opening or closing brackets.")
-
-            parsed_result = json.loads(json_part)  # ✅ Convert JSON text into Python list
-            print("✅ Parsed JSON successfully!")
-
-            # ✅ Fix "comments" fields: Ensure all are lists (not strings)
-            for entry in parsed_result:
-                if "Sub-Criteria" in entry:
-                    for sub in entry["Sub-Criteria"]:
-                        if isinstance(sub.get("comments"), str):  # If "comments" is a string, convert it to a list
-                            sub["comments"] = [sub["comments"]]
-
-            # ✅ Debugging: Print fixed JSON
-            print("✅ Fixed JSON (After Ensuring `comments` are Lists):", parsed_result)
-
-            # ✅ Ensure every entry follows expected structure
-            for entry in parsed_result:
-                if not isinstance(entry, dict) or "Criterion" not in entry:
-                    raise ValueError(f"Invalid JSON structure detected: {entry}")
-
-            # ✅ Store evaluation results
-            evaluations.append({"document": redacted_filename, "evaluation": html_part})
-            all_parsed_results.extend(parsed_result)
-
-        except json.JSONDecodeError as err:
-            print("❌ JSON Parsing Error:", str(err))  # ❌ **Handles JSON decoding errors**
-            print("🔍 Full Extracted JSON (Before Fixing `comments`):", json_part)  # Debugging AI response
-            return jsonify({"error": f"Invalid JSON format from AI response: {str(err)}"}), 500
-
-        except ValueError as ve:
-            print("❌ Structural Error in JSON:", str(ve))
-            return jsonify({"error": f"Invalid JSON structure: {str(ve)}"}), 500
-        
-        # Log JSON to check validity
-        try:
-            json_string = json.dumps({"evaluations": evaluations}, ensure_ascii=False)
-            print("🔄 JSON Response:", json_string)
-        except Exception as e:
-            print("❌ JSON Encoding Error:", e)
+# Page size of /evaluate/<job_id>/documents
+DOCUMENTS_PAGE_SIZE = 20
+DOCUMENTS_PAGE_MAX = 100
 
 
-    # clear REDACTED_FOLDER after evaluation
-    folder_path = app.config['REDACTED_FOLDER']
-    
+def find_job(job_id):
+    """The job named by the request's workspace_id and `job_id`, or None."""
     try:
-        for file in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, file)
-            if os.path.isfile(file_path) or os.path.islink(file_path):
-                os.unlink(file_path)  # Delete file or symlink
-            elif os.path.isdir(file_path):
-                shutil.rmtree(file_path)  # Delete subdirectory
-        print("✅ REDACTED_FOLDER has been cleared after evaluation.")
-    except Exception as e:
-        print(f"⚠️ Error clearing REDACTED_FOLDER: {e}")
+        return job_snapshot(request.args.get("workspace_id"), job_id)
+    except WorkspaceNotFound:
+        return None
+
+
+def document_summary(job, doc):
+    """A finished document without its report, which is fetched from report_url when needed."""
+    return {
+        "index": doc["index"],
+        "document": doc["document"],
+        "bytes": doc.get("bytes"),
+        "report_url": f"/evaluate/{job['id']}/documents/{doc['index']}?workspace_id={job['workspace_id']}",
+    }
+
+
+@app.route('/evaluate/<job_id>')
+def evaluation_status(job_id):
+    """
+    Returns job progress plus every document finished after `since` (the `next` value of the
+    previous poll), so clients only hear about new documents. Reports are not included: clients
+    fetch them from each document's report_url when they are about to show them.
+    """
+    since = request.args.get("since", default=0, type=int)
+
+    job = find_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown evaluation job."}), 404
+
+    new_documents = [document_summary(job, doc) for doc in job["documents"][since:]]
+    status = job["status"]
+    response = {
+        "job_id": job_id,
+        "workspace_id": job["workspace_id"],
+        "status": status,
+        "total": job["total"],
+        "completed": len(job["documents"]) + len(job["errors"]),
+        "next": len(job["documents"]),
+        "documents": new_documents,
+        "errors": job["errors"],
+        "error": job["error"],
+        "criteria_changes": job["criteria_changes"],
+        "boilerplate": job.get("boilerplate", {}),
+        "evaluation_table": job["evaluation_table"],
+        "yes_no_table": job["yes_no_table"],
+    }
+
+    # While running, rebuild the summary tables from the rows received so far
+    if status in ("queued", "running") and new_documents:
+        response["evaluation_table"], response["yes_no_table"] = render_evaluation_tables(
+            job["rows"], job["weightings"], job["order_mapping"]
+        )
+
+    return json_response(response)
+
+
+@app.route('/evaluate/<job_id>/documents')
+def evaluation_documents(job_id):
+    """
+    One page of a job's finished documents, in completion order: `offset` and `limit` (at most
+    DOCUMENTS_PAGE_MAX). `next_offset` is null on the last page of a finished job.
+    """
+    job = find_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown evaluation job."}), 404
+
+    offset = max(0, request.args.get("offset", default=0, type=int))
+    limit = min(max(1, request.args.get("limit", default=DOCUMENTS_PAGE_SIZE, type=int)), DOCUMENTS_PAGE_MAX)
+    page = job["documents"][offset:offset + limit]
+    finished = job["status"] in ("completed", "failed")
+    next_offset = offset + len(page)
+
+    return json_response({
+        "job_id": job_id,
+        "status": job["status"],
+        "total": job["total"],
+        "offset": offset,
+        "limit": limit,
+        "next_offset": None if finished and next_offset >= len(job["documents"]) else next_offset,
+        "documents": [document_summary(job, doc) for doc in page],
+    })
 
 
-    print("🔍 Debug: all_parsed_results (first 5 entries):", all_parsed_results[:5])
-    print("🔍 Debug: Total parsed results count:", len(all_parsed_results))
+@app.route('/evaluate/<job_id>/documents/<int:index>')
+def evaluation_report(job_id, index):
+    """The HTML report of one document. Reports never change once written, so clients may keep them."""
+    job = find_job(job_id)
+    doc = next((doc for doc in job["documents"] if doc["index"] == index), None) if job else None
+    if doc is None:
+        return jsonify({"error": "Unknown evaluation report."}), 404
 
+    html_part = get_workspaces().load_report(job["workspace_id"], job_id, index)
+    if html_part is None:
+        # Jobs saved before reports had their own files kept them inline
+        html_part = doc.get("evaluation")
+    if html_part is None:
+        return jsonify({"error": "Unknown evaluation report."}), 404
 
-    print("🔍 Debug: Full JSON Parsed Data Before Creating DataFrame:")
-    for entry in all_parsed_results:
-      print(entry)
+    return cacheable_response(html_part, "text/html", cache_control="private, max-age=3600")
 
-    # Generate and return the evaluation table
-    df_scores, df_yes_no = generate_evaluation_tables(all_parsed_results, weightings, order_mapping)
 
-    print("🔍 Debug: df_scores shape:", df_scores.shape)
-    print("🔍 Debug: df_yes_no shape:", df_yes_no.shape)
+@app.before_request
+def start_request_trace():
+    g.request_start = time.perf_counter()
+    g.trace_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    metrics.start_trace(g.trace_id)
 
-    # Convert to HTML only after checking emptiness
-    #df_scores_html = df_scores.to_html(classes='table table-bordered', escape=False) if not df_scores.empty else "<p>No scored criteria.</p>"
-    
-    if not df_scores.empty:
-        # Identify numeric columns (excluding 'Criterion')
-        numeric_cols = df_scores.columns.difference(["Criterion"])
-        
-        # Apply formatting to numeric columns to display 1 decimal place, only if the value is numeric
-        styled_df = df_scores.style.format({
-            col: lambda x: "{:.1f}".format(x) if isinstance(x, (int, float)) else x 
-            for col in numeric_cols
-        })
-        
-        # Right-align all numeric columns
-        styled_df = styled_df.set_properties(
-            subset=numeric_cols,
-            **{'text-align': 'right'}
-        )
-        
-        # Define a function to bold the Totals row
-        def bold_total(row):
-            return ['font-weight: bold' if row["Criterion"] == "Total" else '' for _ in row.index]
-        
-        # Apply the bold formatting row-wise
-        styled_df = styled_df.apply(bold_total, axis=1)
-        
-        # Render the styled DataFrame as HTML
-        df_scores_html = styled_df.to_html()
-    else:
-        df_scores_html = "<p>No scored criteria.</p>"
 
-    
-    df_yes_no_html = df_yes_no.to_html(classes='table table-bordered', escape=False) if not df_yes_no.empty else ""
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    seconds = time.perf_counter() - g.get("request_start", time.perf_counter())
+    metrics.HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.HTTP_SECONDS.observe(seconds, endpoint=endpoint)
+    metrics.log_span("http", seconds, method=request.method, path=request.path, status=response.status_code)
+    response.headers["X-Request-ID"] = g.get("trace_id", "")
+    return response
 
 
-    return jsonify({
-        "evaluation_table": df_scores_html,
-        "yes_no_table": df_yes_no_html,
-        "evaluations": evaluations
-    })
+metrics.REGISTRY.gauge("tender_llm_queue_depth", "Model calls waiting for a scheduler slot.",
+                       lambda: get_llm_scheduler().stats()["queue_depth"])
+metrics.REGISTRY.gauge("tender_llm_in_flight", "Model calls currently being answered.",
+                       lambda: get_llm_scheduler().stats()["in_flight"])
+
+
+def count_running_jobs():
+    with jobs_lock:
+        return sum(job["status"] in ("queued", "running") for job in jobs.values())
+
+
+metrics.REGISTRY.gauge("tender_evaluation_jobs_active", "Queued or running evaluation jobs in this process.",
+                       count_running_jobs)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Stage timings, model calls, tokens and cost in the Prometheus text format (see metrics.py)."""
+    return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/scheduler/stats')
+def scheduler_stats():
+    """Queue depth, waits and throttling of model calls (see llm_scheduler.py)."""
+    return jsonify(get_llm_scheduler().stats())
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Hit/miss counters and size of the evaluation cache, the document store and the page cache."""
+    document_store = get_document_store()
+    document_stats = {"enabled": False} if document_store is None else {"enabled": True, **document_store.stats()}
+    try:
+        page_cache = ingestion_page_cache()
+        page_stats = {"enabled": False} if page_cache is None else {"enabled": True, **page_cache.stats()}
+    except sqlite3.Error as e:
+        page_stats = {"enabled": True, "error": str(e)}
+    extra = {"document_store": document_stats, "page_cache": page_stats}
+    evaluation_cache = get_evaluation_cache()
+    if evaluation_cache is None:
+        return jsonify({"enabled": False, **extra})
+    return jsonify({"enabled": True, **evaluation_cache.stats(), **extra})
+
+
+# Cold-start cost of a process: should stay well under a second with the lazy imports above
+IMPORT_SECONDS = time.perf_counter() - _import_started
+metrics.REGISTRY.gauge("tender_app_import_seconds", "Time taken to import app.py in this process.",
+                       lambda: IMPORT_SECONDS)
+
+
+def create_app(housekeeping=True):
+    """
+    Returns the Flask application, starting workspace housekeeping in this process unless
+    `housekeeping` is False. For servers that run a single process (`python app.py`, other
+    WSGI servers); gunicorn serves `app:app` and calls this once in its master (gunicorn.conf.py).
+    """
+    if housekeeping:
+        start_housekeeping()
+    logger.info("🚀 app.py imported in %.2fs (pid %d).", IMPORT_SECONDS, os.getpid())
+    if app.config['LLM_BACKEND'] == "openai" and not os.getenv("OPENAI_API_KEY"):
+        logger.warning("⚠️ OPENAI_API_KEY is not set: evaluations will fail until it is.")
+    return app
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=True, port=5002)
+    create_app().run(host='0.0.0.0', debug=True, port=5002)
 
@@ -0,0 +1,281 @@
+"""
+Batch evaluation of a whole tender folder from the command line, without the browser.
+
+    python batch_evaluate.py "documents/advisory rfq" "documents/advisory rfq/AdvisoryEvalMatrix.xlsx" \
+        --output results/advisory --exclude "Tender Brief*" "Conditions of Tendering*"
+
+Every .pdf/.docx response in the folder is extracted and redacted in a process pool
+(ingest_document, i.e. extract_text_* and the redaction rules) and evaluated in threads
+(evaluate_documents_concurrently, i.e. evaluate_document_new with retries and the
+evaluation cache). The model settings come from the same environment variables as the
+web app.
+
+Boilerplate (text copied from BOILERPLATE_TENDER_DOCUMENTS or shared between responses)
+is collapsed by strip_boilerplate over every redacted response in the folder at once, as
+the web app does for one upload, so the same folder gives the same prompts and cache
+keys either way. Evaluation therefore starts once every document is redacted. With
+BOILERPLATE_ENABLED=false each document is evaluated as soon as it is redacted.
+
+Progress is saved to <output>/checkpoint.json after every step. Running the same command
+again resumes: evaluated documents are skipped, redacted ones go straight to evaluation,
+and failed ones are retried. A document whose file changed, or a different criteria
+spreadsheet, is processed again.
+
+Outputs in --output:
+
+  redacted/<name>_redacted.txt   redacted text sent to the model
+  reports/<name>.html            per-bidder evaluation report
+  summary.html                   summary scoring and yes/no tables
+  summary_scores.csv             scores and weighted scores (scoring.score_rows)
+  summary_yes_no.csv             yes/no answers (scoring.yes_no_rows)
+  checkpoint.json                per-document state, rows and errors
+"""
+import argparse
+import csv
+import fnmatch
+import hashlib
+import html
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+CHECKPOINT_VERSION = 1
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as document_file:
+        for chunk in iter(lambda: document_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_documents(folder, exclude):
+    """The .pdf/.docx files directly in `folder`, skipping Office lock files and --exclude patterns."""
+    names = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(('.pdf', '.docx')) or name.startswith("~$"):
+            continue
+        if any(fnmatch.fnmatch(name, pattern) for pattern in exclude):
+            continue
+        if os.path.isfile(os.path.join(folder, name)):
+            names.append(name)
+    return names
+
+
+def load_checkpoint(path, criteria_digest):
+    from workspaces import read_json
+
+    if not os.path.exists(path):
+        return {"version": CHECKPOINT_VERSION, "criteria_digest": criteria_digest, "documents": {}}
+
+    checkpoint = read_json(path)
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        print(f"⚠️ {path} was written by another version, starting again.")
+        return {"version": CHECKPOINT_VERSION, "criteria_digest": criteria_digest, "documents": {}}
+
+    if checkpoint.get("criteria_digest") != criteria_digest:
+        # Redacted text is still valid; only the evaluations depend on the criteria
+        print("🔍 Criteria spreadsheet changed since the checkpoint, re-evaluating every document.")
+        for state in checkpoint["documents"].values():
+            if state["status"] in ("evaluated", "failed") and state.get("redacted_file"):
+                state.update(status="redacted", rows=None, report=None, error=None)
+        checkpoint["criteria_digest"] = criteria_digest
+
+    return checkpoint
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", encoding="utf-8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        # NaN (no score returned) is left empty, as pandas wrote it
+        writer.writerows([["" if value != value else value for value in row] for row in rows])
+
+
+def write_reports(output, checkpoint, criteria_set):
+    """Writes the summary tables from every evaluated document in the checkpoint."""
+    from scoring import build_score_table, render_scores_html, render_yes_no_html, score_rows, yes_no_rows
+
+    rows = [
+        row
+        for state in checkpoint["documents"].values() if state["status"] == "evaluated"
+        for row in state["rows"]
+    ]
+    if not rows:
+        print("❌ No documents were evaluated, no summary written.")
+        return
+
+    # The table the web summary is rendered from, so the HTML and the CSVs always agree
+    table = build_score_table(rows, criteria_set.weightings, criteria_set.order_mapping)
+    with open(os.path.join(output, "summary.html"), "w", encoding="utf-8") as summary_file:
+        summary_file.write(
+            "<html><head><meta charset='utf-8'><title>Summary Scoring Table</title></head><body>"
+            f"<h3>Summary Scoring Table</h3>{render_scores_html(table)}{render_yes_no_html(table)}</body></html>"
+        )
+
+    write_csv(os.path.join(output, "summary_scores.csv"), *score_rows(table))
+    write_csv(os.path.join(output, "summary_yes_no.csv"), *yes_no_rows(table))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="folder of tender responses (.pdf/.docx)")
+    parser.add_argument("criteria", help="criteria spreadsheet (.xlsx or .csv)")
+    parser.add_argument("--output", default=None, help="output folder (default: <folder>/evaluation)")
+    parser.add_argument("--exclude", nargs="*", default=[], help="filename patterns to skip, e.g. 'Tender Brief*'")
+    parser.add_argument("--ingest-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--eval-workers", type=int, default=None, help="documents evaluated at once (default: EVAL_MAX_WORKERS)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(args.folder, "evaluation")
+    redacted_folder = os.path.join(output, "redacted")
+    reports_folder = os.path.join(output, "reports")
+    os.makedirs(redacted_folder, exist_ok=True)
+    os.makedirs(reports_folder, exist_ok=True)
+    checkpoint_path = os.path.join(output, "checkpoint.json")
+
+    import app as tender_app
+    from criteria import load_criteria
+    from document_processing import ingest_document
+    from workspaces import write_json_atomic
+
+    with open(args.criteria, "rb") as criteria_file:
+        criteria_set = load_criteria(criteria_file.read(), os.path.basename(args.criteria))
+    criteria_data = criteria_set.as_dict()
+
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = load_checkpoint(checkpoint_path, criteria_set.digest)
+    states = checkpoint["documents"]
+
+    def save_checkpoint():
+        checkpoint["updated_at"] = time.time()
+        write_json_atomic(checkpoint_path, checkpoint)
+
+    # Work out what is left to do for each document; files no longer in the folder are dropped
+    filenames = find_documents(args.folder, args.exclude)
+    for filename in set(states) - set(filenames):
+        del states[filename]
+
+    to_ingest, to_evaluate = [], []
+    for filename in filenames:
+        digest = file_digest(os.path.join(args.folder, filename))
+        state = states.get(filename)
+        if state is None or state["digest"] != digest:
+            state = states[filename] = {"digest": digest, "status": "pending"}
+        redacted_present = state.get("redacted_file") and os.path.exists(os.path.join(redacted_folder, state["redacted_file"]))
+
+        if state["status"] == "evaluated":
+            continue
+        if redacted_present:
+            to_evaluate.append(filename)
+        else:
+            state.update(status="pending", redacted_file=None)
+            to_ingest.append(filename)
+    save_checkpoint()
+
+    done = sum(state["status"] == "evaluated" for state in states.values())
+    print(f"✅ {len(states)} documents: {done} already evaluated, {len(to_evaluate)} to evaluate, "
+          f"{len(to_ingest)} to extract and redact.")
+
+    eval_workers = args.eval_workers or tender_app.app.config['EVAL_MAX_WORKERS']
+    # Boilerplate is found across all the responses, so evaluation waits for every ingest
+    share_boilerplate = tender_app.app.config['BOILERPLATE_ENABLED']
+    prompt_texts = {}  # filename -> redacted text with boilerplate collapsed
+    start = time.perf_counter()
+
+    def read_redacted(filename):
+        with open(os.path.join(redacted_folder, states[filename]["redacted_file"]), "r", encoding="utf-8") as document_file:
+            return document_file.read()
+
+    def collapse_shared_text():
+        """strip_boilerplate over every redacted response, evaluated or not, as the web app does for an upload."""
+        names = [
+            name for name in filenames
+            if states[name].get("redacted_file") and states[name]["status"] in ("redacted", "evaluated")
+        ]
+        documents, boilerplate = tender_app.strip_boilerplate(
+            [(states[name]["redacted_file"], read_redacted(name)) for name in names]
+        )
+        for name, (_, document_text) in zip(names, documents):
+            prompt_texts[name] = document_text
+        if boilerplate:
+            words = sum(item["words"] for item in boilerplate.values())
+            print(f"✂️ Collapsed {words} words of boilerplate in {len(boilerplate)} documents.")
+
+    def evaluate(filename):
+        """Evaluates one redacted document with the app's evaluation path (mode, retries, cache)."""
+        document_text = prompt_texts[filename] if share_boilerplate else read_redacted(filename)
+        documents = [(states[filename]["redacted_file"], document_text)]
+        return tender_app.evaluate_documents_concurrently(documents, criteria_data)[0]
+
+    with ProcessPoolExecutor(max_workers=args.ingest_workers) as ingest_pool, \
+            ThreadPoolExecutor(max_workers=eval_workers) as eval_pool:
+        running = {}  # future -> (stage, filename)
+        waiting = list(to_evaluate)  # Redacted, not yet handed to the evaluation threads
+        for filename in to_ingest:
+            future = ingest_pool.submit(ingest_document, os.path.join(args.folder, filename), filename, redacted_folder)
+            running[future] = ("ingest", filename)
+
+        try:
+            while True:
+                ingesting = any(stage == "ingest" for stage, _ in running.values())
+                if waiting and not (share_boilerplate and ingesting):
+                    if share_boilerplate:
+                        collapse_shared_text()
+                    for filename in waiting:
+                        running[eval_pool.submit(evaluate, filename)] = ("evaluate", filename)
+                    waiting = []
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, filename = running.pop(future)
+                    state = states[filename]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"❌ Could not {stage} {filename}: {e}")
+                        state.update(status="failed", error=f"{stage}: {e}")
+                        continue
+
+                    if stage == "ingest":
+                        print(f"✅ Redacted {filename}")
+                        state.update(status="redacted", redacted_file=result.redacted_filename, error=None)
+                        # Without shared boilerplate, evaluation starts while other documents are still being extracted
+                        waiting.append(filename)
+                    else:
+                        html_part, parsed_result = result
+                        report = f"{os.path.splitext(filename)[0]}.html"
+                        with open(os.path.join(reports_folder, report), "w", encoding="utf-8") as report_file:
+                            report_file.write(
+                                f"<html><head><meta charset='utf-8'><title>{html.escape(filename)}</title></head>"
+                                f"<body><h1>{html.escape(os.path.splitext(filename)[0])}</h1>{html_part}</body></html>"
+                            )
+                        print(f"✅ Evaluated {filename}")
+                        state.update(status="evaluated", rows=parsed_result, report=report, error=None)
+                save_checkpoint()
+        except KeyboardInterrupt:
+            print("\n⏸️ Interrupted. Progress is saved; run the same command again to resume.")
+            for future in running:
+                future.cancel()
+            save_checkpoint()
+            sys.exit(130)
+
+    write_reports(output, checkpoint, criteria_set)
+
+    failed = {name: state["error"] for name, state in states.items() if state["status"] == "failed"}
+    evaluated = sum(state["status"] == "evaluated" for state in states.values())
+    print(f"✅ {evaluated} of {len(states)} documents evaluated in {time.perf_counter() - start:.1f}s. "
+          f"Results in {output}")
+    for name, error in failed.items():
+        print(f"❌ {name}: {error}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+End-to-end evaluation throughput test against the mock LLM backend. No tokens are spent.
+
+    python benchmarks/evaluation_load_test.py --documents 20 --workers 1 4 8 16 --latency 2 --rpm 60
+    python benchmarks/evaluation_load_test.py --documents 20 --workers 8 --rpm 60 --client-rpm 60
+
+Synthetic page-tagged responses are evaluated with evaluate_documents_concurrently
+for each --workers setting, using the criteria spreadsheet given by --criteria. The
+mock backend's latency, error rate and rate limit are configurable, so retry and
+concurrency limits can be explored on a laptop. --client-rpm / --client-tpm set the
+scheduler's own limits (llm_scheduler.py), so throttling before sending can be compared
+with retrying 429s. The evaluation cache is disabled.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_document(index, pages):
+    return "\n".join(
+        f"(Page {page}) Response {index} describes relevant experience, methodology, team capability, "
+        f"insurance and pricing for the services requested in the tender, page {page}."
+        for page in range(1, pages + 1)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--criteria", default=os.path.join("documents", "advisory rfq", "AdvisoryEvalMatrix.xlsx"))
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0, help="mock server limit, answered with 429s")
+    parser.add_argument("--client-rpm", type=int, default=0, help="LLM_REQUESTS_PER_MINUTE")
+    parser.add_argument("--client-tpm", type=int, default=0, help="LLM_TOKENS_PER_MINUTE")
+    args = parser.parse_args()
+
+    # Configure the app before importing it
+    os.environ["LLM_BACKEND"] = "mock"
+    os.environ["EVAL_CACHE_ENABLED"] = "false"
+    os.environ["MOCK_LLM_LATENCY"] = str(args.latency)
+    os.environ["MOCK_LLM_JITTER"] = str(args.jitter)
+    os.environ["MOCK_LLM_ERROR_RATE"] = str(args.error_rate)
+    os.environ["MOCK_LLM_RATE_LIMIT_RPM"] = str(args.rpm)
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.client_rpm)
+    os.environ["LLM_TOKENS_PER_MINUTE"] = str(args.client_tpm)
+
+    import app as tender_app
+    from criteria import load_criteria
+
+    with open(args.criteria, "rb") as criteria_file:
+        criteria_data = load_criteria(criteria_file.read(), args.criteria).as_dict()
+    documents = [(f"Bidder{i}_redacted.txt", synthetic_document(i, args.pages)) for i in range(args.documents)]
+
+    print(f"\n{'workers':>8} {'seconds':>9} {'docs/s':>8} {'p50 s':>7} {'p95 s':>7} {'failed':>7}")
+    for workers in args.workers:
+        tender_app.app.config['EVAL_MAX_WORKERS'] = workers
+        finished = []
+        failed = []
+        start = time.perf_counter()
+
+        def on_result(index, document_name, html_part, parsed_result):
+            finished.append(time.perf_counter() - start)
+
+        def on_error(index, document_name, error):
+            failed.append(document_name)
+
+        try:
+            tender_app.evaluate_documents_concurrently(documents, criteria_data, on_result=on_result, on_error=on_error)
+        except Exception as e:
+            failed.append(str(e))
+        elapsed = time.perf_counter() - start
+
+        p50 = statistics.median(finished) if finished else 0.0
+        p95 = sorted(finished)[int(len(finished) * 0.95) - 1] if finished else 0.0
+        print(f"{workers:>8} {elapsed:>9.2f} {len(finished) / elapsed:>8.2f} {p50:>7.2f} {p95:>7.2f} {len(failed):>7}")
+
+    print(f"\nscheduler: {tender_app.get_llm_scheduler().stats()}")
+
+
+if __name__ == "__main__":
+    main()
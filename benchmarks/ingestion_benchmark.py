@@ -0,0 +1,260 @@
+"""
+Extraction and redaction benchmark / regression suite. Runs fully offline.
+
+    python benchmarks/ingestion_benchmark.py [folders ...] [--scale 1 5 20] [--compare results/old.json]
+
+For every PDF/Word file in the given folders (default: documents/ and uploads/),
+and for synthetic copies scaled up by each --scale factor, it measures:
+
+  * extraction (extract_text_from_pdf / extract_text_from_docx): pages/s, MB/s, peak memory
+  * each redaction function (redact_sensitive_data, redact_pii, redact_persons_name)
+    and the single-pass engine: MB/s, peak memory
+  * the upload path (ingest_document), which extracts and redacts page by page and
+    writes as it goes: pages/s and peak memory, to compare with extracting the whole text
+  * the time split per redaction pattern
+  * a digest of each redaction output, so changes in behaviour show up between commits
+
+Results are written as JSON to benchmarks/results/. With --compare, the run is
+checked against an earlier results file and the exit status is 1 if any stage
+got slower than --tolerance or any redaction output changed.
+"""
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure real extraction: with the page cache, every repeat after the first would be a cache hit
+os.environ["PAGE_CACHE_ENABLED"] = "false"
+
+import PyPDF2  # noqa: E402
+import docx  # noqa: E402
+
+from document_processing import (  # noqa: E402
+    extract_text_from_docx, extract_text_from_pdf, extracted_filename_for, ingest_document,
+    redact_persons_name, redact_pii, redact_sensitive_data
+)
+from redaction_engine import PATTERNS, redact  # noqa: E402
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def measure(func, repeat=1):
+    """Runs func `repeat` times; returns (best seconds, peak bytes allocated, result)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    # Memory is traced on a separate run so tracing overhead doesn't skew the timings
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def scaled_copy(path, scale, folder):
+    """Writes a copy of a PDF/Word file with its pages/paragraphs repeated `scale` times."""
+    name, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(folder, f"{name}_x{scale}{ext}")
+
+    if ext.lower() == ".pdf":
+        reader = PyPDF2.PdfReader(path)
+        writer = PyPDF2.PdfWriter()
+        for _ in range(scale):
+            for page in reader.pages:
+                writer.add_page(page)
+        with open(target, "wb") as out:
+            writer.write(out)
+    else:
+        source = docx.Document(path)
+        document = docx.Document(path)
+        texts = [para.text for para in source.paragraphs]
+        for _ in range(scale - 1):
+            for text in texts:
+                document.add_paragraph(text)
+        document.save(target)
+
+    return target
+
+
+def benchmark_file(path, repeat):
+    filename = os.path.basename(path)
+    file_bytes = os.path.getsize(path)
+
+    if path.lower().endswith(".pdf"):
+        with open(path, "rb") as pdf_file:
+            pages = len(PyPDF2.PdfReader(pdf_file).pages)
+        extract = extract_text_from_pdf
+    else:
+        pages = 1
+        extract = extract_text_from_docx
+
+    seconds, peak, text = measure(lambda: extract(path), repeat)
+    text_mb = len(text.encode("utf-8")) / 1e6
+    result = {
+        "file": path,
+        "file_bytes": file_bytes,
+        "pages": pages,
+        "text_chars": len(text),
+        "stages": {
+            "extract": {
+                "seconds": seconds,
+                "pages_per_second": pages / seconds if seconds else None,
+                "mb_per_second": file_bytes / 1e6 / seconds if seconds else None,
+                "peak_bytes": peak,
+            }
+        },
+        "output_digests": {},
+    }
+
+    # The legacy functions run chained, as upload_files used to call them
+    stages = [
+        ("redact_sensitive_data", lambda t: redact_sensitive_data(t)),
+        ("redact_pii", lambda t: redact_pii(t)),
+        ("redact_persons_name", lambda t: redact_persons_name(t, filename)),
+    ]
+    current = text
+    for name, func in stages:
+        stage_input = current
+        seconds, peak, current = measure(lambda: func(stage_input), repeat)
+        result["stages"][name] = {
+            "seconds": seconds,
+            "mb_per_second": text_mb / seconds if seconds else None,
+            "peak_bytes": peak,
+        }
+    result["output_digests"]["legacy"] = hashlib.sha256(current.encode("utf-8")).hexdigest()
+
+    seconds, peak, (engine_output, spans) = measure(lambda: redact(text, filename), repeat)
+    result["stages"]["redaction_engine"] = {
+        "seconds": seconds,
+        "mb_per_second": text_mb / seconds if seconds else None,
+        "peak_bytes": peak,
+        "spans": len(spans),
+    }
+    result["output_digests"]["redaction_engine"] = hashlib.sha256(engine_output.encode("utf-8")).hexdigest()
+
+    with tempfile.TemporaryDirectory() as folder:
+        extracted_path = os.path.join(folder, extracted_filename_for(filename))
+        seconds, peak, _ = measure(lambda: ingest_document(path, filename, folder, extracted_path), repeat)
+    result["stages"]["ingest_document"] = {
+        "seconds": seconds,
+        "pages_per_second": pages / seconds if seconds else None,
+        "peak_bytes": peak,
+    }
+
+    # Per-pattern split: a full scan of the extracted text with each pattern on its own
+    result["pattern_seconds"] = {}
+    for name, pattern in PATTERNS.items():
+        compiled = re.compile(pattern)
+        start = time.perf_counter()
+        for _ in compiled.finditer(text):
+            pass
+        result["pattern_seconds"][name] = time.perf_counter() - start
+
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous, tolerance):
+    """Prints stages that slowed down by more than `tolerance` and outputs that changed. Returns True if clean."""
+    previous_files = {(r["file"], r["scale"]): r for r in previous["files"]}
+    clean = True
+
+    for result in current["files"]:
+        old = previous_files.get((result["file"], result["scale"]))
+        if old is None:
+            continue
+
+        for stage, timing in result["stages"].items():
+            old_timing = old["stages"].get(stage)
+            if not old_timing or not old_timing["seconds"]:
+                continue
+            ratio = timing["seconds"] / old_timing["seconds"]
+            if ratio > 1 + tolerance:
+                clean = False
+                print(f"⚠️ {result['file']} x{result['scale']} {stage}: {ratio:.2f}x slower")
+
+        for engine, digest in result["output_digests"].items():
+            if old["output_digests"].get(engine) not in (None, digest):
+                clean = False
+                print(f"⚠️ {result['file']} x{result['scale']} {engine}: redacted output changed")
+
+    return clean
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folders", nargs="*", default=["documents", "uploads"])
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    paths = sorted(
+        path for folder in args.folders for path in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+        if path.lower().endswith((".pdf", ".docx")) and not os.path.basename(path).startswith("~$")
+    )
+
+    run = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "files": [],
+    }
+
+    with tempfile.TemporaryDirectory() as scratch:
+        for path in paths:
+            for scale in args.scale:
+                try:
+                    target = path if scale == 1 else scaled_copy(path, scale, scratch)
+                    result = benchmark_file(target, args.repeat)
+                except Exception as e:
+                    print(f"❌ {path} x{scale}: {e}")
+                    continue
+
+                result["file"] = path
+                result["scale"] = scale
+                run["files"].append(result)
+
+                extract = result["stages"]["extract"]
+                print(f"{path[:45]:<45} x{scale:<3} extract {extract['pages_per_second'] or 0:8.1f} pages/s "
+                      f"{extract['mb_per_second'] or 0:7.2f} MB/s | redaction "
+                      + " ".join(f"{name}={timing['seconds'] * 1000:.1f}ms"
+                                 for name, timing in result["stages"].items() if name != "extract"))
+
+    output = args.output or os.path.join(RESULTS_FOLDER, f"{run['timestamp'].replace(':', '')}-{run['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as out:
+        json.dump(run, out, indent=2)
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as previous_file:
+            previous = json.load(previous_file)
+        if not compare(run, previous, args.tolerance):
+            sys.exit(1)
+        print("✅ No regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
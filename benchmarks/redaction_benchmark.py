@@ -0,0 +1,74 @@
+"""
+Compares the single-pass redaction engine with the chained legacy passes on the sample tenders.
+
+    python benchmarks/redaction_benchmark.py [--repeat 3] [folders ...]
+
+For every PDF/Word file it prints the time taken by each engine and whether the
+outputs agree. "(Page N)" markers are ignored when comparing, since the engine
+keeps them and the legacy passes do not.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_processing import extract_text, redact_persons_name, redact_pii, redact_sensitive_data  # noqa: E402
+from redaction_engine import redact  # noqa: E402
+
+
+def legacy_redact(text, filename):
+    text = redact_sensitive_data(text)
+    text = redact_pii(text)
+    return redact_persons_name(text, filename)
+
+
+def best_time(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folders", nargs="*", default=["documents", "uploads"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = sorted(
+        path for folder in args.folders for path in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+        if path.lower().endswith((".pdf", ".docx")) and not os.path.basename(path).startswith("~$")
+    )
+
+    total_legacy = total_engine = 0.0
+    print(f"{'document':<50} {'chars':>9} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8}  same")
+    for path in paths:
+        filename = os.path.basename(path)
+        try:
+            text = extract_text(path, filename)
+        except Exception as e:
+            print(f"{filename:<50} skipped: {e}")
+            continue
+
+        legacy_time, legacy_output = best_time(lambda: legacy_redact(text, filename), args.repeat)
+        engine_time, (engine_output, _) = best_time(lambda: redact(text, filename), args.repeat)
+        same = engine_output.replace("(Page ", "([REDACTED NAME] ") == legacy_output
+        total_legacy += legacy_time
+        total_engine += engine_time
+
+        print(f"{filename[:50]:<50} {len(text):>9} {legacy_time * 1000:>10.1f} {engine_time * 1000:>10.1f} "
+              f"{legacy_time / max(engine_time, 1e-9):>7.1f}x  {'yes' if same else 'NO'}")
+
+    if total_engine:
+        print(f"\nTotal: legacy {total_legacy * 1000:.1f} ms, engine {total_engine * 1000:.1f} ms, "
+              f"speedup {total_legacy / total_engine:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Compares the NumPy scoring tables (scoring.py) with the previous pandas path:
+generate_evaluation_tables (kept here as the baseline, no longer in app.py) followed
+by Styler rendering.
+
+    python benchmarks/scoring_benchmark.py --criteria 50 --bidders 20 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from scoring import build_score_table, render_scores_html, render_yes_no_html  # noqa: E402
+
+
+def synthetic_rows(n_criteria, n_bidders, n_yes_no, seed=0):
+    rng = random.Random(seed)
+    weightings = {f"Criterion {i}": rng.choice([5.0, 10.0, 15.0, 20.0]) for i in range(n_criteria)}
+    order_mapping = {name: i for i, name in enumerate(weightings)}
+    yes_no = [f"Compliance {i}" for i in range(n_yes_no)]
+    order_mapping.update({name: n_criteria + i for i, name in enumerate(yes_no)})
+
+    rows = []
+    for b in range(n_bidders):
+        document = f"Bidder{b}_redacted.txt"
+        for name, weighting in weightings.items():
+            rows.append({"Criterion": name, f"{document} Score": rng.randint(1, 10), "Weighting (%)": weighting})
+        for name in yes_no:
+            rows.append({"Criterion": name, f"{document} Yes/No": rng.choice(["Yes", "No"]), "Weighting (%)": None})
+    return rows, weightings, order_mapping
+
+
+def generate_evaluation_tables(evaluations, weightings, order_mapping):
+    """The pandas summary tables app.py built before scoring.py: (scores DataFrame, yes/no DataFrame)."""
+    df = pd.DataFrame(evaluations)
+
+    if df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Rename columns to remove "_redacted.txt"
+    df.columns = [col.replace("_redacted.txt", "").strip() for col in df.columns]
+
+    score_cols = [col for col in df.columns if "Score" in col]
+    yes_no_cols = [col for col in df.columns if "Yes/No" in col]
+
+    if not score_cols and not yes_no_cols:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Group by Criterion to ensure each appears only once
+    grouped_df = df.groupby("Criterion").first().reset_index()
+
+    # Map weightings and order values from the original spreadsheet
+    grouped_df["Weighting (%)"] = grouped_df["Criterion"].map(weightings)
+    grouped_df["Order"] = grouped_df["Criterion"].map(order_mapping)
+
+    # Sort by the order column
+    grouped_df = grouped_df.sort_values("Order")
+
+    if score_cols:
+        scored_df = grouped_df.dropna(subset=score_cols).filter(["Criterion"] + score_cols + ["Weighting (%)"])
+        for score_col in score_cols:
+            weighted_col = f"Weighted {score_col}"
+            scored_df[weighted_col] = (scored_df[score_col] * scored_df["Weighting (%)"]) / 100
+
+        total_scores = pd.DataFrame(scored_df[score_cols + [f"Weighted {col}" for col in score_cols]].sum()).T
+        total_scores.insert(0, "Criterion", "Total")
+        total_scores["Weighting (%)"] = ""
+        scored_df = pd.concat([scored_df, total_scores], ignore_index=True)
+    else:
+        scored_df = pd.DataFrame()
+
+    yes_no_df = grouped_df.dropna(subset=yes_no_cols).filter(["Criterion"] + yes_no_cols) if yes_no_cols else pd.DataFrame()
+
+    return scored_df, yes_no_df
+
+
+def pandas_tables(rows, weightings, order_mapping):
+    """The rendering evaluate_files used before scoring.py."""
+    df_scores, df_yes_no = generate_evaluation_tables(rows, weightings, order_mapping)
+    numeric_cols = df_scores.columns.difference(["Criterion"])
+    styled_df = df_scores.style.format({
+        col: lambda x: "{:.1f}".format(x) if isinstance(x, (int, float)) else x
+        for col in numeric_cols
+    })
+    styled_df = styled_df.set_properties(subset=numeric_cols, **{'text-align': 'right'})
+    styled_df = styled_df.apply(
+        lambda row: ['font-weight: bold' if row["Criterion"] == "Total" else '' for _ in row.index], axis=1
+    )
+    return styled_df.to_html(), df_yes_no.to_html(classes='table table-bordered', escape=False)
+
+
+def numpy_tables(rows, weightings, order_mapping):
+    table = build_score_table(rows, weightings, order_mapping)
+    return render_scores_html(table), render_yes_no_html(table)
+
+
+def best_time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--criteria", type=int, default=50)
+    parser.add_argument("--bidders", type=int, default=20)
+    parser.add_argument("--yes-no", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows, weightings, order_mapping = synthetic_rows(args.criteria, args.bidders, args.yes_no)
+
+    pandas_seconds = best_time(lambda: pandas_tables(rows, weightings, order_mapping), args.repeat)
+    numpy_seconds = best_time(lambda: numpy_tables(rows, weightings, order_mapping), args.repeat)
+
+    print(f"{args.criteria} criteria x {args.bidders} bidders ({len(rows)} rows)")
+    print(f"pandas + Styler: {pandas_seconds * 1000:8.1f} ms")
+    print(f"scoring.py:      {numpy_seconds * 1000:8.1f} ms  ({pandas_seconds / numpy_seconds:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
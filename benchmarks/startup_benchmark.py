@@ -0,0 +1,119 @@
+"""
+Cold start benchmark: how long a fresh process takes to import app.py and answer its first request.
+
+    python benchmarks/startup_benchmark.py [--runs 5] [--max-import-seconds 0.5]
+
+Each run starts a new interpreter, so nothing is warm except the OS file cache. It
+reports the median import time, the time to the first response from / (through
+Flask's test client), and the slowest modules from `python -X importtime`. The exit
+status is 1 if importing app.py loaded a module that should be imported lazily
+(pandas, openai, PyPDF2, python-docx) or took longer than --max-import-seconds,
+so a new eager import shows up before it slows down every gunicorn worker.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported by the code that needs them; none of them should be loaded by `import app`
+LAZY_MODULES = ("pandas", "openai", "PyPDF2", "docx")
+
+PROBE = """
+import json, sys, threading, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get("/")
+first_response = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "first_response_seconds": first_response - start,
+    "status": response.status_code,
+    "lazy_modules_loaded": [name for name in %r if name in sys.modules],
+    "threads": [thread.name for thread in threading.enumerate()],
+}))
+""" % (LAZY_MODULES,)
+
+
+def probe_environment(scratch):
+    """Keeps the probe's workspaces and caches out of the repository, and the mock backend in use."""
+    return dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        LLM_BACKEND="mock",
+        LOG_LEVEL="WARNING",
+        WORKSPACE_ROOT=os.path.join(scratch, "workspaces"),
+        DOCUMENT_STORE_PATH=os.path.join(scratch, "documents"),
+        EVAL_CACHE_PATH=os.path.join(scratch, "evaluations.sqlite3"),
+        PAGE_CACHE_PATH=os.path.join(scratch, "pages.sqlite3"),
+    )
+
+
+def run_probe(env):
+    output = subprocess.check_output([sys.executable, "-c", PROBE], env=env, cwd=ROOT, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(env, count):
+    """(cumulative microseconds, module) for the slowest top-level imports of app.py."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Two spaces of indentation: imported directly by app.py (or by its own modules)
+        if len(name) - len(name.lstrip()) <= 3:
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        env = probe_environment(scratch)
+        results = [run_probe(env) for _ in range(args.runs)]
+        imports = slowest_imports(env, args.top)
+
+    import_seconds = statistics.median(r["import_seconds"] for r in results)
+    first_response_seconds = statistics.median(r["first_response_seconds"] for r in results)
+    print(f"import app:      {import_seconds * 1000:7.1f} ms (median of {args.runs})")
+    print(f"first response:  {first_response_seconds * 1000:7.1f} ms")
+    print(f"threads started: {', '.join(results[0]['threads'])}")
+    print("slowest imports:")
+    for cumulative, name in imports:
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    clean = True
+    loaded = sorted({name for r in results for name in r["lazy_modules_loaded"]})
+    if loaded:
+        clean = False
+        print(f"⚠️ Imported eagerly: {', '.join(loaded)}")
+    if args.max_import_seconds is not None and import_seconds > args.max_import_seconds:
+        clean = False
+        print(f"⚠️ Import took longer than {args.max_import_seconds}s")
+    if any(r["status"] != 200 for r in results):
+        clean = False
+        print("⚠️ The first request failed")
+
+    if not clean:
+        sys.exit(1)
+    print("✅ Startup is lazy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Cross-bidder boilerplate detection.
+
+Bidders paste large parts of the tender documents (Tender Brief, Conditions of
+Tendering) back into their responses, and often share template text with each
+other. Sent as is, that text is paid for and re-read once per bidder without
+saying anything about the bidder. collapse_boilerplate() finds it locally and
+replaces it with a short marker before the prompt is built.
+
+Each page of a document is covered by overlapping windows of WINDOW_WORDS words.
+A window is reduced to a MinHash signature of its word shingles, and
+locality-sensitive hashing (the signature cut into BANDS bands) finds windows
+in other documents that are probably near-duplicates. A candidate is confirmed
+when the signatures agree on at least SIMILARITY of their positions, which
+estimates the Jaccard similarity of the two shingle sets. Small edits and
+different line wrapping therefore still match.
+
+A window is boilerplate if it matches a tender document, or matches windows in
+enough of the other responses in the run (min_documents in all, counting its
+own). Runs of at least min_words boilerplate words on a page are replaced by
+one marker:
+
+    (Page 4) Our approach ... [312 words omitted: also in the tender documents (Tender Brief.docx)]
+
+Markers never cross a "(Page N)" marker, so page references stay correct. They
+never name other bidders either. Everything runs locally.
+"""
+import re
+import zlib
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+from retrieval import PAGE_MARKER, estimate_tokens
+
+SHINGLE_WORDS = 4
+WINDOW_WORDS = 40
+WINDOW_STRIDE = 10
+NUM_PERMUTATIONS = 64
+BANDS = 16
+SIMILARITY = 0.6
+# Distinct groups of windows tracked per LSH bucket; windows like none of them are left unmatched
+MAX_BUCKET_GROUPS = 32
+
+# retrieval.WORD, matched on the original text so offsets stay valid
+_WORD = re.compile(r"[a-z0-9]+", re.IGNORECASE)
+
+# What _marker() leaves in place of collapsed text
+MARKER = re.compile(r"\[\d+ words omitted: [^\]]*\]")
+
+_PRIME = (1 << 31) - 1
+# Fixed seed: the same text always gets the same signature
+_random = np.random.default_rng(7919)
+_MULTIPLIERS = _random.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+_OFFSETS = _random.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+
+
+class BoilerplateResult(NamedTuple):
+    text: str              # The document with boilerplate collapsed
+    passages: int          # Markers inserted
+    words: int             # Words replaced by markers
+    tokens_saved: int
+
+
+class _Page(NamedTuple):
+    spans: Tuple[Tuple[int, int], ...]    # (start, end) of every word, as offsets into the document
+    shingles: np.ndarray                  # Hash of the shingle starting at each word
+    window_starts: Tuple[int, ...]        # First word of each window
+    signatures: np.ndarray                # One MinHash signature per window
+
+
+def _page_bodies(text):
+    """(start, end) of each page's text, after its "(Page N)" marker; the whole text if unmarked."""
+    matches = list(PAGE_MARKER.finditer(text))
+    if not matches:
+        return [(0, len(text))]
+
+    bodies = [(0, matches[0].start())]
+    for i, match in enumerate(matches):
+        bodies.append((match.end(), matches[i + 1].start() if i + 1 < len(matches) else len(text)))
+    return bodies
+
+
+def _window_starts(word_count):
+    if word_count <= WINDOW_WORDS:
+        return (0,) if word_count >= SHINGLE_WORDS else ()
+    starts = list(range(0, word_count - WINDOW_WORDS + 1, WINDOW_STRIDE))
+    if starts[-1] != word_count - WINDOW_WORDS:
+        starts.append(word_count - WINDOW_WORDS)  # Cover the end of the page too
+    return tuple(starts)
+
+
+@lru_cache(maxsize=64)
+def _pages(text):
+    """Words, windows and window signatures of every page; cached as tender documents recur in every run."""
+    pages = []
+    for body_start, body_end in _page_bodies(text):
+        matches = list(_WORD.finditer(text, body_start, body_end))
+        starts = _window_starts(len(matches))
+        if not starts:
+            continue
+
+        words = [match.group().lower() for match in matches]
+        shingles = np.fromiter(
+            (zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8")) % _PRIME
+             for i in range(len(words) - SHINGLE_WORDS + 1)),
+            dtype=np.int64,
+        )
+        # Every shingle under every permutation, then the minimum over each window's shingles
+        permuted = (shingles[:, None] * _MULTIPLIERS + _OFFSETS) % _PRIME
+        window_shingles = WINDOW_WORDS - SHINGLE_WORDS + 1
+        signatures = np.stack([permuted[start:start + window_shingles].min(axis=0) for start in starts])
+
+        pages.append(_Page(tuple(match.span() for match in matches), shingles, starts, signatures))
+    return pages
+
+
+def _find(parent, window):
+    while parent[window] != window:
+        parent[window] = parent[parent[window]]
+        window = parent[window]
+    return window
+
+
+def _matching_sources(sources):
+    """
+    For every window of every source (in source, page, window order), the set of other sources
+    with a near-duplicate window.
+
+    Passages copied from the tender documents land in the same buckets for every response, so
+    bucket members are not compared pairwise. The first member of a bucket is compared with all
+    the others at once, and those from other sources that are similar join its group; the same
+    is repeated on the members left, for at most MAX_BUCKET_GROUPS groups. Groups sharing a
+    window in any bucket are merged (union-find). A window then matches every other source in
+    its group.
+    """
+    owners = []
+    signatures = []
+    for index, pages in enumerate(sources):
+        for page in pages:
+            owners.extend([index] * len(page.window_starts))
+            signatures.append(page.signatures)
+    if not signatures:
+        return []
+    signatures = np.concatenate(signatures)
+
+    buckets = {}
+    rows = NUM_PERMUTATIONS // BANDS
+    for band in range(BANDS):
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        for window, values in enumerate(band_values):
+            buckets.setdefault((band, values.tobytes()), []).append(window)
+
+    parent = list(range(len(owners)))
+    for bucket in buckets.values():
+        if len(bucket) < 2:
+            continue
+        remaining = np.array(bucket)
+        for _ in range(MAX_BUCKET_GROUPS):
+            leader = remaining[0]
+            similar = np.mean(signatures[remaining] == signatures[leader], axis=1) >= SIMILARITY
+            for window in remaining[similar]:
+                # Overlapping windows of one document are alike; joining them would chain a whole page
+                if owners[window] != owners[leader]:
+                    root, other = _find(parent, window), _find(parent, leader)
+                    if root != other:
+                        parent[root] = other
+            remaining = remaining[~similar]
+            if len(remaining) < 2:
+                break
+
+    group_sources = {}
+    for window, owner in enumerate(owners):
+        group_sources.setdefault(_find(parent, window), set()).add(owner)
+    return [group_sources[_find(parent, window)] - {owner} for window, owner in enumerate(owners)]
+
+
+def _in_any(shingle, shingle_sets):
+    return any(shingle in shingles for shingles in shingle_sets)
+
+
+def _marker(words, reference_names, shared_with):
+    if reference_names:
+        return f"[{words} words omitted: also in the tender documents ({', '.join(sorted(reference_names))})]"
+    return f"[{words} words omitted: repeated in {shared_with} other responses]"
+
+
+def _collapse(text, pages, window_matches, is_boilerplate, describe, shingles_of, min_words):
+    """
+    Replaces runs of at least min_words words covered by boilerplate windows with markers. A
+    window only has to be similar, so each run is first trimmed to start and end with shingles
+    that really occur in the matching sources, leaving the bidder's own words around it.
+    """
+    replacements = []  # (start, end, marker)
+    words_removed = 0
+    window = 0
+
+    for page in pages:
+        covered = np.zeros(len(page.spans), dtype=bool)
+        sources = [set() for _ in page.spans]
+        for start in page.window_starts:
+            matched = window_matches[window]
+            window += 1
+            if is_boilerplate(matched):
+                covered[start:start + WINDOW_WORDS] = True
+                for word in range(start, min(start + WINDOW_WORDS, len(page.spans))):
+                    sources[word] |= matched
+
+        word = 0
+        while word < len(covered):
+            if not covered[word]:
+                word += 1
+                continue
+            end = word
+            while end < len(covered) and covered[end]:
+                end += 1
+            run_start, run_end = word, end
+            run_sources = set().union(*sources[run_start:run_end])
+            shared = shingles_of(run_sources)
+            last_shingle = len(page.shingles) - 1
+            while run_start < run_end and not _in_any(page.shingles[min(run_start, last_shingle)], shared):
+                run_start += 1
+            while run_end > run_start and not _in_any(page.shingles[max(0, run_end - SHINGLE_WORDS)], shared):
+                run_end -= 1
+
+            if run_end - run_start >= min_words:
+                replacements.append((
+                    page.spans[run_start][0], page.spans[run_end - 1][1], describe(run_end - run_start, run_sources)
+                ))
+                words_removed += run_end - run_start
+            word = end
+
+    if not replacements:
+        return BoilerplateResult(text, 0, 0, 0)
+
+    parts = []
+    position = 0
+    for start, end, marker in replacements:
+        parts.append(text[position:start])
+        parts.append(marker)
+        position = end
+    parts.append(text[position:])
+    collapsed = "".join(parts)
+    return BoilerplateResult(
+        collapsed, len(replacements), words_removed, max(0, estimate_tokens(text) - estimate_tokens(collapsed))
+    )
+
+
+def collapse_boilerplate(documents, references=(), min_documents=3, min_words=WINDOW_WORDS):
+    """
+    Collapses text in `documents` ((name, text) pairs, the responses of one run) that nearly
+    duplicates one of the `references` ((name, text) pairs, the tender documents) or appears
+    in at least `min_documents` of the documents. Returns a BoilerplateResult per document.
+    """
+    references = list(references)
+    min_documents = max(2, min_documents)  # Text in one response only is that bidder's own
+    sources = [_pages(text) for _, text in references] + [_pages(text) for _, text in documents]
+    window_matches = _matching_sources(sources)
+    reference_count = len(references)
+
+    def is_boilerplate(matched):
+        if any(source < reference_count for source in matched):
+            return True
+        return sum(source >= reference_count for source in matched) + 1 >= min_documents
+
+    def describe(words, matched):
+        reference_names = {references[source][0] for source in matched if source < reference_count}
+        return _marker(words, reference_names, sum(source >= reference_count for source in matched))
+
+    source_shingles = {}
+
+    def shingles_of(matched):
+        """The shingle sets of the matched sources; not merged, as a run can match every response."""
+        for source in matched:
+            if source not in source_shingles:
+                source_shingles[source] = {int(h) for page in sources[source] for h in page.shingles}
+        return [source_shingles[source] for source in matched]
+
+    results = []
+    window = sum(len(page.window_starts) for pages in sources[:reference_count] for page in pages)
+    for (_, text), pages in zip(documents, sources[reference_count:]):
+        count = sum(len(page.window_starts) for page in pages)
+        results.append(_collapse(
+            text, pages, window_matches[window:window + count], is_boilerplate, describe, shingles_of, min_words
+        ))
+        window += count
+    return results
@@ -0,0 +1,176 @@
+"""
+Criteria spreadsheet loader.
+
+Reads the workbook once through openpyxl's read-only streaming mode (or the csv
+module), classifies rows with column-wise pandas operations instead of
+df.iterrows(), and caches the parsed CriteriaSet by the file's SHA-256 so
+re-running /evaluate with the same spreadsheet does not parse it again.
+
+The first row of a workbook is a header; a .csv file has none. Each row is read by
+its first three columns:
+
+  column A | column B            | column C
+  ---------+---------------------+---------------------------
+  name     | weighting or y/n    |                             -> criterion
+  name     | (empty)             | comments (one per line)     -> sub-criterion of the criterion above
+  (empty)  | (empty)             | comments (one per line)     -> comments on the criterion above
+
+A number in column B makes a scored criterion with that weighting (percent), one of
+y, n, yes, no or y/n (any case) a yes/no criterion, anything else an 'unknown' one, which is
+sent to the model as context but not scored. Rows before the first criterion are
+ignored. A criterion's order is its row number, starting at 0 below any header.
+"""
+import csv
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+YES_NO_VALUES = ['y', 'n', 'yes', 'no', 'y/n']
+
+
+class SubCriterion(NamedTuple):
+    name: str
+    comments: Tuple[str, ...]
+
+
+class Criterion(NamedTuple):
+    name: str
+    type: str                  # 'scored_criteria', 'yes_no_criteria' or 'unknown'
+    weighting: Optional[float]
+    order: int                 # Row position in the sheet
+    sub_criteria: Tuple[SubCriterion, ...]
+    comments: Tuple[str, ...]
+
+
+class CriteriaSet(NamedTuple):
+    criteria: Tuple[Criterion, ...]
+    digest: str                # SHA-256 of the spreadsheet bytes
+
+    def as_dict(self):
+        """
+        {name: {'sub_criteria': [{'name', 'comments'}], 'type', 'weighting', 'order', 'comments'}},
+        the criteria_data the prompts and evaluation functions take.
+        """
+        return {
+            c.name: {
+                'sub_criteria': [{'name': s.name, 'comments': list(s.comments)} for s in c.sub_criteria],
+                'type': c.type,
+                'weighting': c.weighting,
+                'order': c.order,
+                'comments': list(c.comments),
+            }
+            for c in self.criteria
+        }
+
+    @property
+    def weightings(self):
+        return {c.name: c.weighting for c in self.criteria if c.type == 'scored_criteria'}
+
+    @property
+    def order_mapping(self):
+        return {c.name: c.order for c in self.criteria}
+
+
+def _read_rows(data, filename):
+    """
+    First three columns of every row. For .xlsx the first row of the first sheet is the header, as
+    with pd.read_excel (not the sheet that happened to be selected when the workbook was saved).
+    """
+    if filename.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(min_row=2, max_col=3, values_only=True)
+            return [tuple(row) + (None,) * (3 - len(row)) for row in rows]
+        finally:
+            workbook.close()
+
+    reader = csv.reader(io.StringIO(data.decode("utf-8-sig")))
+    return [tuple(row[:3]) + (None,) * (3 - len(row[:3])) for row in reader]
+
+
+def _present(column):
+    """Non-empty cells: not None/NaN and not blank text."""
+    return column.notna() & (column.astype(str).str.strip() != "")
+
+
+def _split_comments(value):
+    return tuple(str(value).split('\n'))
+
+
+def parse_criteria(rows, digest=""):
+    """Builds a CriteriaSet from (name, value, comments) rows."""
+    if not rows:
+        return CriteriaSet((), digest)
+
+    import pandas as pd  # Slow to import; only needed once a spreadsheet is actually parsed
+
+    frame = pd.DataFrame(rows, columns=["name", "value", "comments"], dtype=object)
+    has_name = _present(frame["name"]).to_numpy()
+    has_value = _present(frame["value"]).to_numpy()
+    has_comments = _present(frame["comments"]).to_numpy()
+
+    # Classify every row at once
+    is_criterion = has_name & has_value
+    is_sub = has_name & ~has_value
+    is_comment = ~has_name & has_comments
+
+    values = frame["value"].astype(str).str.strip().str.lower()
+    weightings = pd.to_numeric(values.where(is_criterion), errors="coerce").to_numpy()
+    is_yes_no = values.isin(YES_NO_VALUES).to_numpy()
+
+    # Index of the criterion each row belongs to (-1 before the first criterion)
+    owner = np.cumsum(is_criterion) - 1
+
+    criterion_rows = np.flatnonzero(is_criterion)
+    subs = [[] for _ in criterion_rows]
+    comments = [[] for _ in criterion_rows]
+    for i in np.flatnonzero(is_sub & (owner >= 0)):
+        sub_comments = _split_comments(frame.at[i, "comments"]) if has_comments[i] else ()
+        subs[owner[i]].append(SubCriterion(frame.at[i, "name"], sub_comments))
+    for i in np.flatnonzero(is_comment & (owner >= 0)):
+        comments[owner[i]].extend(_split_comments(frame.at[i, "comments"]))
+
+    # A repeated criterion name replaces the earlier one
+    criteria = OrderedDict()
+    for k, i in enumerate(criterion_rows):
+        if not np.isnan(weightings[i]):
+            criteria_type, weighting = 'scored_criteria', float(weightings[i])
+        elif is_yes_no[i]:
+            criteria_type, weighting = 'yes_no_criteria', None
+        else:
+            criteria_type, weighting = 'unknown', None
+
+        name = frame.at[i, "name"]
+        criteria.pop(name, None)
+        criteria[name] = Criterion(name, criteria_type, weighting, int(i), tuple(subs[k]), tuple(comments[k]))
+
+    return CriteriaSet(tuple(criteria.values()), digest)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 32
+
+
+def load_criteria(data, filename):
+    """Parses criteria spreadsheet bytes (.xlsx or .csv), reusing the result for identical files."""
+    digest = hashlib.sha256(data).hexdigest()
+    with _cache_lock:
+        if digest in _cache:
+            _cache.move_to_end(digest)
+            return _cache[digest]
+
+    criteria_set = parse_criteria(_read_rows(data, filename), digest)
+
+    with _cache_lock:
+        _cache[digest] = criteria_set
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return criteria_set
@@ -0,0 +1,400 @@
+"""
+Text extraction and redaction for uploaded responses.
+
+Kept free of Flask and OpenAI imports so these functions can run in the
+ingestion process pool (see ingest_document) and in offline tools. PyPDF2 and
+python-docx are imported by the functions that read files, so importing this
+module (and app.py) stays fast; the first upload in each process pays for them.
+"""
+import contextlib
+import gzip
+import hashlib
+import itertools
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+from redaction_engine import COMBINED_PATTERN, REPLACEMENTS, redact
+
+# "compiled" uses the single-pass engine in redaction_engine.py; "legacy" runs the three
+# chained passes below (kept for comparison, see benchmarks/redaction_benchmark.py)
+REDACTION_ENGINE = os.getenv("REDACTION_ENGINE", "compiled")
+
+logger = logging.getLogger(__name__)
+
+# Page-level cache of extracted PDF text used by ingestion (see page_cache.py), so a revised
+# response only has its changed pages parsed again
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", "cache/pages.sqlite3")
+PAGE_CACHE_MAX_MB = float(os.getenv("PAGE_CACHE_MAX_MB", "500"))
+
+
+def ingestion_page_cache():
+    """
+    This process's page cache, or None if PAGE_CACHE_ENABLED is off or the cache cannot be opened
+    (a locked, read-only or corrupt file): the cache must never fail an upload.
+    """
+    if not PAGE_CACHE_ENABLED:
+        return None
+    from page_cache import open_page_cache
+
+    try:
+        return open_page_cache(PAGE_CACHE_PATH, int(PAGE_CACHE_MAX_MB * 1024 * 1024))
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("⚠️ Page cache %s unavailable, extracting every page: %s", PAGE_CACHE_PATH, e)
+        return None
+
+
+# Preprocessing function to redact sensitive data using regex
+def redact_sensitive_data(text):
+    """Redacts sensitive data including occurrences of file names."""
+    patterns = [
+        r'\b\d{3}[-.]?\d{2}[-.]?\d{4}\b',  # SSNs
+        r'\b(?:\d{1,3}\.){3}\d{1,3}\b',     # IP Addresses
+        r'\b\d{16}\b',                      # Credit card numbers
+        r'\b[\w.%+-]+@[\w.-]+\.[a-zA-Z]{2,}\b',  # Email addresses
+        r'\$\s?\d+(?:,\d{3})*(?:\.\d{2})?',  # ✅ Price amounts ($xx.xx, $1,000, $50,000.00)
+        r'CONTRACT\s+\d+'
+    ]
+
+    # ✅ Redact predefined patterns
+    for pattern in patterns:
+        text = re.sub(pattern, "[REDACTED]", text)
+
+    # ✅ Remove file extension and clean company name
+    # if filename:
+    #     company_name = os.path.splitext(filename)[0]  # ✅ Remove extension
+    #     company_name_variants = [
+    #         re.escape(company_name),  # Exact match
+    #         re.escape(company_name).replace(r"\ ", r"\s?"),  # Handle spaces
+    #         re.escape(company_name).replace(r"\_", r"\s?")  # Handle underscores
+    #     ]
+
+    #     for variant in company_name_variants:
+    #         text = re.sub(variant, "[REDACTED COMPANY]", text, flags=re.IGNORECASE)
+
+    return text
+
+
+# Function to redact PII from the text
+def redact_pii(text):
+    import re
+    # Redact email addresses
+    text = re.sub(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b", "[REDACTED EMAIL]", text)
+    # Redact phone numbers
+    text = re.sub(r"\b(?:\+?\d{1,3}[-.\s]?)?(?:\(?\d{1,4}\)?[-.\s]?)?\d{3,4}[-.\s]?\d{3,4}\b", "[REDACTED PHONE]", text)
+    # Redact credit card numbers
+    text = re.sub(r"\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b", "[REDACTED CREDIT CARD]", text)
+
+    # Redact addresses
+    street_types = r"(St|Street|Dv|Dve|Drive|Lane|Ln|Road|Rd|Court|Ct|Crescent|Cr|Cres|Highway|HWY|Hwy|Ave|Avenue|Boulevard|Way)"
+    state_types = r"(ACT|Australian Capital Territory|NSW|New South Wales|NT|Northern Territory|QLD|Queensland|SA|South Australia|TAS|Tasmania|VIC|Victoria|WA|Western Australia)"
+    
+    address_pattern = fr"\b(?:\d+/)?\d+[a-zA-Z]?\s+\w+(?:\s\w+)*\s{street_types}(?:,?\s\w+(?:\s\w+)*)?(?:,?\s\d{{4}})?(?:,?\s{state_types})?(?:,?\s\d{{4}})?\b"
+    text = re.sub(address_pattern, "[REDACTED ADDRESS]", text, flags=re.IGNORECASE)
+
+    # Redact names (known names)
+    # ww_names = ["Wannon Water", "WW", "Wannon Region Water Corporation"]
+    # for name in ww_names:
+    #     text = text.replace(name, "[REDACTED RECIPIENT NAME]")
+
+   
+    #text = re.sub(name_pattern, "[REDACTED NAME]", text)
+
+    return text
+
+def redact_persons_name(text, filename):
+    # explicitly keep references to Wannon Water in the text to allow the LLM to detect previous work done with Wannon Water
+    name_pattern = r"\b([A-Z][a-z]+(?:\s[A-Z][a-z]+)*|[A-Z](?:\.|[a-z]+)?(?:\s[A-Z](?:\.|[a-z]+)?)*\s[A-Z][a-z]+)\b"
+    company_name = os.path.splitext(filename)[0]
+    def replace_name(match):
+        exclude_pattern = rf"(Wannon Water|{re.escape(company_name)})"
+        matched_text = match.group(0)
+        if re.fullmatch(exclude_pattern, matched_text):
+            return matched_text  # Don't redact Wannon Water or the company name
+        return "[REDACTED NAME]"
+    
+    return re.sub(name_pattern, replace_name, text)
+
+
+
+# Separates pages in extracted text files, so they can be read back one page at a time
+PAGE_SEPARATOR = "\f"
+
+
+def iter_pdf_pages(pdf_path, start=0, end=None, page_cache=None):
+    """
+    Yields "(Page N) ..." text one page at a time for pages [start, end), skipping pages without text.
+    With a page_cache, pages whose content was extracted before are not parsed again.
+    """
+    import PyPDF2
+    from page_cache import cached_page_text
+
+    with open(pdf_path, 'rb') as pdf_file:
+        reader = PyPDF2.PdfReader(pdf_file)
+        end = len(reader.pages) if end is None else min(end, len(reader.pages))
+        for i in range(start, end):
+            page_text = cached_page_text(reader.pages[i], page_cache)
+            if page_text:
+                yield f"(Page {i+1}) {page_text}"  # Add page number
+
+
+def iter_docx_paragraphs(docx_path):
+    import docx
+
+    doc = docx.Document(docx_path)
+    for para in doc.paragraphs:
+        yield para.text
+
+
+def extract_text_from_pdf(pdf_path):
+    """Extract text from PDF while tracking page numbers."""
+    return "\n".join(iter_pdf_pages(pdf_path))
+
+
+# Function to extract text from Word documents
+def extract_text_from_docx(docx_path):
+    return "\n".join(iter_docx_paragraphs(docx_path))
+
+
+def extract_pdf_pages(pdf_path, start, end, extracted_path):
+    """
+    Writes the text of pages [start, end) of a PDF to `extracted_path`, one page per
+    PAGE_SEPARATOR-delimited section; used to split large PDFs across workers.
+    """
+    with _atomic_text_file(extracted_path) as extracted_file:
+        for index, page in enumerate(iter_pdf_pages(pdf_path, start, end, ingestion_page_cache())):
+            extracted_file.write((PAGE_SEPARATOR if index else "") + page.replace(PAGE_SEPARATOR, "\n"))
+    return extracted_path
+
+
+def pdf_page_count(pdf_path):
+    import PyPDF2
+
+    with open(pdf_path, 'rb') as pdf_file:
+        return len(PyPDF2.PdfReader(pdf_file).pages)
+
+
+def iter_text(filepath, filename, page_cache=None):
+    """Text of a PDF (one item per page) or Word document (one per paragraph); ValueError for other types."""
+    if filename.lower().endswith('.pdf'):
+        return iter_pdf_pages(filepath, page_cache=page_cache)
+    elif filename.lower().endswith('.docx'):
+        return iter_docx_paragraphs(filepath)
+    raise ValueError(f"Unsupported file type: {filename}")
+
+
+def extract_text(filepath, filename):
+    """Extracts text from a PDF or Word document; raises ValueError for other file types."""
+    return "\n".join(iter_text(filepath, filename))
+
+
+def iter_extracted_file(extracted_path, chunk_size=1024 * 1024):
+    """Reads an extracted text file back one page at a time (pages written before it was paged come back whole)."""
+    with open(extracted_path, "r", encoding="utf-8", newline="") as extracted_file:
+        buffer = ""
+        for chunk in iter(lambda: extracted_file.read(chunk_size), ""):
+            buffer += chunk
+            *pages, buffer = buffer.split(PAGE_SEPARATOR)
+            yield from pages
+        yield buffer
+
+
+def redacted_filename_for(filename):
+    return f"{filename.rsplit('.', 1)[0]}_redacted.txt"
+
+
+def extracted_filename_for(filename):
+    return f"{filename}.extracted.txt"
+
+
+# Bump when the way text is fed to the rules changes. 2: redacted page by page (paragraph
+# by paragraph for Word documents), so no redaction spans two pages or paragraphs.
+REDACTION_UNIT_VERSION = 2
+
+
+def redaction_fingerprint():
+    """Identifies the configured redaction rules, so stored redactions are not reused after they change."""
+    if REDACTION_ENGINE == "legacy":
+        return f"legacy-v{REDACTION_UNIT_VERSION}"
+    rules = COMBINED_PATTERN.pattern + repr(sorted(REPLACEMENTS.items()))
+    return f"compiled-v{REDACTION_UNIT_VERSION}-{hashlib.sha256(rules.encode('utf-8')).hexdigest()[:12]}"
+
+
+class IngestResult(NamedTuple):
+    redacted_filename: str
+    # Raw extracted text, one page per PAGE_SEPARATOR section; None when the redacted
+    # text came straight from the document store
+    extracted_path: Optional[str]
+    # Seconds spent per stage ("extract", "redact") in the worker, recorded by the web process
+    timings: Optional[dict] = None
+
+
+def redact_text(raw_text, filename):
+    """Applies every redaction rule to `raw_text` with the configured REDACTION_ENGINE."""
+    if REDACTION_ENGINE == "legacy":
+        redacted_text = redact_sensitive_data(raw_text)
+        redacted_text = redact_pii(redacted_text)
+        return redact_persons_name(redacted_text, filename)
+
+    redacted_text, _ = redact(raw_text, filename)
+    return redacted_text
+
+
+@contextlib.contextmanager
+def _atomic_text_file(path):
+    """
+    Opens a dot-prefixed temp file next to `path` for writing and renames it into place on success,
+    so an evaluation listing the folder never picks up a half-written document.
+    """
+    folder, name = os.path.split(path)
+    tmp_path = os.path.join(folder, f".{name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as tmp_file:
+            yield tmp_file
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _timed_pages(pages, timings, stage):
+    """Passes `pages` through, adding the time spent producing them to timings[stage]."""
+    pages = iter(pages)
+    while True:
+        start = time.perf_counter()
+        page = next(pages, None)
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+        if page is None:
+            return
+        yield page
+
+
+def redact_pages_to_file(pages, filename, redacted_folder, extracted_path=None, timings=None):
+    """
+    Redacts `pages` one at a time and appends each to the redacted file (and the raw page to
+    `extracted_path`, if given), so memory use is bounded by the largest page rather than the
+    document. Page boundaries are kept: no redaction spans two pages. Returns an IngestResult.
+    """
+    timings = {} if timings is None else timings
+    redacted_filename = redacted_filename_for(filename)
+
+    with contextlib.ExitStack() as stack:
+        redacted_file = stack.enter_context(_atomic_text_file(os.path.join(redacted_folder, redacted_filename)))
+        extracted_file = stack.enter_context(_atomic_text_file(extracted_path)) if extracted_path else None
+
+        for index, page in enumerate(pages):
+            # A separator inside a page's text would split it when read back
+            page = page.replace(PAGE_SEPARATOR, "\n")
+            if extracted_file is not None:
+                extracted_file.write((PAGE_SEPARATOR if index else "") + page)
+
+            start = time.perf_counter()
+            redacted_page = redact_text(page, filename)
+            timings["redact"] = timings.get("redact", 0.0) + time.perf_counter() - start
+            redacted_file.write(("\n" if index else "") + redacted_page)
+
+    return IngestResult(redacted_filename, extracted_path, timings)
+
+
+def redact_extracted_file(extracted_path, filename, redacted_folder):
+    """Redacts text already extracted to `extracted_path` (by an earlier upload or split workers)."""
+    return redact_pages_to_file(iter_extracted_file(extracted_path), filename, redacted_folder)._replace(
+        extracted_path=extracted_path
+    )
+
+
+def ingest_extracted_parts(part_paths, filename, redacted_folder, extracted_path):
+    """
+    Redacts the page ranges a large PDF was split into (see extract_pdf_pages), in order,
+    joining their raw text into `extracted_path`. The part files are deleted afterwards.
+    """
+    # An empty part (a range without any text) would otherwise read back as one blank page
+    pages = itertools.chain.from_iterable(
+        iter_extracted_file(path) for path in part_paths if os.path.getsize(path)
+    )
+    try:
+        return redact_pages_to_file(pages, filename, redacted_folder, extracted_path)
+    finally:
+        for path in part_paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def ingest_document(filepath, filename, redacted_folder, extracted_path=None):
+    """
+    Extracts, redacts and saves one uploaded document, streaming page by page. Runs in the
+    ingestion process pool. The raw text is also written to `extracted_path` if given.
+    """
+    timings = {}
+    pages = _timed_pages(iter_text(filepath, filename, ingestion_page_cache()), timings, "extract")
+    return redact_pages_to_file(pages, filename, redacted_folder, extracted_path, timings)
+
+
+# Redacted files are downloaded far more often than they are written, so each gets a gzip
+# sibling, compressed once at the highest level. Smaller files are not worth a second copy.
+GZIP_SUFFIX = ".gz"
+PRECOMPRESS_MIN_BYTES = 1024
+
+
+def precompress_file(path):
+    """
+    Writes `path` + GZIP_SUFFIX unless an up-to-date copy exists, and returns its path; None
+    if `path` is too small or cannot be read. The copy is given the source's mtime, so it is
+    written again whenever the source is replaced. Runs in the ingestion pool after each upload.
+    """
+    compressed_path = path + GZIP_SUFFIX
+    try:
+        source = os.stat(path)
+        if source.st_size < PRECOMPRESS_MIN_BYTES:
+            return None
+        try:
+            if os.stat(compressed_path).st_mtime_ns == source.st_mtime_ns:
+                return compressed_path
+        except FileNotFoundError:
+            pass
+
+        folder, name = os.path.split(compressed_path)
+        tmp_path = os.path.join(folder, f".{name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(path, "rb") as source_file, open(tmp_path, "wb") as raw:
+                # mtime=0 keeps the bytes, and so the ETag, the same for the same text
+                with gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=9, mtime=0) as compressed:
+                    shutil.copyfileobj(source_file, compressed, 1024 * 1024)
+            os.utime(tmp_path, ns=(source.st_atime_ns, source.st_mtime_ns))
+            os.replace(tmp_path, compressed_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+    except OSError:
+        return None
+    return compressed_path
+
+
+def save_upload_stream(file_storage, path, chunk_size=1024 * 1024):
+    """
+    Copies an uploaded file to disk in fixed-size chunks instead of reading it into memory.
+    Returns the SHA-256 of the content, hashed as it streams through.
+    """
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        while True:
+            chunk = file_storage.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
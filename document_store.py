@@ -0,0 +1,238 @@
+"""
+Content-addressed store of extracted and redacted document text.
+
+Uploads are hashed (SHA-256) as they stream to disk. Extracted text is kept
+per content hash, and redacted text per content hash + redaction variant (the
+filename stem, which the name rule keeps unredacted, and the redaction rules
+fingerprint). Uploading the same bytes again, under any filename, skips
+extraction; uploading them under the same name also skips redaction.
+
+  <root>/index.sqlite3                       sizes, access times, references
+  <root>/objects/ab/<sha256>/extracted.txt
+  <root>/objects/ab/<sha256>/redacted-<variant>.txt
+
+Text moves in and out of the store as file copies, never as whole strings, so
+ingesting a large document costs the same memory whether or not it was seen before.
+
+Workspaces holding a document add a reference to it. Unreferenced documents
+are evicted least recently used first once the store is over max_bytes, so
+disk use stays bounded by max_bytes plus whatever live workspaces are using.
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+def redaction_variant(filename, fingerprint):
+    """Key for one redaction of a document: the filename stem plus the redaction rules fingerprint."""
+    stem = os.path.splitext(filename)[0]
+    return hashlib.sha256(f"{stem}\0{fingerprint}".encode("utf-8")).hexdigest()[:16]
+
+
+def _copy_atomic(source, destination):
+    """Copies `source` to a dot-prefixed temp file next to `destination`, then renames it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(destination), prefix=".tmp-")
+    try:
+        with open(source, "rb") as source_file, os.fdopen(fd, "wb") as tmp_file:
+            shutil.copyfileobj(source_file, tmp_file)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DocumentStore:
+    """Extracted/redacted text keyed by content hash, with workspace references and LRU eviction."""
+
+    def __init__(self, root, max_bytes=1000 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.extraction_hits = 0
+        self.redaction_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+
+        # Every gunicorn worker has its own connection; wait for the others' writes rather than fail
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                digest TEXT PRIMARY KEY,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS redactions (
+                digest TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                PRIMARY KEY (digest, variant)
+            );
+            CREATE TABLE IF NOT EXISTS document_references (
+                digest TEXT NOT NULL,
+                workspace_id TEXT NOT NULL,
+                PRIMARY KEY (digest, workspace_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_accessed ON documents (last_accessed);
+            CREATE INDEX IF NOT EXISTS idx_references_workspace ON document_references (workspace_id);
+            """
+        )
+        self._conn.commit()
+
+    def _folder(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _touch(self, digest):
+        self._conn.execute("UPDATE documents SET last_accessed = ? WHERE digest = ?", (time.time(), digest))
+        self._conn.commit()
+
+    def _forget(self, digest):
+        """Drops a document whose files have gone missing. Caller holds the lock."""
+        self._conn.execute("DELETE FROM documents WHERE digest = ?", (digest,))
+        self._conn.execute("DELETE FROM redactions WHERE digest = ?", (digest,))
+        self._conn.commit()
+
+    def copy_extracted(self, digest, destination):
+        """
+        Copies the extracted text of the content with this hash to `destination`.
+        Returns False if it has not been seen. The lock only keeps out this process's eviction;
+        another worker may remove the folder at any time. A file that is already open is copied
+        in full even if it is removed meanwhile, and one removed before it is opened raises
+        FileNotFoundError, which is treated as a miss.
+        """
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM documents WHERE digest = ?", (digest,)).fetchone() is None:
+                return False
+            try:
+                _copy_atomic(os.path.join(self._folder(digest), "extracted.txt"), destination)
+            except FileNotFoundError:
+                self._forget(digest)
+                return False
+            self._touch(digest)
+            self.extraction_hits += 1
+            return True
+
+    def copy_redacted(self, digest, filename, fingerprint, destination):
+        """
+        Copies the redacted text for this content uploaded as `filename` to `destination`.
+        Returns False if it has to be redacted, including when another worker evicted it first
+        (see copy_extracted).
+        """
+        variant = redaction_variant(filename, fingerprint)
+        with self._lock:
+            if self._conn.execute(
+                "SELECT 1 FROM redactions WHERE digest = ? AND variant = ?", (digest, variant)
+            ).fetchone() is None:
+                self.misses += 1
+                return False
+            try:
+                _copy_atomic(os.path.join(self._folder(digest), f"redacted-{variant}.txt"), destination)
+            except FileNotFoundError:
+                self._conn.execute("DELETE FROM redactions WHERE digest = ? AND variant = ?", (digest, variant))
+                self._conn.commit()
+                self.misses += 1
+                return False
+            self._touch(digest)
+            self.redaction_hits += 1
+            return True
+
+    def put(self, digest, filename, fingerprint, extracted_path, redacted_path):
+        """Copies in the extracted and redacted text files of a newly processed upload, then evicts if over max_bytes."""
+        variant = redaction_variant(filename, fingerprint)
+        folder = self._folder(digest)
+        os.makedirs(folder, exist_ok=True)
+
+        # Same content always produces the same files, so concurrent writers can safely race here,
+        # and extracted text stored for an earlier upload of the content does not need copying again
+        stored_extracted = os.path.join(folder, "extracted.txt")
+        if not os.path.exists(stored_extracted):
+            _copy_atomic(extracted_path, stored_extracted)
+        _copy_atomic(redacted_path, os.path.join(folder, f"redacted-{variant}.txt"))
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO documents (digest, size_bytes, created_at, last_accessed) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET last_accessed = excluded.last_accessed",
+                (digest, os.path.getsize(stored_extracted), now, now),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO redactions (digest, variant, size_bytes) VALUES (?, ?, ?)",
+                (digest, variant, os.path.getsize(redacted_path)),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def add_reference(self, digest, workspace_id):
+        """Records that a workspace holds this document; referenced documents are never evicted."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO document_references (digest, workspace_id) VALUES (?, ?)",
+                (digest, workspace_id),
+            )
+            self._conn.commit()
+
+    def release(self, workspace_id):
+        """Drops every reference held by a workspace, then evicts if over max_bytes. Returns the count."""
+        with self._lock:
+            released = self._conn.execute(
+                "DELETE FROM document_references WHERE workspace_id = ?", (workspace_id,)
+            ).rowcount
+            self._evict()
+            self._conn.commit()
+        return released
+
+    def _size_of(self, digest):
+        extracted = self._conn.execute("SELECT size_bytes FROM documents WHERE digest = ?", (digest,)).fetchone()
+        redacted = self._conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM redactions WHERE digest = ?", (digest,)
+        ).fetchone()
+        return (extracted[0] if extracted else 0) + redacted[0]
+
+    def _total_bytes(self):
+        return (
+            self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM documents").fetchone()[0]
+            + self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM redactions").fetchone()[0]
+        )
+
+    def _evict(self):
+        """Deletes unreferenced documents, least recently used first, until under max_bytes. Caller holds the lock."""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+
+        for (digest,) in self._conn.execute(
+            "SELECT digest FROM documents WHERE digest NOT IN (SELECT digest FROM document_references) "
+            "ORDER BY last_accessed"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            total -= self._size_of(digest)
+            self._conn.execute("DELETE FROM documents WHERE digest = ?", (digest,))
+            self._conn.execute("DELETE FROM redactions WHERE digest = ?", (digest,))
+            shutil.rmtree(self._folder(digest), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            referenced = self._conn.execute(
+                "SELECT COUNT(DISTINCT digest) FROM document_references"
+            ).fetchone()[0]
+            return {
+                "extraction_hits": self.extraction_hits,
+                "redaction_hits": self.redaction_hits,
+                "misses": self.misses,
+                "documents": documents,
+                "referenced_documents": referenced,
+                "size_bytes": self._total_bytes(),
+            }
@@ -0,0 +1,139 @@
+"""
+On-disk cache of LLM evaluations.
+
+Entries are keyed by a hash of everything that determines the model's answer
+(redacted text, criteria, prompt template version, model and temperature), so
+re-running /evaluate on unchanged documents returns the stored HTML report and
+JSON rows without an API call.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def _normalise(value):
+    """Stable JSON text for hashing (sorted keys, non-JSON values such as numpy floats as strings)."""
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def make_cache_key(document_text, criteria_data, document_name, prompt_version, model, temperature):
+    """SHA-256 over the inputs that determine an evaluation."""
+    digest = hashlib.sha256()
+    for part in (
+        hashlib.sha256(document_text.encode("utf-8")).hexdigest(),
+        _normalise(criteria_data),
+        document_name,  # The JSON rows are keyed by "<document> Score"
+        str(prompt_version),
+        model,
+        repr(float(temperature)),
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class EvaluationCache:
+    """SQLite-backed evaluation cache with age- and size-based eviction and hit/miss counters."""
+
+    def __init__(self, path, max_age_seconds=30 * 24 * 3600, max_bytes=500 * 1024 * 1024):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS evaluations (
+                key TEXT PRIMARY KEY,
+                html TEXT NOT NULL,
+                rows TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_accessed ON evaluations (last_accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Returns (html, rows) for `key`, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT html, rows, created_at FROM evaluations WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[2] > self.max_age_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE evaluations SET last_accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        return row[0], json.loads(row[1])
+
+    def put(self, key, html, rows):
+        """Stores an evaluation and evicts old entries if the cache is over its limits."""
+        rows_json = json.dumps(rows, ensure_ascii=False, default=str)
+        size_bytes = len(html.encode("utf-8")) + len(rows_json.encode("utf-8"))
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO evaluations (key, html, rows, size_bytes, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, html, rows_json, size_bytes, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drops expired entries, then least recently used ones until under max_bytes. Caller holds the lock."""
+        self._conn.execute("DELETE FROM evaluations WHERE created_at < ?", (now - self.max_age_seconds,))
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM evaluations").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size_bytes in self._conn.execute(
+            "SELECT key, size_bytes FROM evaluations ORDER BY last_accessed"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+            total -= size_bytes
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM evaluations")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM evaluations"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+                "size_bytes": total,
+            }
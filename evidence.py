@@ -0,0 +1,265 @@
+"""
+Local evidence pre-screen for yes/no criteria.
+
+Many yes/no criteria are compliance checks ("Insurance", "Code of Conduct",
+"Conflict of interest"). When a response plainly states that it complies,
+prescreen() settles the criterion without an API call; everything else goes to
+the model. Off by default (YES_NO_PRESCREEN in app.py): a wrong local "Yes" is
+worse than a model call.
+
+Each page of the redacted text is split into lines. Contents entries and headings
+are dropped: all-caps lines, lines with dot leaders or ending in a page number,
+"SCHEDULE 13 ..." style titles and short title-case lines. The rest are joined and
+split into sentences, which are indexed by stemmed term (an inverted index, cached
+per document). A criterion becomes requirements: each clause of its name ("Labour
+& human rights" -> "labour", "human rights"), each sub-criterion and each comment
+line, with stopwords and generic tender words ("provide", "evidence") left out.
+
+Mentioning a requirement is not evidence of meeting it ("our standard contract
+term is three years" says nothing about accepting the contract terms). A sentence
+only supports a requirement if it contains all of its terms and states compliance
+with a verb such as "comply", "adhere", "accept", "agree", "declare" or "hold".
+
+  Yes  every requirement has a supporting sentence of at least EVIDENCE_MIN_WORDS
+       words, and no sentence mentioning a requirement is negated ("not",
+       "unable"), a promise ("will", "upon award") or conditional ("subject to",
+       "contingent", "except")
+  No   (only with decide_no) no requirement term appears anywhere in the document
+  None anything else: the criterion is ambiguous and is left to the model
+
+Questions (copied from the returnable schedules) are never counted as evidence,
+and text collapsed by boilerplate.py is not searched.
+"""
+import html
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+from boilerplate import MARKER
+from retrieval import PAGE_MARKER, split_pages, tokenize
+
+# Bump when the rules change: local answers are part of cached evaluations
+EVIDENCE_VERSION = "2"
+
+EVIDENCE_MIN_WORDS = 5
+
+# Words in criteria that say what to look for rather than what it is about
+GENERIC_WORDS = frozenset("""
+provide provided evidence evidenced demonstrate demonstrated confirm confirmed confirmation
+include included including submit submitted bidder tenderer respondent must required
+require requirement current valid copy attach attached detail describe outline statement
+compliance comply complies compliant policy policies
+""".split())
+
+NEGATION_WORDS = frozenset("not no never unable cannot without none nor decline declined n/a".split())
+NEGATION_PHRASES = ("do not", "does not", "did not", "have not", "has not", "is not", "are not")
+# A promise is not evidence that something is in place
+PROMISE_WORDS = frozenset("will would intend intends plan plans planned propose proposed pending tbc tba".split())
+PROMISE_PHRASES = ("upon award", "on award", "if successful", "if required", "once appointed", "to be confirmed")
+# Compliance with conditions attached needs reading in full
+CONDITION_WORDS = frozenset("""
+contingent conditional except exception exceptions deviation deviations unless partial partially
+negotiate negotiated negotiation negotiable
+""".split())
+CONDITION_PHRASES = ("subject to", "other than", "with the exception")
+QUESTION_PHRASES = ("please provide", "please describe", "please confirm", "please outline", "provide details")
+# Verbs that state a requirement is met, rather than just mention it
+COMPLIANCE_WORDS = frozenset("""
+comply complies complied compliant adhere adheres adhered abide abides accept accepts accepted
+agree agrees acknowledge acknowledges declare declares hold holds held maintain maintains maintained
+certified accredited insured
+""".split())
+
+_SENTENCE = re.compile(r"[^.!?]+[.!?]?")
+_CLAUSE_SEPARATOR = re.compile(r"\s*(?:[–—:;,&/()]|\band\b|\s-\s)\s*")
+_REDACTION = re.compile(r"\[REDACTED[^\]]*\]")
+_DOT_LEADER = re.compile(r"(?:\.\s*){4,}|…")
+_TRAILING_PAGE_NUMBER = re.compile(r"\s\d{1,4}\s*$")
+_NUMBERED_TITLE = re.compile(r"^\W*(?:schedule|section|appendix|annexure)\s+[0-9]+[a-z]?\b", re.IGNORECASE)
+_WORDS = re.compile(r"[a-z0-9/']+")
+TITLE_MAX_WORDS = 8
+
+
+class Sentence(NamedTuple):
+    page: Optional[int]
+    text: str
+    terms: frozenset
+    words: int
+    question: bool
+    qualified: bool        # Negated, a promise or conditional
+    compliance: bool       # States that something is met
+
+
+class LocalAnswer(NamedTuple):
+    answer: str                    # "Yes" or "No"
+    pages: Tuple[int, ...]
+    justification: str
+
+    @property
+    def page_references(self):
+        return format_pages(self.pages)
+
+
+def stem(word):
+    """Crude plural folding, enough to match "certificates" with "certificate"."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(text):
+    return frozenset(stem(word) for word in tokenize(text)) - GENERIC_WORDS
+
+
+def _has_cue(lowered, words, cue_words, cue_phrases):
+    return bool(words & cue_words) or any(phrase in lowered for phrase in cue_phrases)
+
+
+def is_heading(line):
+    """Contents entries, schedule titles and headings: they name a topic without saying anything about it."""
+    if _DOT_LEADER.search(line) or _TRAILING_PAGE_NUMBER.search(line) or _NUMBERED_TITLE.match(line):
+        return True
+    text = _REDACTION.sub(" ", line)
+    letters = [c for c in text if c.isalpha()]
+    if len(letters) >= 3 and all(c.isupper() for c in letters):
+        return True
+    # "Conflict of Interest" on its own line, which would otherwise run into the next sentence
+    words = text.split()
+    return (
+        0 < len(words) <= TITLE_MAX_WORDS and not text.rstrip().endswith((".", "!", "?", ":", ","))
+        and all(word[0].isupper() for word in words if len(word) > 3 and word[0].isalpha())
+    )
+
+
+class EvidenceIndex:
+    """Sentences of a page-tagged document and an inverted index from stemmed term to sentence numbers."""
+
+    def __init__(self, text):
+        self.sentences: List[Sentence] = []
+        self.postings = {}
+        for page, page_text in split_pages(MARKER.sub(" ", text)):
+            lines = PAGE_MARKER.sub(" ", page_text).split("\n")
+            body = " ".join(line for line in lines if line.strip() and not is_heading(line))
+            for match in _SENTENCE.finditer(body):
+                sentence = " ".join(match.group().split())
+                if not sentence:
+                    continue
+                lowered = sentence.lower()
+                words = set(_WORDS.findall(lowered))
+                sentence_terms = terms(sentence)
+                index = len(self.sentences)
+                self.sentences.append(Sentence(
+                    page, sentence, sentence_terms, len(words),
+                    question=sentence.endswith("?") or any(phrase in lowered for phrase in QUESTION_PHRASES),
+                    qualified=_has_cue(lowered, words, NEGATION_WORDS, NEGATION_PHRASES)
+                    or _has_cue(lowered, words, PROMISE_WORDS, PROMISE_PHRASES)
+                    or _has_cue(lowered, words, CONDITION_WORDS, CONDITION_PHRASES),
+                    compliance=bool(words & COMPLIANCE_WORDS),
+                ))
+                for term in sentence_terms:
+                    self.postings.setdefault(term, []).append(index)
+
+    def matching(self, requirement_terms):
+        """Numbers of the sentences containing every term."""
+        postings = sorted((self.postings.get(term, []) for term in requirement_terms), key=len)
+        if not postings or not postings[0]:
+            return []
+        common = set(postings[0]).intersection(*postings[1:])
+        return sorted(common)
+
+    def mentions(self, term_set):
+        return any(term in self.postings for term in term_set)
+
+
+@lru_cache(maxsize=32)
+def build_evidence_index(text):
+    """Cached because per-criterion mode screens the same document once per criterion."""
+    return EvidenceIndex(text)
+
+
+def requirements(criterion_name, criterion):
+    """Term sets that must all be evidenced: the clauses of the name, then sub-criteria and comment lines."""
+    items = [terms(clause) for clause in _CLAUSE_SEPARATOR.split(str(criterion_name))]
+    items += [terms(str(sub.get('name', ''))) for sub in criterion.get('sub_criteria') or []]
+    items += [terms(str(comment)) for comment in criterion.get('comments') or []]
+    unique = []
+    for item in items:
+        if item and item not in unique:
+            unique.append(item)
+    return unique
+
+
+def format_pages(pages):
+    """(3, 4, 5, 9) -> "3-5, 9", as the prompts ask the model to group them."""
+    groups = []
+    for page in sorted(set(pages)):
+        if groups and page == groups[-1][1] + 1:
+            groups[-1][1] = page
+        else:
+            groups.append([page, page])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in groups)
+
+
+def _quote(text, limit=200):
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def prescreen(document_text, criterion_name, criterion, decide_no=False):
+    """A LocalAnswer for a yes/no criterion when the text settles it, otherwise None."""
+    items = requirements(criterion_name, criterion)
+    if not items:
+        return None
+    index = build_evidence_index(document_text)
+
+    if not any(index.mentions(item) for item in items):
+        if not decide_no:
+            return None
+        return LocalAnswer("No", (), "The document does not mention " + ", ".join(
+            sorted({term for item in items for term in item})) + ".")
+
+    evidence = []
+    for item in items:
+        sentences = [index.sentences[i] for i in index.matching(item)]
+        mentions = [s for s in sentences if not s.question]
+        if any(s.qualified for s in mentions):
+            return None  # A negation, promise or condition needs reading in context
+        supporting = [s for s in mentions if s.compliance and s.words >= EVIDENCE_MIN_WORDS]
+        if not supporting:
+            return None
+        evidence.append(supporting[0])
+
+    pages = tuple(sorted({s.page for s in evidence if s.page is not None}))
+    quotes = []
+    for sentence in evidence:
+        if sentence not in quotes:
+            quotes.append(sentence)
+    justification = " ".join(
+        f'"{_quote(s.text)}"' + (f" (page {s.page})" if s.page is not None else "") for s in quotes
+    )
+    return LocalAnswer("Yes", pages, justification)
+
+
+def render_local_answers_html(answers):
+    """A "Yes/No Criteria" list, like the one in the model's report, for locally decided criteria."""
+    e = html.escape
+    items = []
+    for name, local in answers.items():
+        references = f" (Pages: {local.page_references})" if local.pages else ""
+        items.append(
+            f"<li><strong>{e(name)}:</strong> {local.answer} - Decided locally from the document text: "
+            f"{e(local.justification)}{references}</li>"
+        )
+    return "<h3>Yes/No Criteria (decided locally)</h3><ul>\n" + "\n".join(items) + "\n</ul>"
+
+
+def render_local_criterion_html(name, local):
+    """EVALUATION_MODE=per_criterion section for a locally decided criterion, laid out like the model's."""
+    e = html.escape
+    return (
+        f"<h3>Criteria: {e(name)} - {local.answer}</h3>"
+        f"<p><strong>Page References:</strong> {local.page_references or 'None'}</p>"
+        f"<p><strong>Justification:</strong> Decided locally from the document text: {e(local.justification)}</p>"
+        '<hr style="border-top: 1px solid #ccc;">'
+    )
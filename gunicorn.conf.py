@@ -0,0 +1,16 @@
+"""
+gunicorn settings, read by `gunicorn app:app` (see Procfile).
+
+app.py is imported once in the master and the workers are forked from it, so a
+new or restarted worker is serving straight away instead of importing Flask and
+the app again. This is safe because importing app.py opens no files, connections,
+threads or pools (see process_service in app.py). Workspace housekeeping runs in
+the master only, so workers never sweep the shared workspace folder.
+"""
+preload_app = True
+
+
+def when_ready(server):
+    import app
+
+    app.create_app()
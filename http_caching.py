@@ -0,0 +1,129 @@
+"""
+Conditional and compressed HTTP responses.
+
+Evaluation reports and job listings are polled repeatedly while a job runs and
+re-read whenever the page is scrolled back or reloaded. cacheable_response()
+gives every body a weak ETag (a hash of the uncompressed body, so it is the same
+for gzip and identity encodings) and answers a matching If-None-Match with
+304 Not Modified before compressing anything. Bodies of at least GZIP_MIN_BYTES
+are gzipped when the client accepts it; smaller ones are not worth the CPU.
+
+Flask does not compress responses by itself and no compression middleware is
+installed, so this is done per endpoint for the large text responses only.
+
+Redacted documents are files, compressed once when they are written (see
+document_processing.precompress_file). send_precompressed() serves the .gz copy
+to clients that accept gzip and the plain file to the rest, through send_file,
+which already handles ETag/Last-Modified, 304 and byte ranges (the ranges of the
+representation sent, as with nginx's gzip_static). stream_zip() builds a zip of
+many files while it is being sent, a chunk at a time.
+"""
+import gzip
+import hashlib
+import json
+import zipfile
+
+from flask import Response, request, send_file
+
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+# Revalidate on every use: the body may change while a job runs
+REVALIDATE = "private, no-cache"
+
+
+def body_etag(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def accepts_gzip():
+    return request.accept_encodings.quality("gzip") > 0
+
+
+def cacheable_response(body, mimetype, cache_control=REVALIDATE):
+    """A response for `body` (str or bytes) with a weak ETag, 304 handling and gzip when accepted."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    etag = body_etag(body)
+    response = Response(mimetype=mimetype)
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+
+    if request.if_none_match.contains_weak(etag):
+        response.status_code = 304
+        return response
+
+    if len(body) >= GZIP_MIN_BYTES and accepts_gzip():
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        response.headers["Content-Encoding"] = "gzip"
+    response.set_data(body)
+    return response
+
+
+def json_response(payload, cache_control=REVALIDATE):
+    """cacheable_response() for a JSON payload."""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+    return cacheable_response(body, "application/json", cache_control)
+
+
+def send_precompressed(path, compressed_path, download_name, mimetype="text/plain"):
+    """Sends `path` as an attachment, or `compressed_path` (its gzip copy, may be None) if the client accepts gzip."""
+    use_gzip = compressed_path is not None and accepts_gzip()
+    response = send_file(
+        compressed_path if use_gzip else path, mimetype=mimetype, as_attachment=True,
+        download_name=download_name, conditional=True, etag=True
+    )
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = REVALIDATE
+    return response
+
+
+class _ChunkSink:
+    """Write-only file for ZipFile that keeps what was written until it is taken to be sent."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files, chunk_size=256 * 1024):
+    """
+    Yields a zip archive of `files` ((name in the archive, path) pairs) as it is built. Files
+    are read and deflated chunk by chunk; neither they nor the archive are held in memory.
+    Files deleted since they were listed are left out.
+    """
+    sink = _ChunkSink()
+    # ZipFile writes data descriptors after each entry when the output cannot seek
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, path in files:
+            try:
+                info = zipfile.ZipInfo.from_file(path, name)
+                source = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with source, archive.open(info, "w", force_zip64=True) as entry:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    entry.write(chunk)
+                    data = sink.take()
+                    if data:
+                        yield data
+    yield sink.take()
@@ -0,0 +1,272 @@
+"""
+LLM backends used by evaluate_document_new.
+
+  * OpenAIBackend - the real chat completions API (honours OPENAI_BASE_URL, so it
+    can also be pointed at mock_llm_server.py to exercise the HTTP path)
+  * MockBackend   - an in-process deterministic stand-in with configurable
+    latency, error rate and rate limit, for offline load testing and profiling
+
+Both return a CompletionResult. Backend-side failures that are worth retrying
+are raised as LLMBackendError (or the openai exception types for OpenAIBackend).
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import NamedTuple
+
+from prompts import ANSWERED_HEADING, SCORED_HEADING, YES_NO_HEADING
+
+
+class CompletionResult(NamedTuple):
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int = 0     # Prompt tokens served from the provider's prompt cache
+
+
+class LLMBackendError(Exception):
+    """An HTTP-style failure from a backend; 429 and 5xx are retryable."""
+
+    def __init__(self, message, status_code, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.status_code == 429 or self.status_code >= 500
+
+
+class OpenAIBackend:
+    name = "openai"
+
+    def __init__(self, api_key=None, base_url=None):
+        import openai
+
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("Missing OpenAI API key. Ensure OPENAI_API_KEY is set in the .env file.")
+
+        base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        # Retries are handled by the caller so the backoff policy is in one place
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        # Results from a different endpoint (e.g. the mock server) must not share cache entries
+        self.cache_namespace = f"openai@{base_url}" if base_url else "openai"
+
+    def complete(self, messages, model, temperature, timeout=None, **options):
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            timeout=timeout,
+            **options
+        )
+        usage = response.usage
+        details = getattr(usage, "prompt_tokens_details", None)
+        return CompletionResult(
+            response.choices[0].message.content,
+            usage.prompt_tokens if usage else 0,
+            usage.completion_tokens if usage else 0,
+            (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+        )
+
+
+class MockBackend:
+    """
+    Deterministic in-process stand-in for the chat completions API.
+
+    latency: seconds per call (plus up to `jitter` extra), error_rate: fraction of calls
+    failing with a 500, rate_limit_rpm: calls per rolling minute before 429s are returned.
+    """
+    name = "mock"
+    cache_namespace = "mock"
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rpm=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limiter = RollingRateLimiter(rate_limit_rpm)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.seen_prefixes = set()  # Simulates provider-side prompt caching
+
+    def complete(self, messages, model, temperature, timeout=None, **options):
+        retry_after = self.rate_limiter.check()
+        if retry_after is not None:
+            raise LLMBackendError("Mock rate limit reached", 429, retry_after=retry_after)
+
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.random.random() < self.error_rate
+
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise LLMBackendError("Mock request timed out", 504)
+        time.sleep(delay)
+        if fail:
+            raise LLMBackendError("Mock server error", 500)
+
+        prompt = "\n".join(message["content"] for message in messages)
+        if options.get("response_format"):
+            text = build_mock_structured_reply(prompt)
+        else:
+            text = build_mock_reply(prompt)
+        return CompletionResult(text, estimate_tokens(prompt), estimate_tokens(text), self._cached_tokens(prompt))
+
+    def _cached_tokens(self, prompt):
+        """Like OpenAI: the part before the document counts as cached once seen, if over 1024 tokens."""
+        prefix = prompt.split("\n### Document:\n", 1)[0]
+        tokens = estimate_tokens(prefix)
+        if len(prefix) == len(prompt) or tokens < 1024:
+            return 0
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self.lock:
+            seen = key in self.seen_prefixes
+            self.seen_prefixes.add(key)
+        return tokens if seen else 0
+
+
+class RollingRateLimiter:
+    """Allows `rpm` calls per rolling 60 seconds; 0 disables the limit."""
+
+    def __init__(self, rpm):
+        self.rpm = rpm
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def check(self):
+        """Records a call and returns None, or returns the seconds to wait if over the limit."""
+        if not self.rpm:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            self.calls = [t for t in self.calls if now - t < 60]
+            if len(self.calls) >= self.rpm:
+                return round(60 - (now - self.calls[0]), 3)
+            self.calls.append(now)
+        return None
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def create_backend(name=None):
+    """Builds the backend selected by `name` or LLM_BACKEND ("openai" or "mock"); mock options come from MOCK_LLM_*."""
+    name = name or os.getenv("LLM_BACKEND", "openai")
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "mock":
+        return MockBackend(
+            latency=float(os.getenv("MOCK_LLM_LATENCY", "0.5")),
+            jitter=float(os.getenv("MOCK_LLM_JITTER", "0")),
+            error_rate=float(os.getenv("MOCK_LLM_ERROR_RATE", "0")),
+            rate_limit_rpm=int(os.getenv("MOCK_LLM_RATE_LIMIT_RPM", "0")),
+        )
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
+
+
+# --- Deterministic replies -------------------------------------------------------------
+
+def _mock_score(*parts):
+    digest = hashlib.sha256("\0".join(parts).encode("utf-8")).digest()
+    return digest[0] % 10 + 1
+
+
+def _criteria_after(prompt, heading):
+    """Top-level "- ..." lines of the prompt section starting with `heading` (see prompts.py)."""
+    start = prompt.find(heading)
+    if start == -1:
+        return []
+    names = []
+    for line in prompt[start + len(heading):].lstrip("\n").split("\n"):
+        if not line.startswith("- "):
+            if line.startswith("  "):
+                continue  # Sub-criteria and notes
+            break
+        names.append(line[2:])
+    return names
+
+
+def parse_prompt(prompt):
+    """Recovers (document_name, scored {name: weighting}, yes/no [names]) from an evaluation prompt."""
+    keys = re.findall(r'^(?:Score|Result) key: "([^"\n]+?) (?:Score|Yes/No)"$', prompt, re.MULTILINE)
+    document_name = keys[-1] if keys else "document"
+
+    single = re.search(r"^### Criterion:\n(.+?) \((Rate 1-10, weighting ([^%]*)%|Answer)", prompt, re.MULTILINE)
+    if single:
+        if single.group(2).startswith("Rate"):
+            try:
+                weighting = float(single.group(3))
+            except ValueError:
+                weighting = None
+            return document_name, {single.group(1): weighting}, []
+        return document_name, {}, [single.group(1)]
+
+    scored = {}
+    for line in _criteria_after(prompt, SCORED_HEADING):
+        match = re.match(r"\[([^\]]*)%\] (.+)$", line)
+        if match:
+            try:
+                weighting = float(match.group(1))
+            except ValueError:
+                weighting = None
+            scored[match.group(2)] = weighting
+    answered = set(_criteria_after(prompt, ANSWERED_HEADING))
+    yes_no = [name for name in _criteria_after(prompt, YES_NO_HEADING) if name not in answered]
+    return document_name, scored, yes_no
+
+
+def build_mock_reply(prompt):
+    """A well-formed HTML report followed by "### JSON Output:" and the JSON rows, derived from the prompt."""
+    document_name, scored, yes_no = parse_prompt(prompt)
+    html = ["<h2>Executive Summary</h2><p>Mock evaluation generated offline.</p>"]
+    rows = []
+
+    for criterion, weighting in scored.items():
+        score = _mock_score(document_name, criterion)
+        html.append(
+            f"<h3>Criteria: {criterion} - {score}/10</h3><p>Page References: 1</p>"
+            f"<p>Strengths: mock.</p><p>Weaknesses: mock.</p><hr style=\"border-top: 1px solid #ccc;\">"
+        )
+        rows.append({"Criterion": criterion, f"{document_name} Score": score, "Weighting (%)": weighting})
+
+    if yes_no:
+        html.append("<h3>Yes/No Criteria</h3>")
+    for criterion in yes_no:
+        answer = "Yes" if _mock_score(document_name, criterion) > 3 else "No"
+        html.append(f"<p>{criterion}: {answer} (Page 1)</p>")
+        rows.append({"Criterion": criterion, f"{document_name} Yes/No": answer, "Weighting (%)": None})
+
+    html.append("<h2>Conclusion</h2><p>Mock conclusion.</p>")
+    return "\n".join(html) + "\n### JSON Output:\n" + json.dumps(rows)
+
+
+def build_mock_structured_reply(prompt):
+    """A JSON object following structured_evaluation.EVALUATION_SCHEMA, derived from the prompt."""
+    document_name, scored, yes_no = parse_prompt(prompt)
+    criteria = []
+
+    for criterion in scored:
+        criteria.append({
+            "criterion": criterion, "score": _mock_score(document_name, criterion), "answer": None,
+            "page_references": "1", "strengths": "mock", "weaknesses": "mock", "justification": "mock",
+            "sub_criteria": [],
+        })
+    for criterion in yes_no:
+        criteria.append({
+            "criterion": criterion, "score": None,
+            "answer": "Yes" if _mock_score(document_name, criterion) > 3 else "No",
+            "page_references": "1", "strengths": "", "weaknesses": "", "justification": "mock",
+            "sub_criteria": [],
+        })
+
+    return json.dumps({
+        "executive_summary": "Mock evaluation generated offline.",
+        "criteria": criteria,
+        "conclusion": "Mock conclusion.",
+    })
@@ -0,0 +1,301 @@
+"""
+Client-side scheduler for model calls.
+
+Every completion request asks the scheduler for a slot first. The scheduler keeps
+two token buckets, one for requests per minute and one for tokens per minute,
+refilled continuously at the account's limits (LLM_REQUESTS_PER_MINUTE /
+LLM_TOKENS_PER_MINUTE). Calls that would overdraw either bucket wait in a priority
+queue instead of being sent and rejected with a 429. The priority is the
+estimated token count, so small documents are answered first and give the
+evaluator early feedback while large ones are still queued.
+
+A 429 with Retry-After pauses the whole queue for that long (the quota is shared,
+so every other call would be rejected too). After a call, its estimate is
+corrected with the usage the API reports.
+
+The limits are per account, but gunicorn runs several worker processes, each with
+its own scheduler. So that N workers do not send N times the limit, the bucket
+levels and the pause are kept in one SQLite row per bucket (SharedRateLimits,
+LLM_SCHEDULER_STATE_PATH), read and updated in a single write transaction, which
+locks the database across processes, the way evaluation_cache.py shares its
+entries. Dividing the limits by the worker count was not chosen: an evaluation
+job runs in one worker, which would then only get 1/N of the account's rate.
+The priority queue stays per process; the head of each process's queue takes
+from the shared buckets. Without a state path (tests, the batch CLI) the buckets
+are kept in memory (LocalRateLimits).
+"""
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+
+class TokenBucket:
+    """Holds up to `per_minute` units, refilled at per_minute / 60 per second. 0 means unlimited."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units are available (amounts over capacity wait for a full bucket)."""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        if self.capacity:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount, now):
+        """Takes (or gives back, if negative) the difference between actual and estimated usage."""
+        if self.capacity:
+            self._refill(now)
+            self.level = min(self.capacity, self.level - amount)
+
+
+class LocalRateLimits:
+    """Request and token buckets and the Retry-After pause of one process."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+
+    def try_take(self, estimated_tokens):
+        """Takes a request and `estimated_tokens` and returns 0, or returns the seconds to wait first."""
+        now = time.monotonic()
+        delay = max(
+            self.paused_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now),
+        )
+        if delay <= 0:
+            self.requests.take(1, now)
+            self.tokens.take(estimated_tokens, now)
+        return delay
+
+    def adjust(self, tokens):
+        self.tokens.adjust(tokens, time.monotonic())
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def paused_for(self):
+        return max(0.0, self.paused_until - time.monotonic())
+
+
+class SharedRateLimits:
+    """
+    The same buckets and pause, stored in SQLite and shared by every process using `path`.
+    Each change is one BEGIN IMMEDIATE transaction, so processes never overdraw a bucket;
+    paused_for() only reads.
+    """
+
+    def __init__(self, path, requests_per_minute, tokens_per_minute):
+        self.path = path
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode, so the transactions below are started explicitly
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                name TEXT PRIMARY KEY,
+                level REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+
+    def _transaction(self, update):
+        """Runs update(requests, tokens, paused_until, now) on the stored state and saves it."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                stored = {name: (level, updated) for name, level, updated
+                          in self._conn.execute("SELECT name, level, updated FROM rate_limits")}
+                buckets = {}
+                for name, per_minute in (("requests", self.requests_per_minute), ("tokens", self.tokens_per_minute)):
+                    bucket = buckets[name] = TokenBucket(per_minute)
+                    if name in stored:
+                        bucket.level = min(bucket.capacity, stored[name][0])
+                        bucket.updated = stored[name][1]
+                    else:
+                        bucket.updated = now
+                paused_until = stored.get("paused_until", (0.0, now))[0]
+
+                result, paused_until = update(buckets["requests"], buckets["tokens"], paused_until, now)
+
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rate_limits (name, level, updated) VALUES (?, ?, ?)",
+                    [(name, bucket.level, bucket.updated) for name, bucket in buckets.items()]
+                    + [("paused_until", paused_until, now)]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def try_take(self, estimated_tokens):
+        def update(requests, tokens, paused_until, now):
+            delay = max(paused_until - now, requests.wait_time(1, now), tokens.wait_time(estimated_tokens, now))
+            if delay <= 0:
+                requests.take(1, now)
+                tokens.take(estimated_tokens, now)
+            return delay, paused_until
+        return self._transaction(update)
+
+    def adjust(self, amount):
+        def update(requests, tokens, paused_until, now):
+            tokens.adjust(amount, now)
+            return None, paused_until
+        self._transaction(update)
+
+    def pause(self, seconds):
+        self._transaction(lambda requests, tokens, paused_until, now: (None, max(paused_until, now + seconds)))
+
+    def paused_for(self):
+        """A plain read, so stats() never takes the write lock acquire() waits on."""
+        with self._lock:
+            row = self._conn.execute("SELECT level FROM rate_limits WHERE name = 'paused_until'").fetchone()
+        return max(0.0, row[0] - time.time()) if row else 0.0
+
+
+class Reservation:
+    """A granted slot; record() the usage the API reported before it is released."""
+
+    def __init__(self, estimated_tokens):
+        self.estimated_tokens = estimated_tokens
+        self.prompt_tokens = None
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, prompt_tokens, completion_tokens, cached_tokens=0):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached_tokens = cached_tokens
+
+
+class LLMScheduler:
+    """
+    Priority queue in front of the model client, limited by request and token buckets. With a
+    `state_path` the buckets are shared with every other scheduler using that file.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, state_path=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        if state_path and (requests_per_minute or tokens_per_minute):
+            self.limits = SharedRateLimits(state_path, requests_per_minute, tokens_per_minute)
+        else:
+            self.limits = LocalRateLimits(requests_per_minute, tokens_per_minute)
+        self._cond = threading.Condition()
+        self._queue = []  # Heap of (priority, sequence)
+        self._sequence = itertools.count()
+
+        self.in_flight = 0
+        self.granted = 0
+        self.throttled = 0         # Calls that had to wait for capacity
+        self.pauses = 0            # Retry-After pauses
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.max_queue_depth = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    def acquire(self, estimated_tokens, priority=0):
+        """Blocks until the call may be sent. Lower `priority` values go first, ties in arrival order."""
+        ticket = (priority, next(self._sequence))
+        start = time.monotonic()
+
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            try:
+                while True:
+                    if self._queue[0] == ticket:
+                        # Takes the capacity when the delay is 0
+                        delay = self.limits.try_take(estimated_tokens)
+                        if delay <= 0:
+                            break
+                    else:
+                        delay = None  # Woken when the head of the queue changes
+                    self._cond.wait(delay)
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._queue)
+            self.in_flight += 1
+            self.granted += 1
+
+            waited = time.monotonic() - start
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if waited > 0.01:
+                self.throttled += 1
+            self._cond.notify_all()
+
+        return Reservation(estimated_tokens)
+
+    def release(self, reservation):
+        with self._cond:
+            self.in_flight -= 1
+            if reservation.prompt_tokens is not None:
+                actual_tokens = reservation.prompt_tokens + reservation.completion_tokens
+                self.limits.adjust(actual_tokens - reservation.estimated_tokens)
+                self.prompt_tokens += reservation.prompt_tokens
+                self.completion_tokens += reservation.completion_tokens
+                self.cached_tokens += reservation.cached_tokens
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Holds every queued call for `seconds`, e.g. after a 429 with Retry-After."""
+        with self._cond:
+            self.limits.pause(seconds)
+            self.pauses += 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self.in_flight,
+                "granted": self.granted,
+                "throttled": self.throttled,
+                "pauses": self.pauses,
+                "paused_for_seconds": round(self.limits.paused_for(), 3),
+                "average_wait_seconds": round(self.total_wait_seconds / self.granted, 3) if self.granted else 0.0,
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "shared": isinstance(self.limits, SharedRateLimits),
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
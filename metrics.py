@@ -0,0 +1,232 @@
+"""
+In-process metrics and request tracing.
+
+Counters and histograms are kept in memory and served by /metrics in the
+Prometheus text format, so a scraper can graph where the time of a run goes:
+
+  tender_stage_duration_seconds{stage}     upload, extract, redact, boilerplate, prescreen, llm_request,
+                                           evaluate_document, evaluate_criterion, tables
+  tender_llm_requests_total{model,outcome} model calls, "ok" or the exception name
+  tender_llm_tokens_total{model,kind}      prompt, cached_prompt and completion tokens
+  tender_llm_cost_usd_total{model}         cost from the LLM_PRICE_* settings
+  tender_evaluation_cache_total{result}    evaluation cache hits and misses
+  tender_boilerplate_tokens_saved_total    prompt tokens saved by collapsing boilerplate
+  tender_yes_no_decided_locally_total{answer}  yes/no criteria settled by the evidence pre-screen
+  tender_http_requests_total{endpoint,method,status}
+  tender_http_request_duration_seconds{endpoint}   until the response headers are sent
+
+Labels never include document names, so the number of series stays small.
+Extraction and redaction run in the ingestion process pool, where nothing recorded
+here would reach the web process; the workers return their timings with the
+IngestResult and the web process records them. Each gunicorn worker keeps its
+own numbers, like `jobs`.
+
+Every request gets a trace ID (X-Request-ID if the client sent one). Spans timed
+with timed() carry it into evaluation threads started with submit_in_context(), and
+are written to the "metrics.trace" logger, which only logs when TRACE_REQUESTS is on.
+"""
+import bisect
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+trace_logger = logging.getLogger("metrics.trace")
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Bucketed observations (cumulative in the output), with their sum and count, per label combination."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(float(series[-2]))}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """A value read from `read()` at scrape time, e.g. the scheduler queue depth."""
+
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.read())}",
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, read):
+        return self.register(Gauge(name, documentation, read))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "tender_stage_duration_seconds", "Time spent in each processing stage.", ["stage"]
+)
+LLM_REQUESTS = REGISTRY.counter(
+    "tender_llm_requests_total", "Model calls by outcome.", ["model", "outcome"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "tender_llm_tokens_total", "Tokens reported by the model API.", ["model", "kind"]
+)
+LLM_COST = REGISTRY.counter(
+    "tender_llm_cost_usd_total", "Estimated model cost in US dollars.", ["model"]
+)
+EVALUATION_CACHE = REGISTRY.counter(
+    "tender_evaluation_cache_total", "Evaluation cache lookups.", ["result"]
+)
+BOILERPLATE_TOKENS_SAVED = REGISTRY.counter(
+    "tender_boilerplate_tokens_saved_total", "Estimated prompt tokens saved by collapsing boilerplate."
+)
+YES_NO_DECIDED_LOCALLY = REGISTRY.counter(
+    "tender_yes_no_decided_locally_total", "Yes/no criteria answered from the document text without a model call.",
+    ["answer"]
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "tender_http_requests_total", "HTTP requests handled.", ["endpoint", "method", "status"]
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "tender_http_request_duration_seconds", "Time until the response headers are sent.", ["endpoint"]
+)
+
+
+def start_trace(trace_id):
+    """Makes `trace_id` the current trace for this thread (and threads started with submit_in_context)."""
+    _trace_id.set(trace_id)
+
+
+def current_trace():
+    return _trace_id.get()
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit() that runs `fn` with the caller's trace ID."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def log_span(stage, seconds, **fields):
+    if trace_logger.isEnabledFor(logging.INFO):
+        details = "".join(f" {key}={value!r}" for key, value in fields.items())
+        trace_logger.info("trace=%s stage=%s seconds=%.3f%s", current_trace() or "-", stage, seconds, details)
+
+
+def observe_stage(stage, seconds, **fields):
+    """Records `seconds` spent in `stage`; `fields` (document names etc.) only go to the trace log."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    log_span(stage, seconds, **fields)
+
+
+@contextlib.contextmanager
+def timed(stage, **fields):
+    """Times the block as `stage`, including when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, **fields)
+
+
+def render():
+    return REGISTRY.render()
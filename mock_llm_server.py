@@ -0,0 +1,104 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, for offline load testing.
+
+    python mock_llm_server.py --port 8081 --latency 2 --jitter 1 --error-rate 0.05 --rpm 60
+
+Then run the app against it with the real OpenAI client:
+
+    OPENAI_BASE_URL=http://localhost:8081/v1 OPENAI_API_KEY=mock gunicorn app:app
+
+Replies are deterministic for a given prompt: a well-formed HTML report followed by
+"### JSON Output:" and the JSON rows (see llm_backends.build_mock_reply). Over the
+--rpm limit it answers 429 with a Retry-After header, and --error-rate of requests
+fail with a 500, so retry and concurrency behaviour can be measured without tokens.
+"""
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_backends import LLMBackendError, MockBackend
+
+
+class MockCompletionsHandler(BaseHTTPRequestHandler):
+    backend = None  # Set in main()
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        options = {key: value for key, value in body.items() if key not in ("model", "messages", "temperature")}
+        try:
+            result = self.backend.complete(
+                body.get("messages", []), body.get("model"), body.get("temperature", 1.0), **options
+            )
+        except LLMBackendError as e:
+            headers = {"Retry-After": str(e.retry_after)} if e.retry_after is not None else {}
+            self.send_json(e.status_code, {"error": {"message": str(e), "type": "mock_error"}}, headers)
+            return
+
+        self.send_json(200, {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": result.text},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": result.prompt_tokens,
+                "completion_tokens": result.completion_tokens,
+                "total_tokens": result.prompt_tokens + result.completion_tokens,
+            },
+        })
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with a 500")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    MockCompletionsHandler.backend = MockBackend(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_rpm=args.rpm, seed=args.seed
+    )
+    server = ThreadingHTTPServer((args.host, args.port), MockCompletionsHandler)
+    server.quiet = args.quiet
+    print(f"✅ Mock LLM server listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
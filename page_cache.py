@@ -0,0 +1,211 @@
+"""
+Page-level cache of extracted PDF text.
+
+Bidders often resubmit a revised PDF with only a few pages changed. Each page's
+text is cached under a fingerprint of what PyPDF2 reads to extract it: the
+decoded content streams plus the page's resources (fonts, encodings, ToUnicode
+maps, form XObjects), with embedded font programs and image data left out. An
+unchanged page in a new file has the same fingerprint even though its object
+numbers moved, so only changed pages go through extract_text again.
+
+Fingerprinting decodes the content streams but does not interpret them, which
+costs a few percent of extract_text. Redaction is not cached per page: it is
+about a thousand times cheaper than extraction, less than a cache lookup, and
+whole redacted documents are already kept by the document store.
+
+Ingestion runs in worker processes, so every process opens its own connection
+(open_page_cache) to the shared SQLite file. Lookups and writes never fail an
+upload: on any SQLite error the page is simply extracted.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import PyPDF2
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Bump when the fingerprint or the cached text changes meaning
+PAGE_CACHE_VERSION = "1"
+
+# Irrelevant to text extraction: font programs, thumbnails, metadata and links into the
+# document's structure tree (which PDF writers renumber or drop)
+_SKIPPED_KEYS = {
+    "/FontFile", "/FontFile2", "/FontFile3", "/Parent", "/Thumb", "/Metadata", "/StructParent", "/StructParents",
+}
+# How a stream is encoded; its decoded data is hashed instead, so re-compressed files still match
+_STREAM_ENCODING_KEYS = {"/Length", "/Filter", "/DecodeParms"}
+
+
+def _hash_object(obj, digest, seen, depth=0):
+    """Feeds a PDF object into `digest`, resolving references, without object numbers."""
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key in seen or depth > 32:
+            digest.update(b"<ref>")
+            return
+        seen.add(key)
+        obj = obj.get_object()
+
+    if isinstance(obj, StreamObject) and obj.get("/Subtype") == "/Image":
+        digest.update(b"<image>")  # Images carry no extractable text
+    elif isinstance(obj, DictionaryObject):
+        skipped = _SKIPPED_KEYS | _STREAM_ENCODING_KEYS if isinstance(obj, StreamObject) else _SKIPPED_KEYS
+        digest.update(b"<<")
+        for key in sorted(obj.keys()):
+            if key in skipped:
+                continue
+            digest.update(key.encode("utf-8", "replace"))
+            _hash_object(obj.raw_get(key), digest, seen, depth + 1)
+        digest.update(b">>")
+        if isinstance(obj, StreamObject):
+            digest.update(obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for item in obj:
+            _hash_object(item, digest, seen, depth + 1)
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode("utf-8", "replace"))
+    digest.update(b"\0")
+
+
+def page_fingerprint(page):
+    """SHA-256 of a page's content streams and resources, stable across files and object renumbering."""
+    digest = hashlib.sha256(f"{PAGE_CACHE_VERSION}\0{PyPDF2.__version__}\0".encode("utf-8"))
+    seen = set()
+    for key in ("/Contents", "/Resources", "/Rotate"):
+        digest.update(key.encode("utf-8"))
+        if key in page:
+            _hash_object(page.raw_get(key), digest, seen)
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """SQLite-backed page text cache with size-based LRU eviction."""
+
+    # Eviction sums the table, so it runs every this many writes rather than on each one
+    EVICT_EVERY = 64
+
+    def __init__(self, path, max_bytes=500 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Worker processes write concurrently, so wait for the write lock instead of failing
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                fingerprint TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages (last_accessed)")
+        self._conn.commit()
+
+    def get(self, fingerprint):
+        """The cached text of a page, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM pages WHERE fingerprint = ?", (fingerprint,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE pages SET last_accessed = ?, hit_count = hit_count + 1 WHERE fingerprint = ?",
+                (time.time(), fingerprint),
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, fingerprint, text):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (fingerprint, text, size_bytes, last_accessed) VALUES (?, ?, ?, ?)",
+                (fingerprint, text, len(text.encode("utf-8")), time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops least recently used pages until under max_bytes. Caller holds the lock."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for fingerprint, size_bytes in self._conn.execute(
+            "SELECT fingerprint, size_bytes FROM pages ORDER BY last_accessed"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM pages WHERE fingerprint = ?", (fingerprint,))
+            total -= size_bytes
+
+    def stats(self):
+        """Sizes and lifetime reuse from the shared file; hits/misses only count this process's lookups."""
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+            pages, total, reused = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hit_count), 0) FROM pages"
+            ).fetchone()
+            return {
+                "pages": pages,
+                "size_bytes": total,
+                "pages_reused": reused,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_open_caches = {}
+_open_caches_lock = threading.Lock()
+
+
+def open_page_cache(path, max_bytes):
+    """This process's connection to the cache at `path`; a forked worker never reuses its parent's."""
+    key = (os.getpid(), path)
+    with _open_caches_lock:
+        cache = _open_caches.get(key)
+        if cache is None:
+            cache = _open_caches[key] = PageTextCache(path, max_bytes)
+        return cache
+
+
+def cached_page_text(page, cache):
+    """page.extract_text(), from `cache` when a page with the same content was extracted before."""
+    if cache is None:
+        return page.extract_text()
+
+    try:
+        fingerprint = page_fingerprint(page)
+        text = cache.get(fingerprint)
+    except (sqlite3.Error, AttributeError, KeyError, TypeError, ValueError, PyPDF2.errors.PyPdfError):
+        # A malformed page or a locked database only costs the cache lookup
+        return page.extract_text()
+    if text is not None:
+        return text
+
+    text = page.extract_text()
+    try:
+        cache.put(fingerprint, text)
+    except sqlite3.Error:
+        pass
+    return text
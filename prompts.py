@@ -0,0 +1,217 @@
+"""
+Evaluation prompt builder.
+
+Prompts are laid out so that everything shared by the bidders of one run comes first,
+byte-for-byte identical: the instructions, the criteria block and the output
+requirements. Only the document text and the document-specific parts follow: the
+JSON keys and the yes/no criteria already answered locally (see evidence.py).
+Providers that cache prompt prefixes (OpenAI does for prefixes over 1024 tokens)
+can then reuse the shared part for every document after the first.
+
+The criteria block is rendered once per criteria set in a compact, stable text
+format instead of Python dict reprs. Empty sub-criteria and comment lists and blank
+comment lines are left out:
+
+  ### Scored Criteria (Rate 1-10; weighting in brackets):
+  - [40%] RELEVANT EXPERTISE & EXPERIENCE
+    - Sub-criterion: Team qualifications
+      - Degree-qualified staff
+    - Note: Consider local experience
+
+  ### Yes/No Criteria (Answer 'Yes' if explicit evidence is present, otherwise 'No'):
+  - Insurance requirements
+"""
+import functools
+import json
+
+SCORED_HEADING = "### Scored Criteria (Rate 1-10; weighting in brackets):"
+YES_NO_HEADING = "### Yes/No Criteria (Answer 'Yes' if explicit evidence is present, otherwise 'No'):"
+CONTEXT_HEADING = "### Other Requirements (context only, not scored):"
+JSON_KEYS_HEADING = "### JSON keys for this document:"
+ANSWERED_HEADING = "### Already answered (leave these yes/no criteria out of the report and the JSON):"
+
+
+def _format_weighting(weighting):
+    return f"{weighting:g}" if isinstance(weighting, (int, float)) else str(weighting)
+
+
+def _lines(values):
+    """Non-blank comment lines, stripped."""
+    return [str(value).strip() for value in values or [] if value is not None and str(value).strip()]
+
+
+def criterion_details(criterion, indent="  "):
+    """Sub-criteria and comments of one criterion as indented bullet lines; empty ones are dropped."""
+    lines = []
+    for sub in criterion.get('sub_criteria') or []:
+        lines.append(f"{indent}- Sub-criterion: {str(sub['name']).strip()}")
+        lines.extend(f"{indent}  - {comment}" for comment in _lines(sub.get('comments')))
+    lines.extend(f"{indent}- Note: {comment}" for comment in _lines(criterion.get('comments')))
+    return lines
+
+
+def _render_criteria_block(criteria_json):
+    criteria_data = json.loads(criteria_json)
+    by_order = sorted(criteria_data.items(), key=lambda item: item[1].get('order', 0))
+    sections = []
+
+    scored = [(k, v) for k, v in by_order if v['type'] == 'scored_criteria']
+    if scored:
+        lines = [SCORED_HEADING]
+        for name, criterion in scored:
+            lines.append(f"- [{_format_weighting(criterion['weighting'])}%] {name}")
+            lines.extend(criterion_details(criterion))
+        sections.append("\n".join(lines))
+
+    yes_no = [(k, v) for k, v in by_order if v['type'] == 'yes_no_criteria']
+    if yes_no:
+        lines = [YES_NO_HEADING]
+        for name, criterion in yes_no:
+            lines.append(f"- {name}")
+            lines.extend(criterion_details(criterion))
+        sections.append("\n".join(lines))
+
+    # Rows the spreadsheet could not classify were only ever context for the model
+    other = [(k, v) for k, v in by_order if v['type'] not in ('scored_criteria', 'yes_no_criteria')]
+    other_lines = []
+    for name, criterion in other:
+        details = criterion_details(criterion)
+        if details:
+            other_lines.append(f"- {name}")
+            other_lines.extend(details)
+    if other_lines:
+        sections.append("\n".join([CONTEXT_HEADING] + other_lines))
+
+    return "\n\n".join(sections)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_criteria_block(criteria_json):
+    return _render_criteria_block(criteria_json)
+
+
+def criteria_block(criteria_data):
+    """The compact criteria section; rendered once per distinct criteria set."""
+    return _cached_criteria_block(json.dumps(criteria_data, sort_keys=True, default=str))
+
+
+DOCUMENT_REQUIREMENTS = """
+### Output Requirements:
+1. **Global Summary Scoring Table:**
+   - Note: The global Summary Scoring Table that displays scores for all documents is generated separately and should appear at the top of the overall report.
+   - Do not include any per-document summary scoring table here.
+
+2. **Document Evaluation Report:**
+   - Start with an "Executive Summary".
+   - For each criterion, output a section titled "Criteria" with:
+       - The criterion name and its score (formatted as X/10).
+       - Page References (if page references are sequential, group them into a range; for example, output "5-101" instead of listing each page individually).
+       - Strengths and Weaknesses.
+   - Under each criterion, include a "Sub-Criteria" section that lists each sub-criterion with its name, score (formatted as X/10), and related comments.
+   - After the entire group of sub-criteria for a criterion, insert a lightweight horizontal line (e.g. `<hr style="border-top: 1px solid #ccc;">`) before proceeding to the next criterion.
+   - Include a "Yes/No Criteria" section at the end that lists each yes/no criterion along with its answer and justification (including grouped page references as specified).
+   - Conclude the report with a "Conclusion" section summarizing the overall evaluation findings.
+   - Output the entire report as HTML with no markdown formatting or code block markers.
+
+3. **JSON Data:**
+   - Immediately after the HTML report, add a new line with exactly: "### JSON Output:".
+   - On the next line, output a valid JSON array containing the evaluation data.
+     - The JSON array must start with "[" and end with "]".
+     - Each object in the array should include the keys: "Criterion", the score key given at the end of this prompt, and "Weighting (%)". If applicable, include a key "Sub-Criteria" whose value is an array of objects with keys like "Name", "Comments", and "Score".
+   - Do not include any extra text before or after the JSON array.
+""".strip()
+
+
+STRUCTURED_REQUIREMENTS = """
+### Output Requirements:
+Return a JSON object with:
+- "executive_summary": a short executive summary of the document.
+- "criteria": one entry per scored and yes/no criterion, using the criterion name exactly as listed above, with:
+    - "score": 1-10 for scored criteria, null for yes/no criteria.
+    - "answer": "Yes" or "No" for yes/no criteria, null for scored criteria.
+    - "page_references": the supporting pages; group sequential pages into a range (e.g. "5-101").
+    - "strengths", "weaknesses" and "justification".
+    - "sub_criteria": each sub-criterion of that criterion with its "name", "score" (1-10) and "comments".
+- "conclusion": a summary of the overall evaluation findings.
+""".strip()
+
+
+def shared_prefix(criteria_data, requirements=DOCUMENT_REQUIREMENTS):
+    """Everything before the document: identical for every bidder evaluated against `criteria_data`."""
+    return (
+        "Evaluate the provided document using the specified criteria.\n\n"
+        f"{criteria_block(criteria_data)}\n\n"
+        f"{requirements}\n\n"
+        "### Document:\n"
+    )
+
+
+def answered_note(answered):
+    """
+    Yes/no criteria already settled from the document text (see evidence.py). Listed after the
+    document rather than removed from the criteria block, so the shared prefix stays the same.
+    """
+    if not answered:
+        return ""
+    lines = "\n".join(f"- {name}" for name in answered)
+    return f"\n\n{ANSWERED_HEADING}\n{lines}"
+
+
+def build_document_prompt(document_text, criteria_data, document_name, answered=()):
+    """EVALUATION_MODE=document prompt: HTML report followed by the JSON rows."""
+    return (
+        f"{shared_prefix(criteria_data)}{document_text}\n\n---"
+        f"{answered_note(answered)}\n\n"
+        f"{JSON_KEYS_HEADING}\n"
+        f'Score key: "{document_name} Score"'
+    )
+
+
+def build_structured_prompt(document_text, criteria_data, answered=()):
+    """EVALUATION_OUTPUT_FORMAT=structured prompt; the reply follows structured_evaluation.EVALUATION_SCHEMA."""
+    suffix = f"\n\n---{answered_note(answered)}" if answered else ""
+    return f"{shared_prefix(criteria_data, STRUCTURED_REQUIREMENTS)}{document_text}{suffix}"
+
+
+def build_criterion_prompt(document_text, criterion_name, criterion, document_name):
+    """EVALUATION_MODE=per_criterion prompt; the prefix is shared by every bidder for this criterion."""
+    if criterion['type'] == 'scored_criteria':
+        criterion_line = f"{criterion_name} (Rate 1-10, weighting {_format_weighting(criterion['weighting'])}%)"
+        result_key = f"{document_name} Score"
+        answer_format = "its score (formatted as X/10)"
+    else:
+        criterion_line = f"{criterion_name} (Answer 'Yes' if explicit evidence is present, otherwise 'No')"
+        result_key = f"{document_name} Yes/No"
+        answer_format = "its answer (Yes or No) and justification"
+
+    details = "\n".join(criterion_details(criterion, indent=""))
+
+    return f"""
+Evaluate the provided document against a single criterion.
+
+### Criterion:
+{criterion_line}
+{details}
+
+### Output Requirements:
+1. **Criterion Section:**
+   - Output a section titled "Criteria" with the criterion name and {answer_format}.
+   - Page References (if page references are sequential, group them into a range; for example, output "5-101" instead of listing each page individually).
+   - Strengths and Weaknesses.
+   - If there are sub-criteria, include a "Sub-Criteria" section that lists each sub-criterion with its name, score (formatted as X/10), and related comments.
+   - End the section with a lightweight horizontal line (e.g. `<hr style="border-top: 1px solid #ccc;">`).
+   - Output the section as HTML with no markdown formatting or code block markers. Do not add an executive summary or conclusion.
+
+2. **JSON Data:**
+   - Immediately after the HTML section, add a new line with exactly: "### JSON Output:".
+   - On the next line, output a valid JSON array containing exactly one object with the keys: "Criterion" (exactly "{criterion_name}"), the result key given at the end of this prompt, and "Weighting (%)". If applicable, include a key "Sub-Criteria" whose value is an array of objects with keys like "Name", "Comments", and "Score".
+   - Do not include any extra text before or after the JSON array.
+
+### Document:
+{document_text}
+
+---
+
+{JSON_KEYS_HEADING}
+Result key: "{result_key}"
+""".strip()
@@ -0,0 +1,101 @@
+"""
+Single-pass redaction engine.
+
+Combines the patterns of redact_sensitive_data, redact_pii and
+redact_persons_name (document_processing.py) into one precompiled
+alternation, so a document is scanned once instead of a dozen times and no
+regex is compiled per match. Alternatives are ordered like the original
+passes, so where two rules match at the same position the one from the
+earlier pass wins. Each alternative is guarded by a lookahead on the first
+character it can start with, so at most positions only one or two rules are
+tried instead of all of them.
+
+"(Page N)" markers are kept intact; the chained passes redacted "Page" as a
+person's name, which broke page references in the reports.
+
+redact() also returns the list of redaction spans (positions in the
+original text), which the chained re.sub calls could not provide.
+"""
+import os
+import re
+from typing import NamedTuple
+
+STREET_TYPES = r"(?:St|Street|Dv|Dve|Drive|Lane|Ln|Road|Rd|Court|Ct|Crescent|Cr|Cres|Highway|HWY|Hwy|Ave|Avenue|Boulevard|Way)"
+STATE_TYPES = r"(?:ACT|Australian Capital Territory|NSW|New South Wales|NT|Northern Territory|QLD|Queensland|SA|South Australia|TAS|Tasmania|VIC|Victoria|WA|Western Australia)"
+NOT_EMAIL = r"(?![\w.%+-]*@)"
+
+# (rule name, pattern, replacement). Order matters: see module docstring.
+REDACTION_RULES = [
+    # redact_sensitive_data
+    ("ssn", r"\b\d{3}[-.]?\d{2}[-.]?\d{4}\b", "[REDACTED]"),
+    ("ip_address", r"\b(?:\d{1,3}\.){3}\d{1,3}\b", "[REDACTED]"),
+    ("card_number", r"\b\d{16}\b", "[REDACTED]"),
+    ("email", r"\b[\w.%+-]+@[\w.-]+\.[a-zA-Z]{2,}\b", "[REDACTED]"),
+    ("price", r"\$\s?\d+(?:,\d{3})*(?:\.\d{2})?", "[REDACTED]"),
+    ("contract", r"CONTRACT\s+\d+", "[REDACTED]"),
+    # redact_pii
+    ("phone", r"\b(?:\+?\d{1,3}[-.\s]?)?(?:\(?\d{1,4}\)?[-.\s]?)?\d{3,4}[-.\s]?\d{3,4}\b", "[REDACTED PHONE]"),
+    ("credit_card", r"\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b", "[REDACTED CREDIT CARD]"),
+    # The street name is capped at six words; the unbounded (?:\s\w+)* in redact_pii
+    # backtracks across whole paragraphs looking for a street type.
+    ("address",
+     rf"(?i:\b(?:\d+/)?\d+[a-zA-Z]?\s+\w+(?:\s\w+){{0,5}}\s{STREET_TYPES}"
+     rf"(?:,?\s\w+(?:\s\w+){{0,3}})?(?:,?\s\d{{4}})?(?:,?\s{STATE_TYPES})?(?:,?\s\d{{4}})?\b)",
+     "[REDACTED ADDRESS]"),
+    # redact_persons_name. In one pass a name could swallow the start of a following email
+    # address ("Email Bob.Jones@..."), which the email pass used to redact first, so a word
+    # that begins an email address is never taken as part of a name.
+    ("name",
+     rf"\b(?:{NOT_EMAIL}[A-Z][a-z]+(?:\s{NOT_EMAIL}[A-Z][a-z]+)*"
+     rf"|{NOT_EMAIL}[A-Z](?:\.|[a-z]+)?(?:\s{NOT_EMAIL}[A-Z](?:\.|[a-z]+)?)*\s{NOT_EMAIL}[A-Z][a-z]+)\b",
+     "[REDACTED NAME]"),
+]
+
+REPLACEMENTS = {name: replacement for name, _, replacement in REDACTION_RULES}
+PATTERNS = {name: pattern for name, pattern, _ in REDACTION_RULES}
+
+
+def _group(rule, suffix=""):
+    # Group names must be unique, so a rule used in several branches gets a "__suffix"
+    return f"(?P<{rule}{suffix}>{PATTERNS[rule]})"
+
+
+COMBINED_PATTERN = re.compile("|".join([
+    r"(?P<page_marker>\(Page \d+\))",
+    r"(?=[0-9+(])(?:" + "|".join([
+        _group("ssn"), _group("ip_address"), _group("card_number"), _group("email", "__digit"),
+        _group("phone"), _group("credit_card"), _group("address"),
+    ]) + ")",
+    r"(?=\$)" + _group("price"),
+    r"(?=[A-Z])(?:" + "|".join([_group("email", "__upper"), _group("contract"), _group("name")]) + ")",
+    r"(?=[\w.%+-])" + _group("email"),
+]))
+
+# Names that are never redacted, so the LLM can detect previous work done with Wannon Water
+ALWAYS_KEPT_NAMES = frozenset({"Wannon Water"})
+
+
+class RedactionSpan(NamedTuple):
+    start: int  # Offsets in the original text
+    end: int
+    rule: str
+    replacement: str
+
+
+def redact(text, filename):
+    """
+    Redacts `text` in a single pass. Capitalised words matching the document's own company
+    name (the filename without extension) are kept. Returns (redacted_text, spans).
+    """
+    kept_names = ALWAYS_KEPT_NAMES | {os.path.splitext(filename)[0]}
+    spans = []
+
+    def replace(match):
+        rule = match.lastgroup.split("__")[0]
+        if rule == "page_marker" or (rule == "name" and match.group() in kept_names):
+            return match.group()
+        replacement = REPLACEMENTS[rule]
+        spans.append(RedactionSpan(match.start(), match.end(), rule, replacement))
+        return replacement
+
+    return COMBINED_PATTERN.sub(replace, text), spans
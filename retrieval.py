@@ -0,0 +1,199 @@
+"""
+Page-aware chunking and local BM25 retrieval for large responses.
+
+Redacted text from extract_text_from_pdf carries "(Page N)" markers. When a
+document is larger than the prompt budget, it is split on those markers into
+token-budgeted chunks and only the chunks most relevant to each criterion are
+sent to the model. Chunks keep their "(Page N)" prefix so page references in
+the report stay correct. Everything runs locally; nothing is sent over the network.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+# Bump when chunk selection changes: the selected text is part of cached evaluations
+RETRIEVAL_VERSION = "2"
+
+PAGE_MARKER = re.compile(r"\(Page (\d+)\)")
+WORD = re.compile(r"[a-z0-9]+")
+
+# Common words that carry no signal for matching criteria to pages
+STOPWORDS = frozenset("""
+a an and are as at be been by can do does for from has have how if in is it its
+may of on or our shall should that the their them there these this to was we
+were what when which will with would you your yes no
+""".split())
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def tokenize(text):
+    return [word for word in WORD.findall(text.lower()) if len(word) > 1 and word not in STOPWORDS]
+
+
+def split_pages(text):
+    """Splits text on "(Page N)" markers into (page_number, page_text) pairs; page_number is None for unmarked text."""
+    matches = list(PAGE_MARKER.finditer(text))
+    if not matches:
+        return [(None, text)] if text.strip() else []
+
+    pages = []
+    if text[:matches[0].start()].strip():
+        pages.append((None, text[:matches[0].start()]))
+
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        pages.append((int(match.group(1)), text[match.start():end]))
+
+    return pages
+
+
+def chunk_pages(text, max_tokens):
+    """
+    Splits text into chunks of at most roughly `max_tokens`, never crossing a page boundary.
+    Long pages are split on line breaks (or word boundaries) and every piece is re-prefixed
+    with its "(Page N)" marker.
+    """
+    chunks = []
+    for page, page_text in split_pages(text):
+        if estimate_tokens(page_text) <= max_tokens:
+            chunks.append(page_text.strip())
+            continue
+
+        prefix = f"(Page {page}) " if page is not None else ""
+        body = PAGE_MARKER.sub("", page_text, count=1) if page is not None else page_text
+        current, current_tokens = [], 0
+        for line in _split_long_lines(body, max_tokens):
+            line_tokens = estimate_tokens(line)
+            if current and current_tokens + line_tokens > max_tokens:
+                chunks.append(prefix + "\n".join(current).strip())
+                current, current_tokens = [], 0
+            current.append(line)
+            current_tokens += line_tokens
+        if current:
+            chunks.append(prefix + "\n".join(current).strip())
+
+    return [chunk for chunk in chunks if chunk]
+
+
+def _split_long_lines(text, max_tokens):
+    """Yields the lines of `text`, breaking any line over `max_tokens` at word boundaries."""
+    max_chars = max_tokens * 4
+    for line in text.splitlines():
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            yield line[:cut]
+            line = line[cut:].lstrip()
+        yield line
+
+
+class BM25Index:
+    """Okapi BM25 over a list of text chunks."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        n = len(chunks)
+        self.idf = {
+            term: math.log(1 + (n - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+    def scores(self, query):
+        """BM25 score of every chunk for `query`."""
+        terms = set(tokenize(query))
+        scores = [0.0] * len(self.chunks)
+        if not self.average_length:
+            return scores
+
+        for i, counts in enumerate(self.term_counts):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.average_length)
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores[i] = score
+        return scores
+
+    def search(self, query, top_k=None):
+        """Chunk indexes ordered by relevance to `query`, best first; chunks with no matching term are left out."""
+        scores = self.scores(query)
+        ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: (-scores[i], i))
+        return ranked[:top_k] if top_k else ranked
+
+
+@lru_cache(maxsize=32)
+def build_index(text, max_chunk_tokens):
+    """Chunks and indexes a document; cached because per-criterion mode queries the same text many times."""
+    return BM25Index(chunk_pages(text, max_chunk_tokens))
+
+
+def select_relevant_text(text, queries, token_budget, max_chunk_tokens=800):
+    """
+    Returns `text` unchanged if it fits in `token_budget`. Otherwise returns the most relevant
+    chunks for `queries`, joined in document order. Queries take turns: each round every query
+    adds its next most relevant chunk, so each gets its best chunk first however many there are,
+    and budget one query has no more matching chunks for goes to the others. A chunk too big
+    for what is left is skipped for a smaller one further down the ranking.
+    """
+    if estimate_tokens(text) <= token_budget or not queries:
+        return text
+
+    index = build_index(text, max_chunk_tokens)
+    chunk_tokens = [estimate_tokens(chunk) for chunk in index.chunks]
+    rankings = [index.search(query) for query in queries]
+    positions = [0] * len(rankings)
+    selected = set()
+    used = 0
+
+    added = True
+    while added and used < token_budget:
+        added = False
+        for query, ranked in enumerate(rankings):
+            while positions[query] < len(ranked):
+                i = ranked[positions[query]]
+                positions[query] += 1
+                if i in selected:
+                    added = True  # Already chosen for another query; this query's turn is used
+                    break
+                if used + chunk_tokens[i] > token_budget:
+                    continue
+                selected.add(i)
+                used += chunk_tokens[i]
+                added = True
+                break
+
+    # Nothing matched: fall back to the start of the document rather than sending nothing
+    if not selected:
+        for i, tokens in enumerate(chunk_tokens):
+            if used + tokens > token_budget:
+                break
+            selected.add(i)
+            used += tokens
+
+    return "\n".join(index.chunks[i] for i in sorted(selected))
+
+
+def criterion_queries(criterion_name, criterion):
+    """One retrieval query for the criterion itself and one per sub-criterion."""
+    comments = " ".join(str(comment) for comment in criterion.get('comments', []))
+    queries = [f"{criterion_name} {comments}".strip()]
+    for sub in criterion.get('sub_criteria', []):
+        sub_comments = " ".join(str(comment) for comment in sub.get('comments', []))
+        queries.append(f"{criterion_name} {sub['name']} {sub_comments}".strip())
+    return queries
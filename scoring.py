@@ -0,0 +1,159 @@
+"""
+Summary scoring tables built directly from the evaluation rows.
+
+Scores are written into a preallocated criteria x bidder NumPy matrix (criteria
+ordered by the spreadsheet's order_mapping), weighted totals are computed in one
+vectorised step, and the HTML is rendered from a small string template instead
+of DataFrame groupby/concat and the pandas Styler.
+"""
+import html
+from typing import List, NamedTuple
+
+import numpy as np
+
+SCORE_SUFFIX = " Score"
+YES_NO_SUFFIX = " Yes/No"
+
+
+class ScoreTable(NamedTuple):
+    criteria: List[str]        # Scored criteria, in spreadsheet order
+    bidders: List[str]
+    scores: np.ndarray         # criteria x bidders, NaN where no score was returned
+    weightings: np.ndarray     # per criterion, percent
+    weighted: np.ndarray       # scores * weightings / 100
+    yes_no_criteria: List[str]
+    yes_no: np.ndarray         # yes/no criteria x bidders, object array of answers (None if missing)
+
+
+def bidder_name(column):
+    """"CompanyXX_redacted.txt Score" -> "CompanyXX"."""
+    return column.replace("_redacted.txt", "").strip()
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def build_score_table(rows, weightings, order_mapping):
+    """Accumulates the JSON rows of every document into a ScoreTable."""
+    bidders = set()
+    yes_no_names = set()
+    for row in rows:
+        for key in row:
+            if key.endswith(SCORE_SUFFIX):
+                bidders.add(bidder_name(key[:-len(SCORE_SUFFIX)]))
+            elif key.endswith(YES_NO_SUFFIX):
+                bidders.add(bidder_name(key[:-len(YES_NO_SUFFIX)]))
+                yes_no_names.add(row.get("Criterion"))
+
+    bidders = sorted(bidders)
+    bidder_index = {name: i for i, name in enumerate(bidders)}
+    order = lambda name: order_mapping.get(name, len(order_mapping))  # noqa: E731
+
+    criteria = sorted(weightings, key=order)
+    criterion_index = {name: i for i, name in enumerate(criteria)}
+    yes_no_criteria = sorted((name for name in yes_no_names if name is not None and name not in criterion_index), key=order)
+    yes_no_index = {name: i for i, name in enumerate(yes_no_criteria)}
+
+    scores = np.full((len(criteria), len(bidders)), np.nan)
+    yes_no = np.full((len(yes_no_criteria), len(bidders)), None, dtype=object)
+
+    for row in rows:
+        criterion = row.get("Criterion")
+        for key, value in row.items():
+            if key.endswith(SCORE_SUFFIX) and criterion in criterion_index:
+                column = bidder_index[bidder_name(key[:-len(SCORE_SUFFIX)])]
+                # First value wins, as groupby().first() did
+                if np.isnan(scores[criterion_index[criterion], column]):
+                    scores[criterion_index[criterion], column] = _to_float(value)
+            elif key.endswith(YES_NO_SUFFIX) and criterion in yes_no_index:
+                column = bidder_index[bidder_name(key[:-len(YES_NO_SUFFIX)])]
+                if yes_no[yes_no_index[criterion], column] is None:
+                    yes_no[yes_no_index[criterion], column] = value
+
+    weights = np.array([_to_float(weightings[name]) for name in criteria], dtype=float)
+    weighted = scores * weights[:, None] / 100
+
+    return ScoreTable(criteria, bidders, scores, weights, weighted, yes_no_criteria, yes_no)
+
+
+def score_rows(table):
+    """
+    Header and rows of the summary scoring table: Criterion | <bidder> Score ... | Weighting (%) |
+    Weighted <bidder> Score ..., then a Total row. Numbers are floats (NaN where missing); the
+    HTML table and the batch CLI's CSV are both written from these rows.
+    """
+    header = (
+        ["Criterion"]
+        + [f"{b} Score" for b in table.bidders]
+        + ["Weighting (%)"]
+        + [f"Weighted {b} Score" for b in table.bidders]
+    )
+    if not table.criteria or not table.bidders:
+        return header, []
+
+    # Only criteria every bidder was scored on count towards the totals, as in the pandas tables this replaced
+    complete = ~np.isnan(table.scores).any(axis=1)
+    rows = [
+        [str(criterion), *table.scores[i], table.weightings[i], *table.weighted[i]]
+        for i, criterion in enumerate(table.criteria) if complete[i]
+    ]
+    rows.append(["Total", *table.scores[complete].sum(axis=0), "", *table.weighted[complete].sum(axis=0)])
+    return header, rows
+
+
+def yes_no_rows(table):
+    """Header and rows of the yes/no table: Criterion | <bidder> Yes/No ..., "" where no answer was returned."""
+    header = ["Criterion"] + [f"{b} Yes/No" for b in table.bidders]
+    if not table.bidders:
+        return header, []
+    rows = [
+        [str(criterion)] + ["" if value is None else str(value) for value in table.yes_no[i]]
+        for i, criterion in enumerate(table.yes_no_criteria)
+    ]
+    return header, rows
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return "" if np.isnan(value) else f"{value:.1f}"
+
+
+def render_scores_html(table):
+    """Criterion | <bidder> Score ... | Weighting (%) | Weighted <bidder> Score ... with a bold Total row."""
+    header, rows = score_rows(table)
+    if not rows:
+        return "<p>No scored criteria.</p>"
+
+    e = html.escape
+    right = ' style="text-align: right;"'
+    body = []
+    for i, (criterion, *values) in enumerate(rows):
+        cells = [f"<td>{e(criterion)}</td>"] + [f"<td{right}>{_number(v)}</td>" for v in values]
+        style = ' style="font-weight: bold;"' if i == len(rows) - 1 else ""
+        body.append(f"<tr{style}>{''.join(cells)}</tr>")
+
+    return (
+        '<table class="table table-bordered">'
+        f"<thead><tr>{''.join(f'<th>{e(name)}</th>' for name in header)}</tr></thead>"
+        f"<tbody>{''.join(body)}</tbody></table>"
+    )
+
+
+def render_yes_no_html(table):
+    """Criterion | <bidder> Yes/No ... for the yes/no criteria; empty string if there are none."""
+    header, rows = yes_no_rows(table)
+    if not rows:
+        return ""
+
+    e = html.escape
+    body = ["<tr>" + "".join(f"<td>{e(value)}</td>" for value in row) + "</tr>" for row in rows]
+    return (
+        '<table class="table table-bordered">'
+        f"<thead><tr>{''.join(f'<th>{e(name)}</th>' for name in header)}</tr></thead>"
+        f"<tbody>{''.join(body)}</tbody></table>"
+    )
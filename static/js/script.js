@@ -1,4 +1,5 @@
 let selectedFiles = [];  // ✅ Store selected files globally
+let workspaceId = null;  // ✅ Server-side workspace holding this session's documents
 
 // ✅ Handle File Selection (Prevent Overwriting)
 document.getElementById("documents").addEventListener("change", function(event) {
@@ -11,14 +12,16 @@ document.getElementById("documents").addEventListener("change", function(event)
         }
     });
 
-    // Update UI with selected files
-    let fileList = document.getElementById("selectedFilesList");
-    fileList.innerHTML = "";  // Clear previous list
+    // Update UI with selected files, built off-document and inserted in one go
+    let items = document.createDocumentFragment();
     selectedFiles.forEach(file => {
-        fileList.innerHTML += `<li>${file.name}</li>`;
+        let item = document.createElement("li");
+        item.textContent = file.name;
+        items.appendChild(item);
     });
+    document.getElementById("selectedFilesList").replaceChildren(items);
 
-    console.log("Selected files:", selectedFiles);
+    console.log(`Selected ${selectedFiles.length} files`);
 });
 
 // ✅ Handle File Upload
@@ -36,6 +39,10 @@ document.getElementById("uploadForm").addEventListener("submit", async function(
     selectedFiles.forEach(file => {
         formData.append("documents", file);
     });
+    // Later uploads go into the same workspace so they are evaluated together
+    if (workspaceId) {
+        formData.append("workspace_id", workspaceId);
+    }
 
     console.log(`Uploading ${selectedFiles.length} documents...`);
 
@@ -44,35 +51,62 @@ document.getElementById("uploadForm").addEventListener("submit", async function(
         body: formData
     });
 
-    let result;
-    try {
-        result = await response.json();
-    } catch (error) {
-        alert("Error: Invalid response from server");
+    if (!response.ok) {
+        let result;
+        try {
+            result = await response.json();
+        } catch (error) {
+            result = {};
+        }
+        alert("Error: " + (result.error || "Invalid response from server"));
         // ❌ **FLAG: Hide the spinner if an error occurs**
         document.getElementById("loadingSpinner").classList.add("hidden");
-                
         return;
     }
 
-    if (response.ok) {
-        let outputDiv = document.getElementById("redactedFilesList");
-        outputDiv.innerHTML = "";  // Clear previous results
+    let outputDiv = document.getElementById("redactedFilesList");
+    outputDiv.innerHTML = "";  // Clear previous results
+    document.getElementById("redactedFilesSection").classList.remove("hidden");
 
-        result.redacted_files.forEach(file => {
-            outputDiv.innerHTML += `<li><a href="${file.redacted_text_file}" target="_blank">${file.document} (Download Redacted)</a></li>`;
-        });
+    // ✅ The server streams one JSON line per file as it is redacted, then a "done" line
+    let done = null;
+    let processed = 0;
+    await readJsonLines(response, message => {
+        workspaceId = message.workspace_id || workspaceId;
 
-        document.getElementById("redactedFilesSection").classList.remove("hidden");
-        document.getElementById("evaluateSection").classList.remove("hidden");
+        if (message.type === "done") {
+            done = message;
+            return;
+        }
+
+        processed += 1;
+        document.querySelector("#loadingSpinner p").textContent =
+            `Redacted ${processed} of ${message.total} documents... Please wait.`;
+
+        let item = document.createElement("li");
+        if (message.status === "redacted") {
+            item.innerHTML = `<a href="${message.redacted_text_file}" target="_blank">${message.document} (Download Redacted)</a>`;
+        } else {
+            item.textContent = `❌ ${message.document}: ${message.error}`;
+        }
+        outputDiv.appendChild(item);
+    });
+
+    document.querySelector("#loadingSpinner p").textContent = "Processing... Please wait.";
 
-        // ✅ Clear selection after upload
-        selectedFiles = [];
-        document.getElementById("selectedFilesList").innerHTML = "";
+    if (done && done.redacted_files.length > 0) {
+        let bundleLink = document.getElementById("downloadAllLink");
+        bundleLink.href = done.bundle_url;
+        bundleLink.classList.remove("hidden");
+        document.getElementById("evaluateSection").classList.remove("hidden");
     } else {
-        alert("Error: " + (result.error || "Unexpected error"));
+        alert("Error: No documents could be redacted.");
     }
 
+    // ✅ Clear selection after upload
+    selectedFiles = [];
+    document.getElementById("selectedFilesList").innerHTML = "";
+
     // 🚀 **FLAG: Hide the spinner after upload completes**
     document.getElementById("loadingSpinner").classList.add("hidden");
 
@@ -94,6 +128,7 @@ document.addEventListener("DOMContentLoaded", function () {
     evaluationInput.addEventListener("change", async function () {
         let formData = new FormData();
         formData.append("evaluation_criteria", this.files[0]);
+        formData.append("workspace_id", workspaceId || "");
 
         // 🚀 **FLAG: Show spinner before evaluation starts**
         document.getElementById("loadingSpinner").classList.remove("hidden");
@@ -108,7 +143,6 @@ document.addEventListener("DOMContentLoaded", function () {
         let result;
         try {
             result = await response.json();
-            console.log("✅ FULL API RESPONSE:", JSON.stringify(result, null, 2));
         } catch (error) {
             console.error("❌ Failed to parse JSON response:", error);
             alert("Error: Invalid response from server");
@@ -118,56 +152,35 @@ document.addEventListener("DOMContentLoaded", function () {
     
         }
 
-        // Ensure response contains "evaluations" array
-        if (!result.evaluations || !Array.isArray(result.evaluations)) {
-            console.error("❌ Invalid JSON structure:", result);
-            alert("Error: Invalid JSON structure");
-            // ❌ **FLAG: Hide spinner if response is invalid**
+        if (!response.ok || !result.job_id) {
+            alert("Error: " + (result.error || "Unexpected error"));
             document.getElementById("loadingSpinner").classList.add("hidden");
             return;
         }
 
-        // ✅ Insert the evaluation text for each document
+        console.log(`✅ Evaluation job ${result.job_id} started`);
+
+        // ✅ Show the results area straight away; reports are added as each document finishes
         let evalOutput = document.getElementById("results");
         evalOutput.innerHTML = ""; // Clear previous content
+        document.getElementById("evaluationResults").classList.remove("hidden");
 
-        result.evaluations.forEach(eval => {
-            evalOutput.innerHTML += `
-            <div class="evaluation-card">
-                <h1 style="margin-top: 0;">${eval.document.replace("_redacted.txt", "")}</h1>
-                    <p>${eval.evaluation.replace(/\(Page (\d+)\)/g, '<span style="color:black;">(Page $1)</span>')}</p>
-                <hr>
-            </div>`;
-            
-        });
+        // The full-screen spinner would hide partial results, so show inline progress instead
+        document.getElementById("loadingSpinner").classList.add("hidden");
+        let progress = document.getElementById("evaluationProgress");
+        progress.textContent = "Evaluation started...";
+        progress.classList.remove("hidden");
 
-        // ✅ Insert the evaluation table
-        if (result.evaluation_table && result.evaluation_table.trim() !== "") {
-            let tableDiv = document.getElementById("evaluationTable");
-            console.log("✅ Received Evaluation Table HTML:", result.evaluation_table);
-
-            tableDiv.innerHTML = `<h3>📊 Summary Scoring Table</h3>${result.evaluation_table}`;
-            tableDiv.classList.remove("hidden");
-        } 
-
-        // if (result.yes_no_table && result.yes_no_table.trim() !== "") {
-        //     let yesNoTableDiv = document.getElementById("yesNoEvaluationTable");
-        //     yesNoTableDiv.innerHTML = `<h3>✅ Yes/No Evaluation Table</h3>${result.yes_no_table}`;
-        //     yesNoTableDiv.classList.remove("hidden");
-        // }
-
-        if (result.yes_no_table && result.yes_no_table.trim() !== "") {
-            let yesNoTableDiv = document.getElementById("yesNoEvaluationTable");
-            yesNoTableDiv.innerHTML = result.yes_no_table;
-            yesNoTableDiv.classList.remove("hidden");
-        }
-        
+        let status = await pollEvaluationJob(result.status_url, evalOutput);
 
-        // Show evaluation results
-        document.getElementById("evaluationResults").classList.remove("hidden");
+        if (status.status === "failed") {
+            alert("Error: " + (status.error || "Evaluation failed"));
+        } else if (status.errors && status.errors.length > 0) {
+            alert("Some documents could not be evaluated:\n" +
+                status.errors.map(e => `${e.document}: ${e.error}`).join("\n"));
+        }
 
-        // ❌ **FLAG: Hide spinner if response is invalid**
-        document.getElementById("loadingSpinner").classList.add("hidden");
+        progress.classList.add("hidden");
 
         // hide the other sections
         document.getElementById("uploadForm").classList.add("hidden");
@@ -176,3 +189,128 @@ document.addEventListener("DOMContentLoaded", function () {
         
     });
 });
+
+// Polls an evaluation job until it finishes, adding a card for each finished document and
+// updating the summary tables as soon as they are available. Returns the final job status.
+async function pollEvaluationJob(statusUrl, evalOutput) {
+    let since = 0;
+
+    while (true) {
+        let response = await fetch(`${statusUrl}&since=${since}`);
+        let status = await response.json();
+
+        if (!response.ok) {
+            return {status: "failed", error: status.error};
+        }
+
+        addEvaluationCards(evalOutput, status.documents);
+        since = status.next;
+
+        updateSummaryTables(status);
+        document.getElementById("evaluationProgress").textContent =
+            `⏳ Evaluated ${status.completed} of ${status.total} documents...`;
+
+        if (status.status === "completed" || status.status === "failed") {
+            return status;
+        }
+
+        await new Promise(resolve => setTimeout(resolve, 1500));
+    }
+}
+
+// Reports are only fetched when their card comes near the viewport, so a run with many
+// long reports does not download and lay out all of them at once
+const reportObserver = new IntersectionObserver(entries => {
+    entries.forEach(entry => {
+        if (entry.isIntersecting) {
+            reportObserver.unobserve(entry.target);
+            loadReport(entry.target);
+        }
+    });
+}, {rootMargin: "800px 0px"});
+
+// Inserts cards for newly finished documents, keeping cards in the server's document order.
+// Cards that go before the same existing card are inserted together as one fragment.
+function addEvaluationCards(evalOutput, documents) {
+    let existing = Array.from(evalOutput.children);
+    let fragments = new Map();
+
+    documents.slice().sort((a, b) => a.index - b.index).forEach(doc => {
+        let next = existing.find(el => Number(el.dataset.index) > doc.index) || null;
+        if (!fragments.has(next)) {
+            fragments.set(next, document.createDocumentFragment());
+        }
+        fragments.get(next).appendChild(createEvaluationCard(doc));
+    });
+
+    fragments.forEach((fragment, next) => evalOutput.insertBefore(fragment, next));
+}
+
+// A placeholder card; the report itself is loaded by reportObserver
+function createEvaluationCard(doc) {
+    let card = document.createElement("div");
+    card.className = "evaluation-card";
+    card.dataset.index = doc.index;
+    card.dataset.reportUrl = doc.report_url;
+
+    let title = document.createElement("h1");
+    title.style.marginTop = "0";
+    title.textContent = doc.document.replace("_redacted.txt", "");
+
+    let report = document.createElement("div");
+    report.className = "evaluation-report";
+    report.textContent = "Loading report...";
+
+    card.append(title, report, document.createElement("hr"));
+    reportObserver.observe(card);
+    return card;
+}
+
+// Fetches a card's report and parses it once, into a fragment that replaces the placeholder
+async function loadReport(card) {
+    let report = card.querySelector(".evaluation-report");
+    let response = await fetch(card.dataset.reportUrl).catch(() => null);
+    if (!response || !response.ok) {
+        report.textContent = "❌ Could not load this report.";
+        return;
+    }
+
+    let html = (await response.text()).replace(/\(Page (\d+)\)/g, '<span style="color:black;">(Page $1)</span>');
+    report.replaceChildren(document.createRange().createContextualFragment(html));
+}
+
+function updateSummaryTables(status) {
+    // ✅ Insert the evaluation table
+    if (status.evaluation_table && status.evaluation_table.trim() !== "") {
+        let tableDiv = document.getElementById("evaluationTable");
+        tableDiv.innerHTML = `<h3>📊 Summary Scoring Table</h3>${status.evaluation_table}`;
+        tableDiv.classList.remove("hidden");
+    }
+
+    if (status.yes_no_table && status.yes_no_table.trim() !== "") {
+        let yesNoTableDiv = document.getElementById("yesNoEvaluationTable");
+        yesNoTableDiv.innerHTML = status.yes_no_table;
+        yesNoTableDiv.classList.remove("hidden");
+    }
+}
+
+// Reads a newline-delimited JSON response, calling onMessage for each line as it arrives
+async function readJsonLines(response, onMessage) {
+    let reader = response.body.getReader();
+    let decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        let {value, done} = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, {stream: true});
+        let lines = buffer.split("\n");
+        buffer = lines.pop();
+        lines.filter(line => line.trim() !== "").forEach(line => onMessage(JSON.parse(line)));
+    }
+
+    if (buffer.trim() !== "") {
+        onMessage(JSON.parse(buffer));
+    }
+}
@@ -0,0 +1,229 @@
+"""
+Structured (JSON-schema) evaluation output.
+
+With EVALUATION_OUTPUT_FORMAT=structured the model returns a JSON object that
+follows EVALUATION_SCHEMA instead of an HTML report with a JSON array appended.
+The reply is validated and repaired against the spreadsheet's criteria, the
+HTML report is rendered locally, and the rows for the summary tables (scoring.py)
+are built from the same data, so no regex scraping of long completions is needed.
+"""
+import html
+import json
+import re
+
+_SUB_CRITERION = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "score": {"type": ["number", "null"]},
+        "comments": {"type": "string"},
+    },
+    "required": ["name", "score", "comments"],
+    "additionalProperties": False,
+}
+
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "executive_summary": {"type": "string"},
+        "criteria": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "criterion": {"type": "string"},
+                    "score": {"type": ["number", "null"]},
+                    "answer": {"type": ["string", "null"], "enum": ["Yes", "No", None]},
+                    "page_references": {"type": "string"},
+                    "strengths": {"type": "string"},
+                    "weaknesses": {"type": "string"},
+                    "justification": {"type": "string"},
+                    "sub_criteria": {"type": "array", "items": _SUB_CRITERION},
+                },
+                "required": [
+                    "criterion", "score", "answer", "page_references", "strengths",
+                    "weaknesses", "justification", "sub_criteria",
+                ],
+                "additionalProperties": False,
+            },
+        },
+        "conclusion": {"type": "string"},
+    },
+    "required": ["executive_summary", "criteria", "conclusion"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "tender_evaluation", "strict": True, "schema": EVALUATION_SCHEMA},
+}
+
+
+def _key(name):
+    """Criterion names are matched ignoring case, punctuation and spacing differences."""
+    return re.sub(r"[^a-z0-9]+", " ", str(name).lower()).strip()
+
+
+def _load_json(text):
+    """Parses the reply, falling back to the outermost {...} block if the model wrapped it in prose or fences."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise ValueError("AI response does not contain a JSON object.")
+        try:
+            return json.loads(text[start:end + 1])
+        except json.JSONDecodeError as err:
+            raise ValueError(f"Invalid JSON format from AI response: {err}") from err
+
+
+def _score(value):
+    """Coerces 7, 7.5, "7", "7/10" to a number clamped to 1-10; anything else becomes None."""
+    if isinstance(value, str):
+        match = re.match(r"\s*(\d+(?:\.\d+)?)", value)
+        value = float(match.group(1)) if match else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return min(10.0, max(1.0, float(value)))
+
+
+def _answer(value):
+    if isinstance(value, str) and value.strip().lower() in ("yes", "y", "true"):
+        return "Yes"
+    if isinstance(value, str) and value.strip().lower() in ("no", "n", "false"):
+        return "No"
+    return None
+
+
+def _text(value):
+    if isinstance(value, list):
+        return "; ".join(str(item) for item in value)
+    return "" if value is None else str(value)
+
+
+def parse_structured_evaluation(text, criteria_data):
+    """
+    Validates and repairs a structured reply against criteria_data: criteria are matched to the
+    spreadsheet names, unknown ones are dropped, missing ones are added as not assessed, scores
+    are clamped to 1-10 and answers normalised to Yes/No. Raises ValueError if nothing usable
+    came back.
+    """
+    data = _load_json(text)
+    if not isinstance(data, dict) or not isinstance(data.get("criteria"), list):
+        raise ValueError("Invalid JSON structure: expected an object with a 'criteria' list.")
+
+    by_key = {}
+    for entry in data["criteria"]:
+        if isinstance(entry, dict) and entry.get("criterion") is not None:
+            by_key.setdefault(_key(entry["criterion"]), entry)
+
+    criteria = []
+    matched = 0
+    for name, definition in criteria_data.items():
+        if definition['type'] not in ('scored_criteria', 'yes_no_criteria'):
+            continue
+        entry = by_key.get(_key(name))
+        matched += entry is not None
+        entry = entry or {}
+        criteria.append({
+            "criterion": name,
+            "type": definition['type'],
+            "weighting": definition['weighting'],
+            "order": definition.get('order', 0),
+            "assessed": bool(entry),
+            "score": _score(entry.get("score")) if definition['type'] == 'scored_criteria' else None,
+            "answer": _answer(entry.get("answer")) if definition['type'] == 'yes_no_criteria' else None,
+            "page_references": _text(entry.get("page_references")),
+            "strengths": _text(entry.get("strengths")),
+            "weaknesses": _text(entry.get("weaknesses")),
+            "justification": _text(entry.get("justification")),
+            "sub_criteria": [
+                {"name": _text(sub.get("name")), "score": _score(sub.get("score")), "comments": _text(sub.get("comments"))}
+                for sub in entry.get("sub_criteria") or [] if isinstance(sub, dict)
+            ],
+        })
+
+    if criteria and not matched:
+        raise ValueError("Invalid JSON structure: no criteria in the AI response match the spreadsheet.")
+
+    return {
+        "executive_summary": _text(data.get("executive_summary")),
+        "criteria": criteria,
+        "conclusion": _text(data.get("conclusion")),
+    }
+
+
+def apply_local_answers(evaluation, answers):
+    """
+    Fills in the yes/no criteria settled from the document text ({name: evidence.LocalAnswer}),
+    which the model was told to leave out, and marks every yes/no criterion as decided locally or not.
+    """
+    for c in evaluation["criteria"]:
+        if c["type"] != 'yes_no_criteria':
+            continue
+        local = answers.get(c["criterion"])
+        c["decided_locally"] = local is not None
+        if local is not None:
+            c.update(
+                assessed=True, answer=local.answer, page_references=local.page_references,
+                strengths="", weaknesses="", justification=local.justification, sub_criteria=[],
+            )
+    return evaluation
+
+
+def _format_score(score):
+    return "Not assessed" if score is None else f"{score:g}/10"
+
+
+def render_evaluation_html(evaluation):
+    """Renders the per-document report in the same layout the HTML prompt asks the model for."""
+    e = html.escape
+    scored = sorted((c for c in evaluation["criteria"] if c["type"] == 'scored_criteria'), key=lambda c: c["order"])
+    yes_no = sorted((c for c in evaluation["criteria"] if c["type"] == 'yes_no_criteria'), key=lambda c: c["order"])
+
+    parts = [f"<h2>Executive Summary</h2><p>{e(evaluation['executive_summary'])}</p>"]
+
+    for c in scored:
+        parts.append(f"<h3>Criteria: {e(c['criterion'])} - {_format_score(c['score'])}</h3>")
+        parts.append(f"<p><strong>Page References:</strong> {e(c['page_references']) or 'None'}</p>")
+        parts.append(f"<p><strong>Strengths:</strong> {e(c['strengths'])}</p>")
+        parts.append(f"<p><strong>Weaknesses:</strong> {e(c['weaknesses'])}</p>")
+        if c["sub_criteria"]:
+            parts.append("<h4>Sub-Criteria</h4><ul>")
+            parts.extend(
+                f"<li><strong>{e(sub['name'])}</strong> - {_format_score(sub['score'])}: {e(sub['comments'])}</li>"
+                for sub in c["sub_criteria"]
+            )
+            parts.append("</ul>")
+        parts.append('<hr style="border-top: 1px solid #ccc;">')
+
+    if yes_no:
+        parts.append("<h3>Yes/No Criteria</h3><ul>")
+        for c in yes_no:
+            answer = c["answer"] or "Not assessed"
+            if c.get("decided_locally"):
+                answer += " (decided locally)"
+            references = f" (Pages: {e(c['page_references'])})" if c["page_references"] else ""
+            parts.append(f"<li><strong>{e(c['criterion'])}:</strong> {answer} - {e(c['justification'])}{references}</li>")
+        parts.append("</ul>")
+
+    parts.append(f"<h2>Conclusion</h2><p>{e(evaluation['conclusion'])}</p>")
+    return "\n".join(parts)
+
+
+def evaluation_rows(evaluation, document_name):
+    """The rows scoring.build_score_table expects, as the HTML prompt's JSON array would have given them."""
+    rows = []
+    for c in evaluation["criteria"]:
+        if c["type"] == 'scored_criteria':
+            row = {"Criterion": c["criterion"], f"{document_name} Score": c["score"], "Weighting (%)": c["weighting"]}
+        else:
+            row = {"Criterion": c["criterion"], f"{document_name} Yes/No": c["answer"], "Weighting (%)": None,
+                   f"{document_name} Decided Locally": bool(c.get("decided_locally"))}
+        if c["sub_criteria"]:
+            row["Sub-Criteria"] = [
+                {"Name": sub["name"], "Comments": sub["comments"], "Score": sub["score"]} for sub in c["sub_criteria"]
+            ]
+        rows.append(row)
+    return rows
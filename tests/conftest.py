@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests that extract sample documents should not fill the shared page cache
+os.environ.setdefault("PAGE_CACHE_ENABLED", "false")
+
+# Tests that import app work offline and keep its files out of the repository
+os.environ.setdefault("LLM_BACKEND", "mock")
+os.environ.setdefault("EVAL_CACHE_ENABLED", "false")
+os.environ.setdefault("DOCUMENT_STORE_ENABLED", "false")
+os.environ.setdefault("LLM_SCHEDULER_STATE_PATH", "")
+os.environ.setdefault("WORKSPACE_ROOT", tempfile.mkdtemp(prefix="tender-workspaces-"))
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, threading
+import app
+print(json.dumps({"threads": [thread.name for thread in threading.enumerate()]}))
+"""
+
+
+def test_import_has_no_side_effects(tmp_path):
+    scratch = tmp_path / "scratch"
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        LLM_BACKEND="mock",
+        LOG_LEVEL="WARNING",
+        WORKSPACE_ROOT=str(scratch / "workspaces"),
+        DOCUMENT_STORE_ENABLED="true",
+        DOCUMENT_STORE_PATH=str(scratch / "documents"),
+        EVAL_CACHE_ENABLED="true",
+        EVAL_CACHE_PATH=str(scratch / "evaluations.sqlite3"),
+        PAGE_CACHE_PATH=str(scratch / "pages.sqlite3"),
+        LLM_SCHEDULER_STATE_PATH=str(scratch / "rate_limits.sqlite3"),
+        LLM_TOKENS_PER_MINUTE="100000",
+    )
+    output = subprocess.check_output([sys.executable, "-c", PROBE], env=env, cwd=str(tmp_path), text=True)
+
+    assert json.loads(output.strip().splitlines()[-1])["threads"] == ["MainThread"]
+    assert not scratch.exists()
+    assert os.listdir(tmp_path) == []  # Nothing written to the working directory either
@@ -0,0 +1,49 @@
+import random
+
+from boilerplate import MARKER, _matching_sources, _pages, collapse_boilerplate
+
+_random = random.Random(11)
+VOCABULARY = [f"word{i}" for i in range(5000)]
+
+
+def passage(words):
+    return " ".join(_random.choice(VOCABULARY) for _ in range(words))
+
+
+TENDER = passage(300)
+TEMPLATE = passage(200)
+
+
+def response(copy_tender=True, template=False):
+    parts = [passage(120)]
+    if copy_tender:
+        parts.append(TENDER)
+    if template:
+        parts.append(TEMPLATE)
+    parts.append(passage(120))
+    return "(Page 1) " + " ".join(parts)
+
+
+def test_text_copied_from_the_tender_documents_is_collapsed():
+    documents = [(f"Bidder{i}.txt", response()) for i in range(12)]
+    results = collapse_boilerplate(documents, [("Tender Brief.docx", "(Page 1) " + TENDER)])
+
+    for (_, text), result in zip(documents, results):
+        assert result.passages == 1
+        assert "also in the tender documents (Tender Brief.docx)" in result.text
+        assert 290 <= result.words <= 300
+        # The bidder's own words either side are kept
+        assert text.split()[2] in result.text and text.split()[-1] in result.text
+
+
+def test_text_shared_by_enough_responses_is_collapsed():
+    documents = [(f"Bidder{i}.txt", response(copy_tender=False, template=i < 3)) for i in range(5)]
+    results = collapse_boilerplate(documents, min_documents=3)
+
+    assert ["repeated in 2 other responses" in r.text for r in results] == [True, True, True, False, False]
+    assert not any(MARKER.search(r.text) for r in results[3:])
+
+
+def test_overlapping_windows_of_one_response_do_not_chain_it_to_another():
+    matches = _matching_sources([_pages(response(copy_tender=False)), _pages(response(copy_tender=False))])
+    assert not any(matches)
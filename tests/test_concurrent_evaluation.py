@@ -0,0 +1,51 @@
+import pytest
+
+import app as tender_app
+
+CRITERIA = {
+    "Methodology": {"type": "scored_criteria", "order": 1, "weighting": 100, "sub_criteria": [], "comments": []},
+    "Insurance": {"type": "yes_no_criteria", "order": 2, "weighting": None, "sub_criteria": [], "comments": []},
+}
+DOCUMENTS = [("Good_redacted.txt", "good"), ("Bad_redacted.txt", "bad"), ("Other_redacted.txt", "other")]
+
+
+class APIError(Exception):
+    """Stands in for an API error that is still failing after the retries."""
+
+
+@pytest.fixture(params=["document", "per_criterion"])
+def mode(request, monkeypatch):
+    monkeypatch.setitem(tender_app.app.config, "EVALUATION_MODE", request.param)
+
+    def evaluate_document(document_text, criteria_data, document_name):
+        if document_text == "bad":
+            raise APIError("503 after retries")
+        return f"<p>{document_name}</p>", [{"Criterion": "Methodology", f"{document_name} Score": 5}]
+
+    def evaluate_criterion(document_text, criterion_name, criterion, document_name):
+        if document_text == "bad" and criterion_name == "Insurance":
+            raise TimeoutError("request timed out")
+        return f"<p>{document_name} {criterion_name}</p>", [{"Criterion": criterion_name}]
+
+    monkeypatch.setattr(tender_app, "evaluate_document_cached", evaluate_document)
+    monkeypatch.setattr(tender_app, "evaluate_criterion_cached", evaluate_criterion)
+    return request.param
+
+
+def test_a_failing_document_does_not_stop_the_batch(mode):
+    finished, failed = [], []
+    results = tender_app.evaluate_documents_concurrently(
+        DOCUMENTS, CRITERIA,
+        on_result=lambda index, name, html_part, rows: finished.append(name),
+        on_error=lambda index, name, error: failed.append((name, tender_app.describe_error(error))),
+    )
+
+    assert sorted(finished) == ["Good_redacted.txt", "Other_redacted.txt"]
+    assert [name for name, _ in failed] == ["Bad_redacted.txt"]
+    assert ("APIError" in failed[0][1]) if mode == "document" else ("Insurance: TimeoutError" in failed[0][1])
+    assert results[1] is None and results[0] is not None and results[2] is not None
+
+
+def test_errors_are_raised_without_on_error(mode):
+    with pytest.raises((APIError, TimeoutError)):
+        tender_app.evaluate_documents_concurrently(DOCUMENTS, CRITERIA)
@@ -0,0 +1,54 @@
+import io
+
+import pytest
+
+from criteria import load_criteria
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def test_first_sheet_is_read_whichever_tab_was_selected():
+    workbook = openpyxl.Workbook()
+    criteria = workbook.active
+    criteria.title = "Criteria"
+    criteria.append(["Criterion", "Weighting", "Comments"])
+    criteria.append(["Experience", 60, "Relevant projects"])
+    criteria.append(["Price", 40, None])
+    criteria.append(["Insurance", "Yes/No", None])
+    notes = workbook.create_sheet("Notes")
+    notes.append(["Criterion", "Weighting", "Comments"])
+    notes.append(["Not a criterion", 100, None])
+    workbook.active = 1  # Saved with the Notes tab selected
+
+    data = io.BytesIO()
+    workbook.save(data)
+    criteria_set = load_criteria(data.getvalue(), "criteria.xlsx")
+
+    assert criteria_set.weightings == {"Experience": 60, "Price": 40}
+    assert "Not a criterion" not in criteria_set.order_mapping
+
+
+def test_layout():
+    # A .csv file has no header row
+    rows = (
+        ",,Ignored: before the first criterion\n"
+        "Experience,60,\n"
+        "Projects,,\"Similar scale\nLast five years\"\n"
+        ",,Include referees\n"
+        "Price,40.5,\n"
+        "Insurance,Y/N,\n"
+        "Background,see brief,\n"
+    ).encode("utf-8")
+    criteria_set = load_criteria(rows, "criteria.csv")
+
+    assert criteria_set.as_dict() == {
+        "Experience": {
+            "sub_criteria": [{"name": "Projects", "comments": ["Similar scale", "Last five years"]}],
+            "type": "scored_criteria", "weighting": 60.0, "order": 1, "comments": ["Include referees"],
+        },
+        "Price": {"sub_criteria": [], "type": "scored_criteria", "weighting": 40.5, "order": 4, "comments": []},
+        "Insurance": {"sub_criteria": [], "type": "yes_no_criteria", "weighting": None, "order": 5, "comments": []},
+        "Background": {"sub_criteria": [], "type": "unknown", "weighting": None, "order": 6, "comments": []},
+    }
+    assert criteria_set.weightings == {"Experience": 60.0, "Price": 40.5}
+    assert criteria_set.order_mapping == {"Experience": 1, "Price": 4, "Insurance": 5, "Background": 6}
@@ -0,0 +1,33 @@
+import shutil
+
+from document_store import DocumentStore
+
+DIGEST = "ab" + "0" * 62
+
+
+def stored(tmp_path):
+    extracted = tmp_path / "extracted.txt"
+    redacted = tmp_path / "redacted.txt"
+    extracted.write_text("(Page 1) Acme Pty Ltd", encoding="utf-8")
+    redacted.write_text("(Page 1) [REDACTED]", encoding="utf-8")
+    store = DocumentStore(str(tmp_path / "store"))
+    store.put(DIGEST, "Acme.pdf", "rules", str(extracted), str(redacted))
+    return store
+
+
+def test_copies_stored_text(tmp_path):
+    store = stored(tmp_path)
+    assert store.copy_extracted(DIGEST, str(tmp_path / "out.txt"))
+    assert (tmp_path / "out.txt").read_text(encoding="utf-8") == "(Page 1) Acme Pty Ltd"
+    assert store.copy_redacted(DIGEST, "Acme.pdf", "rules", str(tmp_path / "out-redacted.txt"))
+
+
+def test_folder_evicted_by_another_worker_is_a_miss(tmp_path):
+    store = stored(tmp_path)
+    # Another worker's store shares the directory but not this one's lock
+    other = DocumentStore(str(tmp_path / "store"))
+    shutil.rmtree(other._folder(DIGEST))
+
+    assert not store.copy_redacted(DIGEST, "Acme.pdf", "rules", str(tmp_path / "out-redacted.txt"))
+    assert not store.copy_extracted(DIGEST, str(tmp_path / "out.txt"))
+    assert not (tmp_path / "out.txt").exists()
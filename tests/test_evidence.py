@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from evidence import is_heading, prescreen
+
+NO_DETAILS = {"sub_criteria": [], "comments": []}
+GARTNER_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "documents", "advisory rfq", "Gartner.pdf")
+
+
+def screen(text, criterion):
+    return prescreen(text, criterion, NO_DETAILS)
+
+
+@pytest.mark.parametrize("line", [
+    "SCHEDULE 13 – CONFLICT OF INTEREST  ................................ ................................ .. 37",
+    "SCHEDULE 13  – CONFLICT OF INTEREST",
+    "Schedule 12 Compliance with Conditions of Contract",
+    "Conflict of Interest Declaration  37",
+    "Code of Conduct",
+])
+def test_headings_and_contents_lines(line):
+    assert is_heading(line)
+
+
+def test_sentences_are_not_headings():
+    assert not is_heading("We comply with the Supplier Code of Conduct in all our work.")
+
+
+def test_contents_entry_is_not_evidence():
+    text = (
+        "(Page 2) SCHEDULE 12 – COMPLIANCE WITH CONDITIONS OF CONTRACT  .........................  34\n"
+        "SCHEDULE 13 – CONFLICT OF INTEREST  ................................ .. 37\n"
+        "(Page 37) SCHEDULE 13  – CONFLICT OF INTEREST\n"
+    )
+    assert screen(text, "Conflict of Interest") is None
+    assert screen(text, "Contract terms & conditions") is None
+
+
+def test_mention_is_not_compliance():
+    text = (
+        "(Page 5) Gartner's standard contract term is three (3) years non-cancellable contract.\n"
+        "(Page 11) Access to governance, service management, frameworks, templates, practical tools and research.\n"
+    )
+    assert screen(text, "Contract terms") is None
+    assert screen(text, "Governance") is None
+
+
+def test_having_a_policy_is_not_compliance():
+    text = "(Page 1) Our company has a strict code of conduct policy which aligns with that of the Corporation."
+    assert screen(text, "Code of Conduct") is None
+
+
+def test_compliance_statement_is_yes():
+    text = (
+        "(Page 1) Executive summary of our response.\n"
+        "(Page 4) We comply with the Supplier Code of Conduct and have trained all staff in it.\n"
+    )
+    local = screen(text, "Code of Conduct")
+    assert local.answer == "Yes"
+    assert local.pages == (4,)
+
+
+@pytest.mark.parametrize("sentence", [
+    "We will comply with the Supplier Code of Conduct upon award.",
+    "We accept the contract terms subject to negotiation of the liability cap.",
+    "Our acceptance of the contract terms is contingent upon the changes in Appendix B.",
+    "We do not comply with the Supplier Code of Conduct at this time.",
+])
+def test_qualified_statements_go_to_the_model(sentence):
+    criterion = "Code of Conduct" if "Conduct" in sentence else "Contract terms"
+    assert screen(f"(Page 3) {sentence}", criterion) is None
+
+
+def test_questions_are_not_evidence():
+    text = "(Page 3) Do you comply with the Supplier Code of Conduct? Please provide details."
+    assert screen(text, "Code of Conduct") is None
+
+
+def test_no_only_when_asked():
+    text = "(Page 1) We deliver advisory services across Australia."
+    assert screen(text, "Human Rights") is None
+    assert prescreen(text, "Human Rights", NO_DETAILS, decide_no=True).answer == "No"
+
+
+@pytest.mark.skipif(not os.path.exists(GARTNER_PDF), reason="sample response not available")
+def test_gartner_response_is_left_to_the_model():
+    pytest.importorskip("PyPDF2")
+    from document_processing import extract_text, redact_text
+
+    text = redact_text(extract_text(GARTNER_PDF, "Gartner.pdf"), "Gartner.pdf")
+    for criterion in ("Conflict of Interest", "Governance", "Contract terms", "Contract terms & conditions"):
+        assert screen(text, criterion) is None, criterion
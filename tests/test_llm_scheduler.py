@@ -0,0 +1,62 @@
+import sqlite3
+
+from llm_scheduler import LLMScheduler, LocalRateLimits, SharedRateLimits
+
+
+def test_limits_without_a_state_path_are_per_process():
+    assert isinstance(LLMScheduler(60, 6000).limits, LocalRateLimits)
+
+
+def test_unlimited_scheduler_needs_no_shared_state(tmp_path):
+    path = tmp_path / "limits.sqlite3"
+    assert isinstance(LLMScheduler(0, 0, state_path=str(path)).limits, LocalRateLimits)
+    assert not path.exists()
+
+
+def test_workers_draw_from_the_same_buckets(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    # One scheduler per gunicorn worker, each with its own connection
+    first = LLMScheduler(0, 600, state_path=path)
+    second = LLMScheduler(0, 600, state_path=path)
+    assert isinstance(first.limits, SharedRateLimits)
+
+    first.release(first.acquire(600))
+    # The account's tokens for the minute are used up, whichever worker asks next
+    assert second.limits.try_take(60) > 1
+    assert first.limits.try_take(60) > 1
+
+
+def test_usage_corrections_are_shared(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    first = LLMScheduler(0, 600, state_path=path)
+    second = LLMScheduler(0, 600, state_path=path)
+
+    reservation = first.acquire(600)
+    reservation.record(prompt_tokens=100, completion_tokens=0)
+    first.release(reservation)  # 500 of the estimated tokens are given back
+    assert second.limits.try_take(400) == 0
+
+
+def test_pause_holds_every_worker(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    first = LLMScheduler(60, 0, state_path=path)
+    second = LLMScheduler(60, 0, state_path=path)
+
+    first.pause(30)
+    assert second.limits.try_take(1) > 25
+    assert second.stats()["paused_for_seconds"] > 25
+
+
+def test_stats_do_not_need_the_write_lock(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    scheduler = LLMScheduler(60, 0, state_path=path)
+    scheduler.pause(30)
+    scheduler.limits._conn.execute("PRAGMA busy_timeout = 100")
+
+    # Another worker is in the middle of acquire()
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert scheduler.stats()["paused_for_seconds"] > 25
+    finally:
+        other.execute("ROLLBACK")
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+import document_processing
+
+pytest.importorskip("PyPDF2")
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "documents", "CompanyZZ.pdf")
+
+
+@pytest.fixture
+def corrupt_cache(tmp_path, monkeypatch):
+    path = tmp_path / "pages.sqlite3"
+    path.write_bytes(b"this is not a database" * 100)
+    monkeypatch.setattr(document_processing, "PAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(document_processing, "PAGE_CACHE_PATH", str(path))
+    return path
+
+
+def test_unusable_cache_is_skipped(corrupt_cache):
+    assert document_processing.ingestion_page_cache() is None
+
+
+@pytest.mark.skipif(not os.path.exists(SAMPLE_PDF), reason="sample response not available")
+def test_unusable_cache_does_not_fail_an_upload(corrupt_cache, tmp_path):
+    result = document_processing.ingest_document(SAMPLE_PDF, "CompanyZZ.pdf", str(tmp_path))
+    with open(tmp_path / result.redacted_filename, encoding="utf-8") as redacted_file:
+        assert "(Page 1)" in redacted_file.read()
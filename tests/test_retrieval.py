@@ -0,0 +1,46 @@
+from retrieval import build_index, estimate_tokens, select_relevant_text
+
+TOPICS = [f"topic{n}" for n in range(26)]
+
+
+def long_document():
+    """One page per topic, each about 200 tokens, so every page becomes its own chunk."""
+    pages = []
+    for page, topic in enumerate(TOPICS, start=1):
+        pages.append(f"(Page {page}) " + " ".join(f"{topic} detail{page}x{n}" for n in range(50)))
+    return "\n".join(pages)
+
+
+def test_short_text_is_unchanged():
+    assert select_relevant_text("(Page 1) short", ["anything"], token_budget=100) == "(Page 1) short"
+
+
+def test_every_query_gets_its_best_chunk_when_shares_are_smaller_than_a_chunk():
+    text = long_document()
+    # 26 queries and room for about 10 chunks: each query's share is smaller than one chunk
+    selected = select_relevant_text(text, TOPICS, token_budget=2100, max_chunk_tokens=250)
+
+    assert estimate_tokens(selected) > 2100 * 0.8
+    covered = [topic for topic in TOPICS if f"{topic} detail" in selected]
+    assert covered == TOPICS[:len(covered)]  # Queries take turns, in order
+    assert len(covered) >= 9
+
+
+def test_budget_unused_by_one_query_goes_to_the_others():
+    text = long_document() + "\n" + "\n".join(
+        f"(Page {100 + n}) " + " ".join(f"topic0 more{n}x{m}" for m in range(50)) for n in range(10)
+    )
+    # topic1 matches a single chunk; topic0 may use the rest of the budget
+    selected = select_relevant_text(text, ["topic0", "topic1"], token_budget=1500, max_chunk_tokens=250)
+
+    assert "topic1 detail" in selected
+    assert estimate_tokens(selected) > 1500 * 0.8
+    assert estimate_tokens(selected) <= 1500
+
+
+def test_chunks_too_big_for_the_rest_are_skipped_not_the_end():
+    text = long_document()
+    index = build_index(text, 250)
+    smallest = min(estimate_tokens(chunk) for chunk in index.chunks)
+    selected = select_relevant_text(text, TOPICS[:2], token_budget=smallest, max_chunk_tokens=250)
+    assert estimate_tokens(selected) <= smallest
@@ -0,0 +1,45 @@
+import csv
+from types import SimpleNamespace
+
+from batch_evaluate import write_reports
+from scoring import build_score_table, score_rows, yes_no_rows
+
+ROWS = [
+    {"Criterion": "Experience", "A_redacted.txt Score": 8, "B_redacted.txt Score": "6"},
+    {"Criterion": "Price", "A_redacted.txt Score": 5},
+    {"Criterion": "Insurance", "A_redacted.txt Yes/No": "Yes", "B_redacted.txt Yes/No": "No"},
+]
+WEIGHTINGS = {"Experience": 60, "Price": 40}
+ORDER = {"Experience": 1, "Price": 2, "Insurance": 3}
+
+
+def test_score_rows_total_only_complete_criteria():
+    header, rows = score_rows(build_score_table(ROWS, WEIGHTINGS, ORDER))
+
+    assert header == ["Criterion", "A Score", "B Score", "Weighting (%)", "Weighted A Score", "Weighted B Score"]
+    assert rows[0] == ["Experience", 8.0, 6.0, 60.0, 4.8, 3.6]
+    # Price has no score for B, so it is left out, as in the web summary
+    assert rows[-1][0] == "Total" and rows[-1][1:3] == [8.0, 6.0] and rows[-1][3] == ""
+    assert len(rows) == 2
+
+
+def test_yes_no_rows():
+    header, rows = yes_no_rows(build_score_table(ROWS, WEIGHTINGS, ORDER))
+    assert header == ["Criterion", "A Yes/No", "B Yes/No"]
+    assert rows == [["Insurance", "Yes", "No"]]
+
+
+def test_batch_csvs_match_the_score_table(tmp_path):
+    checkpoint = {"documents": {"A.pdf": {"status": "evaluated", "rows": ROWS}}}
+    write_reports(str(tmp_path), checkpoint, SimpleNamespace(weightings=WEIGHTINGS, order_mapping=ORDER))
+
+    with open(tmp_path / "summary_scores.csv", newline="", encoding="utf-8") as csv_file:
+        scores = list(csv.reader(csv_file))
+    with open(tmp_path / "summary_yes_no.csv", newline="", encoding="utf-8") as csv_file:
+        yes_no = list(csv.reader(csv_file))
+
+    assert scores[0] == score_rows(build_score_table(ROWS, WEIGHTINGS, ORDER))[0]
+    assert scores[1] == ["Experience", "8.0", "6.0", "60.0", "4.8", "3.6"]
+    assert scores[-1][:4] == ["Total", "8.0", "6.0", ""]
+    assert yes_no == [["Criterion", "A Yes/No", "B Yes/No"], ["Insurance", "Yes", "No"]]
+    assert "<table" in (tmp_path / "summary.html").read_text(encoding="utf-8")
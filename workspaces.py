@@ -0,0 +1,220 @@
+"""
+Per-session workspaces.
+
+Each upload/evaluate session gets its own directory under WORKSPACE_ROOT instead
+of sharing one redacted/ folder, so concurrent evaluators (and several gunicorn
+workers) never see or delete each other's documents:
+
+  <root>/<workspace_id>/uploads/     original uploads
+  <root>/<workspace_id>/redacted/    redacted text, one file per document (plus a .gz copy)
+  <root>/<workspace_id>/jobs/        evaluation job state, <job_id>.json, and each
+                                     document's report, <job_id>/<index>.html
+  <root>/<workspace_id>/criteria.json  criteria of the last evaluation
+
+Everything lives on disk, so any worker process can serve any request for a
+workspace. Job state and other JSON files are written atomically (temp file +
+os.replace) so a reader never sees a half-written file, and expired workspaces
+are renamed out of the way before being deleted so a sweep racing a request in
+another process fails cleanly instead of deleting files mid-write.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_WORKSPACE_ID = re.compile(r"^[0-9a-f]{32}$")
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+_TOUCH_FILE = ".last_used"
+_TRASH_PREFIX = ".expired-"
+
+
+class WorkspaceNotFound(KeyError):
+    """Raised for unknown, malformed or expired workspace IDs."""
+
+
+def _write_atomic(path, write):
+    """Calls write(file) on a temp file in the same directory, then renames it over `path`."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+            write(tmp_file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path, value):
+    _write_atomic(path, lambda tmp_file: json.dump(value, tmp_file, ensure_ascii=False, default=str))
+
+
+def write_text_atomic(path, text):
+    _write_atomic(path, lambda tmp_file: tmp_file.write(text))
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as json_file:
+        return json.load(json_file)
+
+
+class WorkspaceStore:
+    """Creates, resolves and expires workspace directories under `root`."""
+
+    def __init__(self, root, ttl_seconds=24 * 3600):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def create(self):
+        """Makes a new empty workspace and returns its ID."""
+        workspace_id = uuid.uuid4().hex
+        base = os.path.join(self.root, workspace_id)
+        for folder in ("uploads", "redacted", "jobs"):
+            os.makedirs(os.path.join(base, folder))
+        self.touch(workspace_id)
+        return workspace_id
+
+    def path(self, workspace_id, *parts):
+        """Path inside an existing workspace. Raises WorkspaceNotFound for bad or expired IDs."""
+        if not workspace_id or not _WORKSPACE_ID.match(workspace_id):
+            raise WorkspaceNotFound(workspace_id)
+        base = os.path.join(self.root, workspace_id)
+        if not os.path.isdir(base):
+            raise WorkspaceNotFound(workspace_id)
+        return os.path.join(base, *parts)
+
+    def uploads_folder(self, workspace_id):
+        return self.path(workspace_id, "uploads")
+
+    def redacted_folder(self, workspace_id):
+        return self.path(workspace_id, "redacted")
+
+    def touch(self, workspace_id):
+        """Marks the workspace as used now, pushing back its expiry."""
+        touch_path = self.path(workspace_id, _TOUCH_FILE)
+        with open(touch_path, "a"):
+            pass
+        os.utime(touch_path, None)
+
+    def last_used(self, workspace_id):
+        try:
+            return os.path.getmtime(self.path(workspace_id, _TOUCH_FILE))
+        except (OSError, WorkspaceNotFound):
+            return 0.0
+
+    def redacted_files(self, workspace_id):
+        """Redacted document filenames, sorted so report order is stable between runs."""
+        folder = self.redacted_folder(workspace_id)
+        # Leaves out temp files and the .gz copies written for downloads
+        return sorted(f for f in os.listdir(folder) if not f.startswith(".") and not f.endswith(".gz"))
+
+    def clear_documents(self, workspace_id):
+        """Deletes the workspace's uploads and redacted documents, keeping its jobs."""
+        for folder in ("uploads", "redacted"):
+            folder_path = self.path(workspace_id, folder)
+            for file in os.listdir(folder_path):
+                file_path = os.path.join(folder_path, file)
+                if os.path.isdir(file_path):
+                    shutil.rmtree(file_path, ignore_errors=True)
+                else:
+                    try:
+                        os.unlink(file_path)
+                    except FileNotFoundError:
+                        pass
+
+    # Job state
+
+    def save_job(self, workspace_id, job):
+        write_json_atomic(self.path(workspace_id, "jobs", f"{job['id']}.json"), job)
+
+    def load_job(self, workspace_id, job_id):
+        """The last saved state of a job, or None if there is no such job in the workspace."""
+        if not job_id or not _JOB_ID.match(job_id):
+            return None
+        try:
+            return read_json(self.path(workspace_id, "jobs", f"{job_id}.json"))
+        except FileNotFoundError:
+            return None
+
+    # Document reports, one file per finished document, so saving the job stays small
+
+    def save_report(self, workspace_id, job_id, index, html_part):
+        folder = self.path(workspace_id, "jobs", job_id)
+        os.makedirs(folder, exist_ok=True)
+        write_text_atomic(os.path.join(folder, f"{index}.html"), html_part)
+
+    def load_report(self, workspace_id, job_id, index):
+        """The HTML report of document `index` of a job, or None if it has not been saved."""
+        if not job_id or not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self.path(workspace_id, "jobs", job_id, f"{int(index)}.html"), "r", encoding="utf-8") as report:
+                return report.read()
+        except FileNotFoundError:
+            return None
+
+    # Criteria of the previous evaluation, to report what changed
+
+    def load_criteria(self, workspace_id):
+        try:
+            return read_json(self.path(workspace_id, "criteria.json"))
+        except FileNotFoundError:
+            return None
+
+    def save_criteria(self, workspace_id, criteria_data):
+        write_json_atomic(self.path(workspace_id, "criteria.json"), criteria_data)
+
+    # Expiry
+
+    def sweep(self, now=None):
+        """Deletes workspaces unused for longer than ttl_seconds. Returns the removed workspace IDs."""
+        now = time.time() if now is None else now
+        removed = []
+
+        for name in os.listdir(self.root):
+            base = os.path.join(self.root, name)
+
+            if name.startswith(_TRASH_PREFIX):
+                # Left behind by a sweep that was interrupted
+                shutil.rmtree(base, ignore_errors=True)
+                continue
+            if not _WORKSPACE_ID.match(name) or now - self.last_used(name) <= self.ttl_seconds:
+                continue
+
+            # Rename first: only one process wins, and requests stop resolving the workspace at once
+            trash = os.path.join(self.root, f"{_TRASH_PREFIX}{name}")
+            try:
+                os.rename(base, trash)
+            except OSError:
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+            removed.append(name)
+
+        return removed
+
+    def start_sweeper(self, interval_seconds, on_sweep=None):
+        """Runs sweep() every `interval_seconds` on a daemon thread."""
+        def run():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    removed = self.sweep()
+                    if on_sweep:
+                        on_sweep(removed)
+                except Exception as e:
+                    logger.warning("⚠️ Workspace sweep failed: %s", e)
+
+        thread = threading.Thread(target=run, name="workspace-sweeper", daemon=True)
+        thread.start()
+        return thread